@@ -3,6 +3,8 @@ import sys as _sys
 from paragraph._wrapper import WrappedModuleFinder
 
 from paragraph.types import Variable, op  # noqa: F401
-from paragraph.session import evaluate, apply, solve, solve_requirements  # noqa: F401
+from paragraph.session import evaluate, evaluate_as_completed, evaluate_many, apply, solve, solve_requirements  # noqa: F401
+from paragraph.control import cond, switch, and_, or_, map_  # noqa: F401
+from paragraph.batching import batch_op  # noqa: F401
 
 _sys.meta_path.append(WrappedModuleFinder)
@@ -0,0 +1,145 @@
+"""
+Analysis
+********
+
+*Static analysis of the shape of computation graphs.*
+
+The function :func:`analyze` estimates, prior to any evaluation, how much concurrency a computation graph offers and how many values the session
+engines hold at once, e.g. to size an executor:
+
+    >>> stats = analyze([output])
+    >>> stats.max_parallelism, stats.critical_path_length, stats.peak_live_values
+    (8, 12.0, 15)
+
+All quantities are computed from a forward traversal, i.e. in time linear in the number of variables and dependencies.
+"""
+import attr
+
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from paragraph.session import traverse_fw, _count_usages
+from paragraph.types import Output, Variable
+
+
+def _unit_cost(var: Variable) -> float:
+    # Outputs of multi-output ops are selected at no cost
+    return 0. if var.isinput() or isinstance(var.op, Output) else 1.
+
+
+@attr.s(frozen=True)
+class GraphAnalysis:
+    """Statistics on the shape of a computation graph.
+
+    Levels are defined by the earliest possible schedule: input variables lie at level 0, and every other variable one level above its highest dependency.
+    All variables on the same level are thus independent of each other, and the width of the widest level is a lower bound of the size of the maximum
+    antichain of the graph, i.e. of the maximum number of ops that can run concurrently. Computing the maximum antichain exactly requires a bipartite
+    matching, which does not run in linear time, and is therefore not attempted.
+
+    Attributes:
+        num_inputs: The number of input variables.
+        num_nodes: The number of dependent variables, i.e. of op executions.
+        num_edges: The number of dependencies.
+        op_counts: Maps the name of each op onto the number of variables it defines.
+        edge_counts: Maps the name of each op onto the number of dependencies of the variables it defines.
+        depth: The number of levels, input level included.
+        level_widths: The number of variables on each level, starting with the inputs.
+        max_parallelism: The number of variables on the widest level above the inputs.
+        work: The total cost of all ops.
+        critical_path: The sequence of variables, from an input to an output, achieving the longest cumulated cost.
+        critical_path_length: The cumulated cost of the ops on the critical path, which bounds the duration of any evaluation from below.
+        average_parallelism: The ratio of the work to the critical path length, i.e. the speed-up achievable with an infinite number of workers.
+        peak_live_values: The maximum number of values held at once by a sequential evaluation, under the release policy of the session engines.
+    """
+    num_inputs = attr.ib(type=int)
+    num_nodes = attr.ib(type=int)
+    num_edges = attr.ib(type=int)
+    op_counts = attr.ib(type=Dict[str, int])
+    edge_counts = attr.ib(type=Dict[str, int])
+    depth = attr.ib(type=int)
+    level_widths = attr.ib(type=List[int])
+    max_parallelism = attr.ib(type=int)
+    work = attr.ib(type=float)
+    critical_path = attr.ib(type=List[Variable])
+    critical_path_length = attr.ib(type=float)
+    average_parallelism = attr.ib(type=float)
+    peak_live_values = attr.ib(type=int)
+
+
+def analyze(output: Iterable[Variable], costs: Optional[Callable[[Variable], float]] = None) -> GraphAnalysis:
+    """Analyze the computation graph spanned by the output variables.
+
+    All branches of control ops are included in the analysis, which thus describes the worst case. The subgraphs mapped by map ops are not expanded.
+
+    Arguments:
+        output: The variables whose transitive dependencies should be analyzed.
+        costs: Returns the cost of evaluating a variable, e.g. recorded durations of its op. Defaults to 1 for dependent variables and 0 for inputs and outputs
+          of multi-output ops.
+
+    Returns:
+        The statistics of the graph.
+    """
+    output = list(output)
+    costs = costs or _unit_cost
+    usage_counts = _count_usages(output)
+    outputs = set(output)
+
+    variables = list(traverse_fw(output))
+    num_inputs = sum(1 for var in variables if var.isinput())
+
+    op_counts, edge_counts = Counter(), Counter()
+    levels, finish, predecessor = {}, {}, {}
+    level_widths = defaultdict(int)
+    # Input values are held from the start of the evaluation
+    live = peak_live = num_inputs
+    num_edges = 0
+    work = 0.
+
+    for var in variables:
+        deps = list(var.dependencies.values())
+        levels[var] = 0 if var.isinput() else 1 + max((levels[dep] for dep in deps), default=0)
+        level_widths[levels[var]] += 1
+
+        cost = costs(var)
+        work += cost
+        predecessor[var] = max(deps, key=finish.__getitem__, default=None)
+        finish[var] = cost + (finish[predecessor[var]] if predecessor[var] is not None else 0.)
+
+        if var.isinput():
+            continue
+
+        op_counts[repr(var.op)] += 1
+        edge_counts[repr(var.op)] += len(deps)
+        num_edges += len(deps)
+
+        # Replay the release policy of the session engines: dependencies are released upon their last usage, then the value is stored
+        for dep in deps:
+            usage_counts[dep] -= 1
+            if usage_counts[dep] == 0 and dep not in outputs:
+                live -= 1
+        live += 1
+        peak_live = max(peak_live, live)
+
+    last = max(output, key=finish.__getitem__, default=None)
+    critical_path = []
+    while last is not None:
+        critical_path.append(last)
+        last = predecessor[last]
+    critical_path_length = finish[critical_path[0]] if critical_path else 0.
+    widths = [level_widths[level] for level in range(max(levels.values(), default=-1) + 1)]
+
+    return GraphAnalysis(
+        num_inputs=num_inputs,
+        num_nodes=sum(op_counts.values()),
+        num_edges=num_edges,
+        op_counts=dict(op_counts),
+        edge_counts=dict(edge_counts),
+        depth=len(widths),
+        level_widths=widths,
+        max_parallelism=max(widths[1:], default=0),
+        work=work,
+        critical_path=critical_path[::-1],
+        critical_path_length=critical_path_length,
+        average_parallelism=work / critical_path_length if critical_path_length > 0 else 0.,
+        peak_live_values=peak_live,
+    )
@@ -0,0 +1,136 @@
+"""
+Batching
+********
+
+*Coalescing concurrent executions of an op into batched calls.*
+
+Ops whose cost is dominated by a fixed overhead per call (e.g. scoring rows with a model) can be marked batchable. Executions of such an op requested
+concurrently, typically by separate evaluations running in different threads, are collected for a short time and executed together in a single call:
+
+    >>> @batch_op(max_batch_size=64, max_delay=.005)
+    ... def score(rows):
+    ...     return model.predict(rows)
+    >>> y = score.op(x)
+
+The function decorated receives, for every argument, the list of the values passed by the executions collected, and returns the list of their results in
+the same order. Each execution then returns its own result.
+"""
+import threading
+
+import attr
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from paragraph.types import Op
+
+
+@attr.s
+class _Batch:
+    """The executions of a batch op collected for a single call.
+
+    Attributes:
+        calls: The positional and keyword arguments of every execution collected.
+        results: The results of the executions, once the batch has been executed.
+        error: The exception raised by the call, if any.
+        full: Set once the batch is closed to further executions.
+        done: Set once the batch has been executed.
+    """
+    calls = attr.ib(type=List[Tuple[tuple, Dict[str, Any]]], factory=list)
+    results = attr.ib(type=Optional[List[Any]], default=None)
+    error = attr.ib(type=Optional[BaseException], default=None)
+    full = attr.ib(type=threading.Event, factory=threading.Event)
+    done = attr.ib(type=threading.Event, factory=threading.Event)
+
+    def execute(self, func: Callable[..., List[Any]]):
+        pos_args = [list(values) for values in zip(*(args for args, _ in self.calls))]
+        kw_args = {key: [kwargs[key] for _, kwargs in self.calls] for key in self.calls[0][1]}
+        try:
+            self.results = list(func(*pos_args, **kw_args))
+            if len(self.results) != len(self.calls):
+                raise ValueError(f"A batch of {len(self.calls)} executions returned {len(self.results)} results.")
+        except BaseException as err:  # pylint: disable=W0703
+            self.error = err
+        finally:
+            self.done.set()
+
+
+@attr.s(repr=False)
+class BatchOp(Op):
+    """Base class of all batchable operations.
+
+    A concrete class should redefine the :meth:`_run_batch` method. Invoking :meth:`_run` then adds the execution to the current batch of the op and
+    waits for its result. The first execution of a batch waits until `max_batch_size` executions are collected or `max_delay` seconds have elapsed,
+    whichever comes first, then invokes :meth:`_run_batch` and passes the results on to the executions waiting. Executions are batched together only if they
+    pass the same number of positional arguments and the same keywords.
+
+    Executions are collected from all threads, whether they belong to the same evaluation or not. An evaluation without executor invokes the op
+    sequentially, therefore delaying every execution by `max_delay`: batch ops are meant for concurrent evaluations.
+
+    Attributes:
+        max_batch_size: The maximum number of executions in a batch.
+        max_delay: The maximum number of seconds the first execution of a batch waits for others.
+    """
+    max_batch_size = attr.ib(type=int, default=64, kw_only=True)
+    max_delay = attr.ib(type=float, default=.005, kw_only=True)
+    _pending = attr.ib(type=Dict[Tuple, _Batch], factory=dict, init=False, eq=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, eq=False)
+
+    @max_batch_size.validator
+    def _check_max_batch_size(self, _, value):
+        if value < 1:
+            raise ValueError("The maximum batch size must be at least 1.")
+
+    def __repr__(self):
+        """Return the name of the ``_run_batch`` method, see :meth:`paragraph.types.Op.__repr__`."""
+        return self._run_batch.__name__
+
+    def _run_batch(self, *args: List[Any], **kwargs: List[Any]) -> List[Any]:
+        """Execute a batch, must be implemented by all concrete classes.
+
+        Every argument is passed the list of the values of the corresponding argument in each execution. The results must be returned in the same order.
+        """
+        raise NotImplementedError
+
+    def _run(self, *args, **kwargs):
+        signature = (len(args), tuple(sorted(kwargs)))
+        with self._lock:
+            batch = self._pending.get(signature)
+            leader = batch is None
+            if leader:
+                batch = self._pending[signature] = _Batch()
+            index = len(batch.calls)
+            batch.calls.append((args, kwargs))
+            if len(batch.calls) >= self.max_batch_size:
+                del self._pending[signature]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_delay)
+            with self._lock:
+                if self._pending.get(signature) is batch:
+                    del self._pending[signature]
+            batch.execute(self._run_batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+
+def batch_op(max_batch_size: int = 64, max_delay: float = .005) -> Callable[[Callable[..., List[Any]]], BatchOp]:
+    """Return a decorator wrapping a function within a :class:`BatchOp` object.
+
+    The function decorated receives lists of argument values and must return the list of the corresponding results, see :meth:`BatchOp._run_batch`.
+
+    Arguments:
+        max_batch_size: The maximum number of executions in a batch.
+        max_delay: The maximum number of seconds the first execution of a batch waits for others.
+    """
+    def decorator(func: Callable[..., List[Any]]) -> BatchOp:
+        operation = BatchOp(max_batch_size=max_batch_size, max_delay=max_delay)
+        operation._run_batch = func
+        operation.__doc__ = func.__doc__
+        return operation
+
+    return decorator
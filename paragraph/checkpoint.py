@@ -0,0 +1,281 @@
+"""
+Checkpoints
+***********
+
+*Persisting the progress of long-running evaluations.*
+
+Passed to :func:`paragraph.session.evaluate` or :func:`paragraph.session.solve`, a :class:`Checkpoint` periodically persists to a local directory the values
+on the *frontier* of the evaluation, i.e. the values computed and still required by ops not completed yet. Should the evaluation be interrupted, a later
+evaluation of the same graph on the same inputs resumes from these values, skipping all ops they depend upon:
+
+    >>> checkpoint = Checkpoint("/var/tmp/my-job", interval=300.)
+    >>> res = pg.evaluate([output], args={input: input_value}, checkpoint=checkpoint)
+
+The checkpoint is cleared once the evaluation completes successfully.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+import types
+
+import attr
+
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Set
+
+from paragraph.types import Op, Variable
+
+_MANIFEST = "manifest.json"
+
+
+def _digest(value: Any, strict: bool = False) -> str:
+    """Return a digest of the pickled value, or of its representation if the value cannot be pickled and `strict` is False."""
+    try:
+        data = pickle.dumps(value, protocol=4)
+    except Exception as err:  # pylint: disable=W0703
+        if strict:
+            raise ValueError(f"Checkpointing requires picklable values, {value!r} is not.") from err
+        data = repr(value).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def _code_key(code: types.CodeType) -> str:
+    """Return a digest of the bytecode, names and constants of a code object, recursing into the code objects of nested functions."""
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            consts.append(_code_key(const))
+        else:
+            # The iteration order of frozensets of strings varies across processes
+            consts.append(repr(sorted(map(repr, const)) if isinstance(const, frozenset) else const))
+    return hashlib.sha256("\n".join([code.co_code.hex(), repr(code.co_names)] + consts).encode()).hexdigest()
+
+
+@attr.s
+class _Identifier:
+    """Identify variables, ops and the functions they wrap by keys stable across processes.
+
+    Attributes:
+        args: The values of the input variables evaluated, part of their identity.
+    """
+    args = attr.ib(type=Dict[Variable, Any])
+    _keys = attr.ib(type=Dict[int, str], factory=dict, init=False)
+
+    def key(self, value: Any) -> str:
+        """Return the key of a value.
+
+        Raises:
+            ValueError: If the value, or a value it holds, has no stable key, e.g. cannot be pickled.
+        """
+        if not isinstance(value, (Variable, Op, types.FunctionType, type)):
+            return self._compute(value)
+        if id(value) not in self._keys:
+            # Recursive functions refer to themselves through their closure
+            self._keys[id(value)] = f"cycle/{len(self._keys)}"
+            self._keys[id(value)] = self._compute(value)
+        return self._keys[id(value)]
+
+    def _compute(self, value: Any) -> str:
+        if isinstance(value, Variable):
+            return self._variable(value)
+        if isinstance(value, Op):
+            return self._operation(value)
+        if isinstance(value, (types.FunctionType, type)) and "<" in value.__qualname__:
+            return self._local(value)
+        if isinstance(value, (types.FunctionType, type)):
+            return f"{value.__module__}.{value.__qualname__}"
+        if isinstance(value, (list, tuple, dict)):
+            items = value.items() if isinstance(value, dict) else enumerate(value)
+            return "({})".format(", ".join(f"{key!r}: {self.key(item)}" for key, item in items))
+        return _digest(value, strict=True)
+
+    def _variable(self, var: Variable) -> str:
+        if var.isinput():
+            value = _digest(self.args[var], strict=True) if var in self.args else ""
+            return hashlib.sha256(f"input/{var.name}/{value}".encode()).hexdigest()
+
+        arguments = [f"{arg}=var:{self.key(dep)}" for arg, dep in var.dependencies.items()]
+        arguments += [f"{arg}=val:{_digest(value)}" for arg, value in var.args.items()]
+        return hashlib.sha256("\n".join([self.key(var.op)] + sorted(arguments)).encode()).hexdigest()
+
+    def _operation(self, operation: Op) -> str:
+        """Identify an op by its class, the attributes it is compared on and the function it wraps, if any."""
+        try:
+            parts = [self.key(type(operation))]
+            parts += [f"{field.name}={self.key(getattr(operation, field.name))}" for field in attr.fields(type(operation)) if field.eq]
+            parts += [f"{name}={self.key(vars(operation)[name])}" for name in ("_run", "_run_batch") if name in vars(operation)]
+        except ValueError as err:
+            raise ValueError(f"The op {operation!r} cannot be identified across evaluations, and cannot be checkpointed.") from err
+        return "\n".join(parts)
+
+    def _local(self, value: Any) -> str:
+        """Identify a function or a class defined locally, e.g. a lambda, by its code and the values it closes over."""
+        if isinstance(value, type):
+            members = sorted((name, member) for name, member in vars(value).items() if isinstance(member, types.FunctionType))
+            parts = [f"{name}={self.key(member)}" for name, member in members]
+        else:
+            parts = [_code_key(value.__code__), self.key(value.__defaults__ or ()), self.key(value.__kwdefaults__ or {})]
+            parts += [self.key(cell.cell_contents) for cell in value.__closure__ or ()]
+        return hashlib.sha256("\n".join([value.__module__, value.__qualname__] + parts).encode()).hexdigest()
+
+
+@attr.s
+class Checkpoint:
+    """A checkpoint of an evaluation, persisted in a local directory.
+
+    Variables are identified across runs by a digest of their op, of their static arguments and of the identities of their dependencies, input variables
+    being identified by their name and a digest of their value. Ops are identified by their class, the attributes they are compared on (e.g. the template of
+    a map op) and the function they wrap: functions defined at module level by their qualified name, lambdas and nested functions by their code, defaults
+    and the values they close over. Graphs built identically thus share their identities, provided ops are deterministic and input values picklable. An op
+    holding a value which cannot be pickled cannot be identified, and its graph cannot be checkpointed. Values which cannot be pickled are not persisted, and
+    are computed again upon resumption.
+
+    A checkpoint is meant for a single evaluation at a time.
+
+    Attributes:
+        directory: The directory where values are persisted, created if missing.
+        interval: The minimum number of seconds between two checkpoints. Defaults to 60.
+    """
+    directory = attr.ib(type=str)
+    interval = attr.ib(type=float, default=60.)
+    _hashes = attr.ib(type=Dict[Variable, str], factory=dict, init=False, repr=False)
+    _dependents = attr.ib(type=Dict[Variable, List[Variable]], factory=dict, init=False, repr=False)
+    _tracked = attr.ib(type=Dict[Variable, Any], factory=dict, init=False, repr=False)
+    _output = attr.ib(type=Set[Variable], factory=set, init=False, repr=False)
+    _is_pending = attr.ib(type=Callable[[Variable], bool], default=None, init=False, repr=False)
+    _last_save = attr.ib(type=float, default=0., init=False, repr=False)
+    _lock = attr.ib(factory=threading.RLock, init=False, repr=False)
+
+    def load(self, variables: List[Variable], args: Dict[Variable, Any], output: Set[Variable], is_pending: Callable[[Variable], bool]) \
+            -> Dict[Variable, Any]:
+        """Identify the variables of an evaluation, and return the values persisted for them by an earlier evaluation.
+
+        Arguments:
+            variables: All variables of the graph evaluated, in the order of a forward traversal.
+            args: The values of the input variables.
+            output: The output variables, which remain on the frontier until the evaluation completes.
+            is_pending: Whether a variable still awaits evaluation.
+
+        Returns:
+            A dictionary mapping variables onto their values restored.
+
+        Raises:
+            ValueError: If an input value cannot be pickled, or an op cannot be identified.
+        """
+        with self._lock:
+            self._hashes.clear()
+            self._dependents = defaultdict(list)
+            self._tracked.clear()
+            self._output = output
+            self._is_pending = is_pending
+            self._last_save = time.monotonic()
+
+            identifier = _Identifier(args)
+            for var in variables:
+                self._hashes[var] = identifier.key(var)
+                for dep in var.dependencies.values():
+                    self._dependents[dep].append(var)
+
+            persisted = set(self._read_manifest())
+            restored = {var: self._read(digest) for var, digest in self._hashes.items() if digest in persisted and not var.isinput()}
+            self._tracked.update(restored)
+
+        return restored
+
+    def track(self, var: Variable, value: Any):
+        """Track the value of a variable just evaluated, persisting the frontier if due."""
+        if var not in self._hashes or isinstance(value, Variable):
+            return
+
+        with self._lock:
+            self._tracked[var] = value
+        if isinstance(value, Future):
+            value.add_done_callback(lambda _: self._complete(var))
+        else:
+            self._complete(var)
+
+    def _complete(self, var: Variable):
+        """Stop tracking the dependencies of `var` no longer required, then persist the frontier if due."""
+        with self._lock:
+            for dep in var.dependencies.values():
+                if dep in self._tracked and dep not in self._output and all(self._is_finished(usage) for usage in self._dependents[dep]):
+                    del self._tracked[dep]
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def _is_finished(self, var: Variable) -> bool:
+        """Whether `var` was evaluated successfully, or will never be. The lock must be held by the caller."""
+        if var in self._tracked:
+            value = self._tracked[var]
+            return not isinstance(value, Future) or value.done() and value.exception() is None
+        return not self._is_pending(var)
+
+    def save(self):
+        """Persist the values on the frontier of the evaluation, and remove the values persisted earlier but no longer on the frontier."""
+        with self._lock:
+            self._last_save = time.monotonic()
+            frontier = {}
+            for var, value in self._tracked.items():
+                if isinstance(value, Future):
+                    if not value.done() or value.exception() is not None:
+                        continue
+                    value = value.result()
+                frontier[self._hashes[var]] = value
+
+            os.makedirs(self.directory, exist_ok=True)
+            persisted = [digest for digest, value in frontier.items() if self._write(digest, value)]
+            self._write_file(_MANIFEST, json.dumps(persisted).encode())
+            self._remove_except(set(persisted))
+
+    def clear(self):
+        """Remove all values persisted."""
+        with self._lock:
+            self._tracked.clear()
+            if os.path.isdir(self.directory):
+                self._remove_except(set())
+                self._remove(_MANIFEST)
+
+    def _read_manifest(self) -> List[str]:
+        try:
+            with open(os.path.join(self.directory, _MANIFEST)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return []
+
+    def _read(self, digest: str) -> Any:
+        with open(os.path.join(self.directory, f"{digest}.pkl"), "rb") as file:
+            return pickle.load(file)
+
+    def _write(self, digest: str, value: Any) -> bool:
+        """Persist a value unless persisted already, return whether the value is persisted."""
+        if os.path.exists(os.path.join(self.directory, f"{digest}.pkl")):
+            return True
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except Exception:  # pylint: disable=W0703
+            return False
+        self._write_file(f"{digest}.pkl", data)
+        return True
+
+    def _write_file(self, name: str, data: bytes):
+        """Write a file atomically, so that an interruption never leaves a partial file behind."""
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(path, os.path.join(self.directory, name))
+
+    def _remove_except(self, kept: set):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl") and name[:-len(".pkl")] not in kept:
+                self._remove(name)
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,173 @@
+"""
+Control flow
+************
+
+*Operations evaluating only part of their dependencies, or evaluating subgraphs dynamically.*
+
+Example:
+    >>> import paragraph as pg
+    >>> x, y = pg.Variable("x"), pg.Variable("y")
+    >>> z = pg.cond.op(x, expensive.op(y), cheap.op(y))
+    >>> pg.evaluate([z], {x: False, y: 1})  # expensive(y) is never executed
+"""
+import attr
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from paragraph import session
+from paragraph.types import ControlOp, Op, Variable
+
+
+@attr.s(repr=False)
+class Cond(ControlOp):
+    """Conditional operation: ``cond(predicate, if_true, if_false)`` returns `if_true` if `predicate` is truthy, else `if_false`."""
+    def __repr__(self):
+        return "cond"
+
+    def select(self, selector):
+        return 1 if selector else 2
+
+
+@attr.s(repr=False)
+class Switch(ControlOp):
+    """Multi-way selection: ``switch(key, *branches, **branches)``.
+
+    An integer key `i` selects the positional branch at index `i` (the key itself excluded), any other key selects the keyword branch of the same name.
+    """
+    def __repr__(self):
+        return "switch"
+
+    def select(self, selector):
+        if isinstance(selector, int):
+            return selector + 1
+        return selector
+
+
+@attr.s(repr=False)
+class And(ControlOp):
+    """Short-circuit conjunction: ``and_(a, b)`` returns `a` if it is falsy, else `b`, as does ``a and b``."""
+    def __repr__(self):
+        return "and_"
+
+    def select(self, selector):
+        return 1 if selector else 0
+
+    def arg_requirements(self, req, arg=None):
+        # The selector may be returned as well
+        return req
+
+
+@attr.s(repr=False)
+class Or(ControlOp):
+    """Short-circuit disjunction: ``or_(a, b)`` returns `a` if it is truthy, else `b`, as does ``a or b``."""
+    def __repr__(self):
+        return "or_"
+
+    def select(self, selector):
+        return 0 if selector else 1
+
+    def arg_requirements(self, req, arg=None):
+        # The selector may be returned as well
+        return req
+
+
+cond = Cond()
+switch = Switch()
+and_ = And()
+or_ = Or()
+
+
+@attr.s(repr=False)
+class Map(Op):
+    """Dynamic map of a template subgraph over the elements of a collection.
+
+    A map op applies to a single collection argument, whose length is unknown until the graph is evaluated: the session engines await the collection, then
+    evaluate the subgraph spanned by `template` once per element, binding the element to the input variable `element`. The values are gathered into a list.
+
+    The transitive dependencies of `template` that do not depend on `element` are evaluated only once: they are factored out of the subgraph as additional
+    arguments of the op, use :func:`map_` to obtain a variable with these dependencies set.
+
+    Attributes:
+        template: The variable evaluated for each element of the collection.
+        element: The input variable of the template bound to each element in turn.
+        chunk_size: If set, elements are evaluated sequentially by chunks of this size, each chunk in a single executor task. Otherwise, the default, the ops
+            of every element are submitted to the executor individually.
+        invariants: The variables factored out of the template, in the order of the additional arguments of the op.
+        placeholders: The input variables standing for the invariants within `body`.
+        body: The template subgraph, depending on `element` and `placeholders` only.
+    """
+    template = attr.ib(type=Variable)
+    element = attr.ib(type=Variable)
+    chunk_size = attr.ib(type=Optional[int], default=None)
+    invariants = attr.ib(type=List, init=False)
+    placeholders = attr.ib(type=List, init=False)
+    body = attr.ib(type=Variable, init=False)
+
+    @chunk_size.validator
+    def _chunk_size_positive(self, _, value):
+        if value is not None and value < 1:
+            raise ValueError("The chunk size must be a positive integer.")
+
+    def __attrs_post_init__(self):
+        self.invariants, self.placeholders = [], []
+        rebuilt = {self.element: self.element}
+
+        for var in session.traverse_fw([self.template]):
+            if var is self.element or var.isinput() or not any(dep in rebuilt for dep in var.dependencies.values()):
+                continue
+            for dep in var.dependencies.values():
+                if dep not in rebuilt:
+                    self.invariants.append(dep)
+                    self.placeholders.append(dep if dep.isinput() else Variable(name=repr(dep)))
+                    rebuilt[dep] = self.placeholders[-1]
+            rebuilt[var] = Variable(op=var.op, args=var.args, dependencies={arg: rebuilt[dep] for arg, dep in var.dependencies.items()})
+
+        if self.template not in rebuilt:
+            # The template does not depend on the element at all
+            self.invariants.append(self.template)
+            self.placeholders.append(self.template if self.template.isinput() else Variable(name=repr(self.template)))
+            rebuilt[self.template] = self.placeholders[-1]
+
+        self.body = rebuilt[self.template]
+
+    def __repr__(self):
+        return f"map[{self.template}]"
+
+    def arg_requirements(self, req, arg=None):
+        """Propagate the requirement on the list of values through the template.
+
+        The requirement bears on each value of the template: it is propagated through `body` to the placeholders of the invariants, and to `element`, whose
+        requirement bears on each element of the collection.
+        """
+        reqs = session.solve_requirements({self.body: req})
+        var = self.element if arg == 0 else self.placeholders[arg - 1]
+        return reqs.get(var, type(req)())
+
+    def element_args(self, item: Any, invariant_values: Iterable[Any]) -> Dict[Variable, Any]:
+        """Return the arguments initializing the inputs of `body` for the element `item`."""
+        args = dict(zip(self.placeholders, invariant_values))
+        args[self.element] = item
+        return args
+
+    def _run(self, collection, *invariant_values):
+        return [session.evaluate([self.body], self.element_args(item, invariant_values))[0] for item in collection]
+
+
+def map_(template: Variable, element: Variable, collection: Union[Variable, Iterable], chunk_size: Optional[int] = None) -> Variable:
+    """Define a variable as the list of the values of `template` for each value of `element` in `collection`.
+
+    Example:
+        >>> x = pg.Variable("x")
+        >>> squares = pg.map_(square.op(x), element=x, collection=xs)
+
+    Arguments:
+        template: The variable evaluated for each element of the collection.
+        element: The input variable of the template bound to each element in turn.
+        collection: The collection, or a variable resolving to the collection, to map over.
+        chunk_size: See :class:`Map`.
+
+    Returns:
+        The variable resolving to the list of mapped values.
+    """
+    operation = Map(template, element, chunk_size=chunk_size)
+    return operation.op(collection, *operation.invariants)
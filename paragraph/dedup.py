@@ -0,0 +1,159 @@
+"""
+Deduplication
+*************
+
+*Sharing executions of identical ops between concurrent evaluations.*
+
+Evaluations running concurrently on the same graph frequently execute the same ops on the same arguments. Passed to the session engines, a
+:class:`SingleFlight` registry keeps track of the executions in flight: an execution requested while an identical one is running attaches to the latter
+instead of starting anew.
+
+Example:
+    >>> registry = SingleFlight()
+    >>> with ThreadPoolExecutor() as ex:
+    ...     futures = [ex.submit(pg.evaluate, [output], {input: input_value}, single_flight=registry) for _ in range(4)]
+"""
+import hashlib
+import threading
+import weakref
+
+import attr
+
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional
+
+from paragraph.types import Op
+
+
+class _Unfingerprintable(Exception):
+    pass
+
+
+def _fingerprint(value: Any, keys: Mapping[Future, Hashable]) -> Hashable:  # noqa: C901
+    """Return a hashable fingerprint of `value`, equal for equal values, raise :class:`_Unfingerprintable` if none can be computed.
+
+    Futures are fingerprinted by their key in `keys`.
+    """
+    if isinstance(value, Future):
+        key = keys.get(value)
+        if key is None:
+            raise _Unfingerprintable
+        return Future, key
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_fingerprint(item, keys) for item in value)
+    if isinstance(value, dict):
+        return dict, frozenset((key, _fingerprint(item, keys)) for key, item in value.items())
+
+    try:
+        hash(value)
+        return type(value), value
+    except TypeError:
+        pass
+
+    try:
+        view = memoryview(value)
+    except TypeError:
+        raise _Unfingerprintable from None
+    contents = view.cast("B") if view.c_contiguous else view.tobytes()
+    return type(value), view.format, view.shape, hashlib.blake2b(contents).digest()
+
+
+def fingerprint(value: Any) -> Optional[Hashable]:
+    """Return a hashable fingerprint of `value`, equal for equal values as described in :class:`SingleFlight`, or None if none can be computed."""
+    try:
+        return _fingerprint(value, {})
+    except _Unfingerprintable:
+        return None
+
+
+@attr.s
+class SingleFlight:
+    """A registry of the op executions in flight, keyed by op and argument fingerprint.
+
+    Arguments are fingerprinted by value: hashable values by themselves (objects not redefining equality thus by identity), lists, tuples and dicts
+    recursively, buffers (e.g. NumPy arrays) by a digest of their contents. A future returned by the registry is fingerprinted by the key of the execution it
+    stands for, so that ops consuming the results of identical executions are identical in turn, even before these results are available. Executions
+    with any other argument, e.g. a future provided as input, are not deduplicated.
+
+    An entry is removed from the registry as soon as the execution completes: the registry does not cache results, and ops executed after an identical
+    execution has completed run again.
+
+    .. warning::
+        Executions share their results: ops should neither have side effects nor mutate their arguments or results.
+
+    Attributes:
+        hits: The number of executions attached to an identical execution in flight.
+    """
+    hits = attr.ib(type=int, default=0, init=False)
+    _flights = attr.ib(type=Dict[Hashable, Future], factory=dict, init=False)
+    _keys = attr.ib(factory=weakref.WeakKeyDictionary, init=False)
+    _lock = attr.ib(factory=threading.Lock, init=False)
+
+    def __len__(self):
+        """The number of executions in flight."""
+        return len(self._flights)
+
+    def key(self, operation: Op, args: List[Any], kwargs: Dict[str, Any]) -> Optional[Hashable]:
+        """Return the key of the execution of `operation` on the arguments provided, or None if the arguments cannot be fingerprinted."""
+        try:
+            return id(operation), _fingerprint(args, self._keys), _fingerprint(kwargs, self._keys)
+        except _Unfingerprintable:
+            return None
+
+    def run(self, operation: Op, args: List[Any], kwargs: Dict[str, Any], execute: Callable[[], Any], wait: bool = True) -> Any:
+        """Execute an op, or attach to an identical execution in flight.
+
+        Arguments:
+            operation: The op to execute.
+            args: The positional arguments of the op.
+            kwargs: The keyword arguments of the op.
+            execute: Executes the op on the arguments, returning its value or a future thereof.
+            wait: If True, the value of the op is returned, otherwise a future.
+
+        Returns:
+            The value of the op, or a future resolving to it if `wait` is False.
+        """
+        key = self.key(operation, args, kwargs)
+        if key is None:
+            value = execute()
+            return value.result() if wait and isinstance(value, Future) else value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+                self._keys[flight] = key
+                flight.set_running_or_notify_cancel()
+            else:
+                self.hits += 1
+
+        if not leader:
+            return flight.result() if wait else flight
+
+        try:
+            value = execute()
+        except BaseException as err:
+            self._complete(key, flight, None, err)
+            raise
+
+        if isinstance(value, Future):
+            value.add_done_callback(lambda future: self._complete(key, flight, *_outcome(future)))
+            return flight.result() if wait else flight
+
+        self._complete(key, flight, value, None)
+        return value
+
+    def _complete(self, key: Hashable, flight: Future, value: Any, error: Optional[BaseException]):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(value)
+
+
+def _outcome(future: Future):
+    error = future.exception()
+    return (None, error) if error is not None else (future.result(), None)
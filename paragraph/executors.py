@@ -0,0 +1,532 @@
+"""
+Executors
+*********
+
+*Executors managed by paragraph, to be passed to the session engines.*
+"""
+import math
+import os
+import threading
+import time
+import weakref
+
+import attr
+
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import chain
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from paragraph.analysis import analyze
+from paragraph.guard import GuardedOp
+from paragraph.timeline import Instrumented
+from paragraph.types import Op, Variable
+
+
+def _default_max_workers() -> int:
+    return min(32, 4 * (os.cpu_count() or 1))
+
+
+def _schedstat_times() -> Tuple[float, float]:
+    """Return the CPU time consumed by the current thread, and the time it spent runnable but waiting for a CPU, as accounted by the Linux scheduler."""
+    with open("/proc/thread-self/schedstat") as file:
+        run_time, wait_time = file.read().split()[:2]
+    return int(run_time) / 1e9, int(wait_time) / 1e9
+
+
+def _cpu_times() -> Tuple[float, float]:
+    """Return the CPU time consumed by the current thread, the time spent waiting for a CPU being unknown."""
+    return time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID), 0.
+
+
+def _available_thread_times() -> Optional[Callable[[], Tuple[float, float]]]:
+    for thread_times in (_schedstat_times, _cpu_times):
+        try:
+            thread_times()
+        except (AttributeError, OSError, ValueError):
+            continue
+        return thread_times
+    return None
+
+
+# The most accurate measurement of the times of a thread available on this platform, if any
+_thread_times = _available_thread_times()
+
+
+def _measure() -> Optional[Tuple[float, float, float]]:
+    """Return the wall-clock time, with the times of the current thread, or None if the latter cannot be measured."""
+    if _thread_times is None:
+        return None
+    try:
+        return (time.perf_counter(), *_thread_times())
+    except OSError:
+        return None
+
+
+@attr.s
+class OpStatistics:
+    """Running measurements of the executions of an op.
+
+    The CPU time of the executing thread serves as a proxy for the time spent holding the GIL: the proxy is exact for pure-Python ops, while I/O and
+    sleeping do not consume any CPU time. Extensions releasing the GIL while computing (e.g. NumPy) are overestimated. The time the thread spent runnable
+    but descheduled by the OS, e.g. on a loaded host, is measured on Linux and excluded from the duration the GIL could be held.
+
+    Measurements are exponentially weighted, so that the statistics follow changes in the behavior of the op.
+
+    Attributes:
+        count: The number of executions measured.
+        wall_time: The weighted average of the wall-clock duration of an execution.
+        cpu_time: The weighted average of the CPU time consumed by the executing thread.
+        wait_time: The weighted average of the time the executing thread spent waiting for a CPU, zero where it cannot be measured.
+    """
+    count = attr.ib(type=int, default=0)
+    wall_time = attr.ib(type=float, default=0.)
+    cpu_time = attr.ib(type=float, default=0.)
+    wait_time = attr.ib(type=float, default=0.)
+
+    def update(self, wall_time: float, cpu_time: float, smoothing: float, wait_time: float = 0.):
+        weight = max(smoothing, 1. / (self.count + 1))
+        self.wall_time += weight * (wall_time - self.wall_time)
+        self.cpu_time += weight * (cpu_time - self.cpu_time)
+        self.wait_time += weight * (wait_time - self.wait_time)
+        self.count += 1
+
+    @property
+    def gil_fraction(self) -> float:
+        """The estimated fraction of the duration spent holding the GIL, out of the duration the executing thread was given a CPU or awaited the GIL."""
+        available = self.wall_time - self.wait_time
+        return min(1., self.cpu_time / available) if available > 0 else 0.
+
+
+def _unwrap(fn: Callable) -> Callable:
+    """Return the op executed by `fn`, stripped of the callables guarding or instrumenting it."""
+    while isinstance(fn, (GuardedOp, Instrumented)):
+        fn = fn.operation if isinstance(fn, GuardedOp) else fn.run
+    return fn
+
+
+@attr.s
+class _Task:
+    fn = attr.ib()
+    args = attr.ib(type=tuple)
+    kwargs = attr.ib(type=dict)
+    future = attr.ib(type=Future, factory=Future)
+
+    def resolved_args(self):
+        return Op.resolve_args(self.args, self.kwargs)
+
+
+@attr.s
+class AdaptiveExecutor(Executor):
+    """A thread pool sizing itself after the parallelism available and the measured GIL contention.
+
+    A task submitted is queued only once its future arguments are resolved, and receives their results: workers never block waiting for another op, and
+    the number of tasks queued or running is the parallelism currently offered by the graph evaluated. Worker threads are started as long as queued tasks
+    outnumber idle threads, up to a target size, and threads beyond the target exit as soon as they complete their current task.
+
+    The target size is updated every `interval` seconds from the CPU time consumed by the tasks, a proxy of the time spent holding the GIL (see
+    :class:`OpStatistics`). Tasks running concurrently wait for the GIL, which lowers the fraction `s` of their duration during which they hold it: if the
+    tasks consume `u` CPU-seconds per second, the others hold the GIL at most a fraction `u - s` of the duration of a task, which would thus hold the GIL
+    a fraction `s / (1 - u + s)` of its duration if run alone. The target is the inverse of the latter, i.e. the number of such tasks saturating the GIL:
+    pure-Python ops get few threads, I/O-bound ops many. Should the tasks consume more than one CPU-second per second, ops release the GIL while computing
+    and the pool is sized to saturate all CPUs instead.
+
+    The CPU time of a thread is measured where the platform supports it, otherwise the target remains `max_workers`.
+
+    If a `process_executor` is provided, ops holding the GIL for more than `offload_threshold` of their duration are submitted to it once measured
+    `min_samples` times. Such ops and their arguments must be picklable.
+
+    Example:
+        >>> with AdaptiveExecutor.for_graph([output], process_executor=ProcessPoolExecutor()) as ex:
+        ...     res = pg.evaluate([output], args={input: input_value}, executor=ex)
+
+    Attributes:
+        min_workers: The minimum number of worker threads. Defaults to 1.
+        max_workers: The maximum number of worker threads. Defaults to 32 or four times the number of CPUs, whichever is smaller.
+        interval: The number of seconds between two updates of the target size.
+        idle_timeout: The number of seconds after which an idle worker thread exits.
+        smoothing: The weight of the latest measurement in the statistics of the ops.
+        process_executor: An executor to which ops bound by the GIL are offloaded. If None (the default), all ops run in threads.
+        offload_threshold: The fraction of time spent holding the GIL above which an op is offloaded.
+        min_samples: The number of executions measured before an op can be offloaded.
+        target: The current target size of the pool.
+        stats: Maps the identity of each op executed, see :func:`id`, onto its statistics. Ops of the same name, e.g. lambdas, are measured apart.
+    """
+    min_workers = attr.ib(type=int, default=1)
+    max_workers = attr.ib(type=int, factory=_default_max_workers)
+    interval = attr.ib(type=float, default=.1)
+    idle_timeout = attr.ib(type=float, default=1.)
+    smoothing = attr.ib(type=float, default=.1)
+    process_executor = attr.ib(type=Optional[Executor], default=None)
+    offload_threshold = attr.ib(type=float, default=.9)
+    min_samples = attr.ib(type=int, default=5)
+    target = attr.ib(type=int, init=False)
+    stats = attr.ib(type=Dict[int, OpStatistics], factory=dict, init=False)
+    _refs = attr.ib(type=Dict[int, weakref.ref], factory=dict, init=False)
+    _window = attr.ib(type=OpStatistics, factory=OpStatistics, init=False)
+    _window_start = attr.ib(type=float, factory=time.perf_counter, init=False)
+    _queue = attr.ib(type=Deque[_Task], factory=deque, init=False)
+    _threads = attr.ib(type=List[threading.Thread], factory=list, init=False)
+    _running = attr.ib(type=int, default=0, init=False)
+    _shutdown = attr.ib(type=bool, default=False, init=False)
+    _condition = attr.ib(factory=threading.Condition, init=False)
+
+    @max_workers.validator
+    def _check_bounds(self, _, value):
+        if not 1 <= self.min_workers <= value:
+            raise ValueError("The numbers of workers must satisfy 1 <= min_workers <= max_workers.")
+
+    def __attrs_post_init__(self):
+        self.target = self.max_workers
+
+    @classmethod
+    def for_graph(cls, output: Iterable[Variable], **kwargs) -> "AdaptiveExecutor":
+        """Return an executor whose maximum size is the parallelism offered by the graph spanned by `output`, see :func:`paragraph.analysis.analyze`."""
+        max_workers = min(kwargs.pop("max_workers", _default_max_workers()), max(analyze(output).max_parallelism, 1))
+        return cls(min_workers=min(kwargs.pop("min_workers", 1), max_workers), max_workers=max_workers, **kwargs)
+
+    @property
+    def num_workers(self) -> int:
+        """The current number of worker threads."""
+        return len(self._threads)
+
+    def statistics(self, fn: Callable) -> Optional[OpStatistics]:
+        """Return the statistics of the op executed by `fn`, or None if it was never measured."""
+        return self.stats.get(id(_unwrap(fn)))
+
+    def _measured(self, fn: Callable) -> OpStatistics:
+        """Return the statistics of the op executed by `fn`, created if missing. The condition must be held by the caller.
+
+        The statistics of an op are discarded once it is garbage-collected, its identity being then reusable.
+        """
+        operation = _unwrap(fn)
+        key = id(operation)
+        if key not in self.stats:
+            self.stats[key] = OpStatistics()
+            try:
+                self._refs[key] = weakref.ref(operation, lambda _, stats=self.stats, refs=self._refs: (stats.pop(key, None), refs.pop(key, None)))
+            except TypeError:
+                # Objects not supporting weak references, e.g. builtin functions, are usually never collected
+                pass
+        return self.stats[key]
+
+    def target_size(self, window: OpStatistics, elapsed: float) -> int:
+        """Return the target size of the pool for the tasks measured in `window`, plain averages over `elapsed` seconds."""
+        # CPU-seconds consumed per second, and average number of tasks running
+        utilization = window.cpu_time * window.count / elapsed
+        concurrency = window.wall_time * window.count / elapsed
+
+        if utilization > 1.1:
+            target = math.ceil(concurrency * (os.cpu_count() or 1) / utilization)
+        else:
+            share = window.gil_fraction
+            target = math.ceil((1. - min(utilization, 1.) + share) / share) if share > 0 else self.max_workers
+
+        return max(self.min_workers, min(self.max_workers, target))
+
+    def _update_target(self):
+        """Update the target size from the measurements of the current window, which is then reset. The condition must be held by the caller."""
+        elapsed = time.perf_counter() - self._window_start
+        if elapsed < self.interval or self._window.count == 0:
+            return
+
+        self.target = self.target_size(self._window, elapsed)
+        self._window = OpStatistics()
+        self._window_start = time.perf_counter()
+
+    def submit(self, fn, *args, **kwargs) -> Future:  # pylint: disable=W0221
+        """Schedule `fn` for execution once all its future arguments are resolved, passing their results instead."""
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot schedule new tasks after shutdown.")
+
+        task = _Task(fn=fn, args=args, kwargs=kwargs)
+        futures = [arg for arg in chain(args, kwargs.values()) if isinstance(arg, Future)]
+        remaining = [len(futures)]
+
+        def on_resolved(_):
+            with self._condition:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            self._dispatch(task)
+
+        if len(futures) == 0:
+            self._dispatch(task)
+        for future in futures:
+            future.add_done_callback(on_resolved)
+
+        return task.future
+
+    def _dispatch(self, task: _Task):
+        stats = self.statistics(task.fn)
+        if self.process_executor is not None and stats is not None and stats.count >= self.min_samples \
+                and stats.gil_fraction >= self.offload_threshold:
+            self._offload(task)
+            return
+
+        with self._condition:
+            self._queue.append(task)
+            self._grow()
+            self._condition.notify()
+
+    def _grow(self):
+        """Start worker threads while tasks outnumber idle threads, up to the target size. The condition must be held by the caller."""
+        while len(self._queue) > len(self._threads) - self._running and len(self._threads) < self.target:
+            thread = threading.Thread(target=self._work, name=f"paragraph-adaptive-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _offload(self, task: _Task):
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            pos_args, kw_args = task.resolved_args()
+            inner = self.process_executor.submit(task.fn, *pos_args, **kw_args)
+        except BaseException as err:  # pylint: disable=W0703
+            task.future.set_exception(err)
+            return
+
+        def on_done(future):
+            if future.exception() is not None:
+                task.future.set_exception(future.exception())
+            else:
+                task.future.set_result(future.result())
+
+        inner.add_done_callback(on_done)
+
+    def _next_task(self) -> Optional[_Task]:
+        """Wait for a task to run, return None if the calling worker thread should exit."""
+        with self._condition:
+            while len(self._threads) <= self.target:
+                if len(self._queue) > 0:
+                    self._running += 1
+                    return self._queue.popleft()
+                if self._shutdown or not self._condition.wait(timeout=self.idle_timeout) and len(self._threads) > self.min_workers:
+                    break
+
+            self._threads.remove(threading.current_thread())
+            return None
+
+    def _work(self):
+        for task in iter(self._next_task, None):
+            if task.future.set_running_or_notify_cancel():
+                self._execute(task)
+            with self._condition:
+                self._running -= 1
+
+    def _execute(self, task: _Task):
+        start = None
+        try:
+            start = _measure()
+            pos_args, kw_args = task.resolved_args()
+            result = task.fn(*pos_args, **kw_args)
+        except BaseException as err:  # pylint: disable=W0703
+            task.future.set_exception(err)
+        else:
+            task.future.set_result(result)
+
+        end = _measure() if start is not None else None
+        with self._condition:
+            if end is not None:
+                wall_time, cpu_time, wait_time = (stop - begin for stop, begin in zip(end, start))
+                self._measured(task.fn).update(wall_time, cpu_time, self.smoothing, wait_time)
+                # Plain averages over the window
+                self._window.update(wall_time, cpu_time, 0., wait_time)
+                self._update_target()
+            self._grow()
+
+    def shutdown(self, wait: bool = True, **kwargs):  # pylint: disable=W0221
+        """Signal the worker threads to exit once the queue is empty, and wait for them if `wait` is True.
+
+        The process executor, if any, is left running.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+@attr.s(eq=False, repr=False)
+class _Tenant(Executor):
+    """The executor of a single evaluation scheduled by a :class:`FairScheduler`."""
+    scheduler = attr.ib(type="FairScheduler")
+    priority = attr.ib(type=int)
+    weight = attr.ib(type=float)
+    max_in_flight = attr.ib(type=Optional[int])
+    queue = attr.ib(type=Deque[_Task], factory=deque, init=False)
+    in_flight = attr.ib(type=int, default=0, init=False)
+    virtual_time = attr.ib(type=float, default=0., init=False)
+    duration = attr.ib(type=Optional[float], default=None, init=False)
+
+    @weight.validator
+    def _check_weight(self, _, value):
+        if value <= 0.:
+            raise ValueError(f"The weight must be positive, got {value}.")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(priority={self.priority}, weight={self.weight}, max_in_flight={self.max_in_flight})"
+
+    @property
+    def pending(self) -> int:
+        """The number of tasks ready and waiting for dispatch."""
+        return len(self.queue)
+
+    @property
+    def eligible(self) -> bool:
+        return len(self.queue) > 0 and (self.max_in_flight is None or self.in_flight < self.max_in_flight)
+
+    def submit(self, fn, *args, **kwargs) -> Future:  # pylint: disable=W0221
+        """Schedule `fn` for execution once all its future arguments are resolved, passing their results instead."""
+        task = _Task(fn=fn, args=args, kwargs=kwargs)
+        futures = [arg for arg in chain(args, kwargs.values()) if isinstance(arg, Future)]
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_resolved(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            self.scheduler._enqueue(self, task)
+
+        if len(futures) == 0:
+            self.scheduler._enqueue(self, task)
+        for future in futures:
+            future.add_done_callback(on_resolved)
+
+        return task.future
+
+
+@attr.s
+class FairScheduler:
+    """Share an executor between concurrent evaluations, such that large graphs do not starve small ones.
+
+    Each evaluation is passed its own executor, obtained from :meth:`executor`. Ops are queued per evaluation once their future arguments are resolved,
+    and dispatched to the shared executor such that at most `max_workers` ops are in flight at any time: the queue of the shared executor never grows
+    beyond the number of its workers, and an op submitted by a small evaluation waits for the completion of as many ops only.
+
+    Whenever a worker is free, the op dispatched is the oldest op of an evaluation with:
+
+      - the highest priority, evaluations of lower priority being served only when no evaluation of higher priority has ops ready,
+      - among these, the least service received so far, the service being the cumulated duration of the ops of an evaluation divided by its weight
+        (weighted fair queuing). The duration of an op is estimated from the previous ops of the evaluation upon dispatch, and corrected upon completion.
+
+    An evaluation arriving or resuming after an idle period starts from the service of the evaluations served meanwhile, so that it does not claim the
+    service it left unused.
+
+    Example:
+        >>> scheduler = FairScheduler(ThreadPoolExecutor(max_workers=8), max_workers=8)
+        >>> # In each request handler
+        >>> res = pg.evaluate([output], args={input: input_value}, executor=scheduler.executor(priority=1, max_in_flight=4))
+
+    Attributes:
+        inner: The executor shared, which the scheduler never shuts down.
+        max_workers: The maximum number of ops in flight in the shared executor, usually the number of its workers: executors do not expose the latter.
+        smoothing: The weight of the latest duration in the estimate of the duration of the ops of an evaluation.
+    """
+    inner = attr.ib(type=Executor)
+    max_workers = attr.ib(type=int)
+    smoothing = attr.ib(type=float, default=.1)
+    _tenants = attr.ib(type=List[_Tenant], factory=list, init=False)
+    _in_flight = attr.ib(type=int, default=0, init=False)
+    _virtual_time = attr.ib(type=float, default=0., init=False)
+    _duration = attr.ib(type=Optional[float], default=None, init=False)
+    _lock = attr.ib(factory=threading.Lock, init=False)
+
+    @max_workers.validator
+    def _check_workers(self, _, value):
+        if value < 1:
+            raise ValueError("The number of workers must be at least 1.")
+
+    @property
+    def in_flight(self) -> int:
+        """The number of ops dispatched to the shared executor and not completed yet."""
+        return self._in_flight
+
+    def executor(self, priority: int = 0, weight: float = 1., max_in_flight: Optional[int] = None) -> Executor:
+        """Return the executor of a new evaluation.
+
+        Arguments:
+            priority: The priority of the evaluation, the higher the sooner its ops are dispatched.
+            weight: The share of the workers granted to the evaluation, relative to the other evaluations of the same priority.
+            max_in_flight: The maximum number of ops of the evaluation in flight at any time. If None (the default), only `max_workers` applies.
+        """
+        return _Tenant(self, priority, weight, max_in_flight)
+
+    def _enqueue(self, tenant: _Tenant, task: _Task):
+        failed = [arg for arg in chain(task.args, task.kwargs.values()) if isinstance(arg, Future) and arg.exception() is not None]
+        if len(failed) > 0:
+            if task.future.set_running_or_notify_cancel():
+                task.future.set_exception(failed[0].exception())
+            return
+
+        with self._lock:
+            if tenant.in_flight == 0 and len(tenant.queue) == 0:
+                # Unused service is not accumulated while idle
+                tenant.virtual_time = max(tenant.virtual_time, self._virtual_time)
+                self._tenants.append(tenant)
+            tenant.queue.append(task)
+            dispatched = self._select()
+        self._dispatch(dispatched)
+
+    def _select(self) -> List[tuple]:
+        """Select the tasks to dispatch until the workers are busy. The lock must be held by the caller."""
+        selected = []
+        while self._in_flight < self.max_workers:
+            eligible = [tenant for tenant in self._tenants if tenant.eligible]
+            if len(eligible) == 0:
+                break
+
+            tenant = max(eligible, key=lambda candidate: (candidate.priority, -candidate.virtual_time))
+            task = tenant.queue.popleft()
+            if not task.future.set_running_or_notify_cancel():
+                self._retire(tenant)
+                continue
+
+            self._virtual_time = tenant.virtual_time
+            estimate = next(duration for duration in (tenant.duration, self._duration, 1e-3) if duration is not None)
+            tenant.virtual_time += estimate / tenant.weight
+            tenant.in_flight += 1
+            self._in_flight += 1
+            selected.append((tenant, task, estimate))
+        return selected
+
+    def _retire(self, tenant: _Tenant):
+        """Stop considering a tenant left without tasks. The lock must be held by the caller."""
+        if tenant.in_flight == 0 and len(tenant.queue) == 0:
+            self._tenants.remove(tenant)
+
+    def _dispatch(self, selected: List[tuple]):
+        for tenant, task, estimate in selected:
+            start = time.perf_counter()
+            try:
+                pos_args, kw_args = task.resolved_args()
+                inner = self.inner.submit(task.fn, *pos_args, **kw_args)
+            except BaseException as err:  # pylint: disable=W0703
+                self._complete(tenant, task, start, estimate, None, err)
+                continue
+            inner.add_done_callback(lambda future, tenant=tenant, task=task, start=start, estimate=estimate:
+                                    self._complete(tenant, task, start, estimate, future, None))
+
+    def _complete(self, tenant: _Tenant, task: _Task, start: float, estimate: float, future: Optional[Future], error: Optional[BaseException]):
+        duration = time.perf_counter() - start
+        with self._lock:
+            tenant.virtual_time += (duration - estimate) / tenant.weight
+            tenant.duration = duration if tenant.duration is None else tenant.duration + self.smoothing * (duration - tenant.duration)
+            self._duration = duration if self._duration is None else self._duration + self.smoothing * (duration - self._duration)
+            tenant.in_flight -= 1
+            self._in_flight -= 1
+            self._retire(tenant)
+            dispatched = self._select()
+
+        if error is None and future.exception() is not None:
+            error = future.exception()
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(future.result())
+        self._dispatch(dispatched)
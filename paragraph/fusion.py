@@ -0,0 +1,244 @@
+"""
+Fusion
+******
+
+*Fusing chains of elementwise NumPy ops into blocked kernels.*
+
+Each op of a graph built from elementwise functions, such as ``paragraph.wrap.numpy.add`` or ``paragraph.wrap.operator.mul``, allocates a full temporary
+array. The pass :func:`fuse` rewrites a graph, replacing every tree of elementwise ops whose intermediate values are used once only with a single
+:class:`FusedOp`. The latter evaluates the whole tree block by block, each block being small enough to remain in the CPU cache, into preallocated buffers
+passed as the ``out=`` argument of the ufuncs:
+
+    >>> from paragraph.wrap import numpy as pnp
+    >>> output = pnp.add.op(pnp.multiply.op(input, 2.), pnp.sqrt.op(input))
+    >>> fused, = fuse([output])
+    >>> fused.op
+    fused(multiply, sqrt, add)
+    >>> res = pg.evaluate([fused], args={input: large_array})
+
+Ops are elementwise if they wrap a NumPy ufunc with a single output, ``numpy.where``, or a function of the ``operator`` module equivalent to such a ufunc,
+and are invoked with exactly as many positional arguments. All other ops are left untouched. If no argument of a fused op turns out to be an array at
+evaluation time, e.g. lists, strings or Python numbers, or if an argument overrides ufuncs, e.g. a masked array or another subclass of ndarray, the
+functions of its ops are executed one by one on the values unchanged instead.
+"""
+import operator
+
+import attr
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from paragraph import session
+from paragraph.types import Op, Variable
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+# Marks ``numpy.where``, which is elementwise but not a ufunc
+_WHERE = "where"
+
+_OPERATOR_UFUNCS = {
+    operator.add: "add", operator.sub: "subtract", operator.mul: "multiply", operator.truediv: "true_divide", operator.floordiv: "floor_divide",
+    operator.mod: "remainder", operator.pow: "power", operator.neg: "negative", operator.pos: "positive", operator.abs: "absolute",
+    operator.lt: "less", operator.le: "less_equal", operator.gt: "greater", operator.ge: "greater_equal", operator.eq: "equal", operator.ne: "not_equal",
+    operator.and_: "bitwise_and", operator.or_: "bitwise_or", operator.xor: "bitwise_xor", operator.invert: "invert",
+}
+
+# An operand refers either to a positional argument of the fused op, or to the result of an earlier instruction
+Operand = Tuple[str, int]
+# An instruction holds the ufunc applied to arrays, the function of the op it stands for, and its operands
+Instruction = Tuple[Any, Callable, Tuple[Operand, ...]]
+
+
+def _kernel(var: Variable) -> Optional[Any]:
+    """Return the ufunc applied elementwise by the op of `var`, or None if the variable cannot be fused."""
+    if numpy is None or var.isinput():
+        return None
+
+    run = getattr(var.op, "_run", None)
+    if run is numpy.where:
+        kernel, nin = _WHERE, 3
+    elif isinstance(run, numpy.ufunc) and run.nout == 1:
+        kernel, nin = run, run.nin
+    elif _is_hashable(run) and run in _OPERATOR_UFUNCS:
+        kernel = getattr(numpy, _OPERATOR_UFUNCS[run])
+        nin = kernel.nin
+    else:
+        return None
+
+    # Keyword arguments, e.g. ``dtype``, are not supported
+    return kernel if set(var.args) | set(var.dependencies) == set(range(nin)) else None
+
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _overrides_ufuncs(value: Any) -> bool:
+    """Whether a value defines its own behaviour under ufuncs, e.g. a masked array or another subclass of ndarray, which blocked kernels would lose."""
+    return type(value) is not numpy.ndarray and not isinstance(value, numpy.generic) and hasattr(type(value), "__array_ufunc__")
+
+
+def _name(kernel: Any) -> str:
+    return kernel if kernel == _WHERE else kernel.__name__
+
+
+@attr.s(repr=False)
+class FusedOp(Op):
+    """An op evaluating a tree of elementwise ops in a single blocked kernel.
+
+    Arrays are evaluated by blocks of consecutive rows (along the first axis) of about `block_size` elements. Intermediate results are written into
+    buffers of the size of a block, allocated once, and the final result directly into the output array. If no argument is a plain array, or if an argument
+    overrides ufuncs (subclasses of ndarray, objects defining ``__array_ufunc__``), the functions of the ops fused are called instead, so that the result is
+    that of the ops unfused, e.g. a concatenation of lists or a masked array.
+
+    Attributes:
+        instructions: The ufuncs to apply in turn, along with the functions of the ops they stand for and their operands, the last instruction yielding
+          the result.
+        block_size: The number of elements per block. Defaults to 16384, e.g. 128 KiB of double precision values.
+    """
+    instructions = attr.ib(type=Tuple[Instruction, ...])
+    block_size = attr.ib(type=int, default=2 ** 14)
+
+    def __repr__(self):
+        return "fused({})".format(", ".join(_name(kernel) for kernel, _, _ in self.instructions))
+
+    def _execute(self, args: List[Any], buffers: Optional[List[Any]] = None) -> List[Any]:
+        """Execute all instructions, writing into `buffers` if provided, and return their results."""
+        results = []
+
+        def value(operand: Operand) -> Any:
+            kind, ref = operand
+            return args[ref] if kind == "arg" else results[ref]
+
+        for pos, (kernel, _, operands) in enumerate(self.instructions):
+            values = [value(operand) for operand in operands]
+            out = buffers[pos] if buffers is not None else None
+            if kernel == _WHERE:
+                if out is None:
+                    results.append(numpy.where(*values))
+                    continue
+                numpy.copyto(out, values[2])
+                numpy.copyto(out, values[1], where=values[0])
+                results.append(out)
+            else:
+                results.append(kernel(*values) if out is None else kernel(*values, out=out))
+
+        return results
+
+    def _apply(self, args: Tuple[Any, ...]) -> Any:
+        """Call the functions of the ops fused in turn, and return the result of the last one."""
+        results = []
+        for _, function, operands in self.instructions:
+            results.append(function(*[args[ref] if kind == "arg" else results[ref] for kind, ref in operands]))
+        return results[-1]
+
+    def _run(self, *args):
+        if not any(type(value) is numpy.ndarray for value in args) or any(_overrides_ufuncs(value) for value in args):
+            return self._apply(args)
+
+        args = [value if isinstance(value, numpy.ndarray) or numpy.isscalar(value) else numpy.asarray(value) for value in args]
+        arrays = [value for value in args if isinstance(value, numpy.ndarray)]
+        shape = numpy.broadcast(*arrays).shape if len(arrays) <= 32 else ()
+        if len(shape) == 0:
+            # Nothing to block, the ops are executed one by one
+            return self._execute(args)[-1]
+
+        args = [numpy.broadcast_to(value, shape) if isinstance(value, numpy.ndarray) else value for value in args]
+
+        # The types of the intermediate results are resolved on a single element
+        sample = self._execute([value[(slice(0, 1),) * len(shape)] if isinstance(value, numpy.ndarray) else value for value in args])
+        row_size = int(numpy.prod(shape[1:]))
+        num_rows = max(1, self.block_size // max(row_size, 1))
+        buffers = [numpy.empty((num_rows,) + shape[1:], dtype=result.dtype) for result in sample[:-1]]
+        output = numpy.empty(shape, dtype=sample[-1].dtype)
+
+        for start in range(0, shape[0], num_rows):
+            stop = min(start + num_rows, shape[0])
+            block_args = [value[start:stop] if isinstance(value, numpy.ndarray) else value for value in args]
+            self._execute(block_args, [buffer[:stop - start] for buffer in buffers] + [output[start:stop]])
+
+        return output
+
+
+def _scan(output: List[Variable]) -> Tuple[Dict[Variable, Any], Dict[Variable, List[Variable]]]:
+    """Return the kernels of all variables of the graph, and the variables using each variable, once per usage."""
+    kernels, consumers = {}, defaultdict(list)
+    for var in session.traverse_fw(output):
+        kernels[var] = _kernel(var)
+        for dep in var.dependencies.values():
+            consumers[dep].append(var)
+    return kernels, consumers
+
+
+def fuse(output: Iterable[Variable], block_size: int = 2 ** 14) -> List[Variable]:
+    """Rewrite the graph spanned by the output variables, fusing trees of elementwise ops into :class:`FusedOp` instances.
+
+    An elementwise op is fused into the elementwise op consuming its value if the latter is its only usage and the variable is not an output. Trees of a
+    single op are left untouched, as are all variables not depending on a fused op.
+
+    Arguments:
+        output: The output variables.
+        block_size: See :class:`FusedOp`.
+
+    Returns:
+        A list of variables of the same size as `output`, evaluating to the same values.
+    """
+    output = list(output)
+    outputs = set(output)
+    kernels, consumers = _scan(output)
+
+    def absorbed(value: Any) -> bool:
+        return isinstance(value, Variable) and kernels[value] is not None and value not in outputs and len(consumers[value]) == 1 \
+            and kernels[consumers[value][0]] is not None
+
+    rebuilt = {}
+    for var in session.traverse_fw(output):
+        if absorbed(var):
+            continue
+        if kernels[var] is not None and any(absorbed(dep) for dep in var.dependencies.values()):
+            rebuilt[var] = _fused_variable(var, kernels, absorbed, rebuilt, block_size)
+        elif any(rebuilt[dep] is not dep for dep in var.dependencies.values()):
+            rebuilt[var] = Variable(op=var.op, args=var.args, dependencies={arg: rebuilt[dep] for arg, dep in var.dependencies.items()})
+        else:
+            rebuilt[var] = var
+
+    return [rebuilt[var] for var in output]
+
+
+def _fused_variable(root: Variable, kernels: Dict[Variable, Any], absorbed: Callable[[Any], bool], rebuilt: Dict[Variable, Variable],
+                    block_size: int) -> Variable:
+    """Compile the tree of absorbed variables rooted at `root` into a fused op, and return the variable it defines."""
+    instructions, results, leaves, constants = [], {}, {}, []
+
+    def operand(value: Any) -> Operand:
+        if absorbed(value):
+            return "tmp", results[value]
+        if isinstance(value, Variable):
+            return "arg", leaves.setdefault(value, len(leaves) + len(constants))
+        constants.append(value)
+        return "arg", len(leaves) + len(constants) - 1
+
+    # Post-order traversal of the tree, each variable being visited twice: once to push its absorbed operands, then to emit its instruction
+    stack = [(root, False)]
+    while len(stack) > 0:
+        var, ready = stack.pop()
+        arguments = [var.dependencies[pos] if pos in var.dependencies else var.args[pos] for pos in range(len(var.args) + len(var.dependencies))]
+        if not ready:
+            stack.append((var, True))
+            stack.extend((value, False) for value in reversed(arguments) if absorbed(value))
+            continue
+
+        results[var] = len(instructions)
+        instructions.append((kernels[var], var.op._run, tuple(operand(value) for value in arguments)))
+
+    const_positions = sorted(set(range(len(leaves) + len(constants))) - set(leaves.values()))
+    fused = FusedOp(instructions=tuple(instructions), block_size=block_size, thread_safe=all(var.op.thread_safe for var in results))
+    return Variable(op=fused, args=dict(zip(const_positions, constants)),
+                    dependencies={pos: rebuilt[leaf] for leaf, pos in leaves.items()})
@@ -0,0 +1,111 @@
+"""
+Guards
+******
+
+*Protecting argument values against mutation by ops.*
+
+Ops must never mutate their arguments, as the order in which they are executed is not under the control of the author of a graph. Rather than copying
+arguments defensively, ops can be evaluated in a guarded mode, passed to :func:`paragraph.session.evaluate`:
+
+    ``"read_only"``
+        Values supporting the buffer protocol are handed to ops as read-only views, without copy: NumPy arrays with the write flag cleared, read-only
+        memoryviews for other writable buffers (e.g. bytearrays). Mutating these views raises an exception.
+
+    ``"checksum"``
+        A debug mode, which in addition checksums all other argument values before and after executing each op, and raises a RuntimeError if a value has
+        changed. Values which can be neither pickled nor viewed as buffers are not checked.
+
+Example:
+    >>> res = pg.evaluate([output], args={input: large_array}, guard="read_only")
+"""
+import hashlib
+import pickle
+
+import attr
+
+from itertools import chain
+from typing import Any, Optional
+
+from paragraph.types import Op
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+READ_ONLY = "read_only"
+CHECKSUM = "checksum"
+MODES = (READ_ONLY, CHECKSUM)
+
+
+def read_only(value: Any) -> Any:
+    """Return a read-only view of `value` if the latter is a writable buffer, `value` itself otherwise.
+
+    Buffers other than NumPy arrays are returned as memoryviews, from Python 3.8 on only.
+    """
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        if not value.flags.writeable:
+            return value
+        view = value.view()
+        view.flags.writeable = False
+        return view
+
+    try:
+        view = memoryview(value)
+    except TypeError:
+        return value
+    if view.readonly or not hasattr(view, "toreadonly"):
+        return value
+    return view.toreadonly()
+
+
+def checksum(value: Any) -> Optional[bytes]:
+    """Return a digest of the contents of `value`, or None if the latter can be neither viewed as a buffer nor pickled."""
+    try:
+        view = memoryview(value)
+        data = view.cast("B") if view.c_contiguous else view.tobytes()
+    except TypeError:
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except Exception:  # pylint: disable=W0703
+            return None
+    return hashlib.blake2b(data).digest()
+
+
+@attr.s(frozen=True, repr=False)
+class GuardedOp:
+    """Execute an op on guarded arguments, awaiting future arguments first.
+
+    Attributes:
+        operation: The op to execute.
+        mode: One of the guard modes, see :mod:`paragraph.guard`.
+    """
+    operation = attr.ib(type=Op)
+    mode = attr.ib(type=str)
+
+    @mode.validator
+    def _check_mode(self, _, value):
+        if value not in MODES:
+            raise ValueError(f"Unknown guard mode {value}, expected one of {', '.join(MODES)}.")
+
+    def __repr__(self):
+        return repr(self.operation)
+
+    def __call__(self, *args, **kwargs):
+        pos_args, kw_args = Op.resolve_args(args, kwargs)
+        arguments = dict(chain(enumerate(pos_args), kw_args.items()))
+        guarded = {arg: read_only(value) for arg, value in arguments.items()}
+
+        # Read-only values need no check
+        checksums = {}
+        if self.mode == CHECKSUM:
+            checksums = {arg: checksum(value) for arg, value in arguments.items() if guarded[arg] is value}
+
+        pos_args, kw_args = Op.split_args(guarded)
+        result = self.operation(*pos_args, **kw_args)
+
+        for arg, digest in checksums.items():
+            if digest is not None and checksum(arguments[arg]) != digest:
+                raise RuntimeError(f"The op {self.operation} mutated its argument {arg}.")
+
+        return result
@@ -0,0 +1,236 @@
+"""
+Memory
+******
+
+*Accounting for the memory held and allocated by evaluations.*
+
+Passed to :func:`paragraph.session.evaluate`, :func:`paragraph.session.solve` or :func:`paragraph.session.apply`, a :class:`MemoryMonitor` estimates the
+size of every value held by the session engine as it is stored, and sums them up after each step of the evaluation, i.e. once a value is stored and the
+values it consumed last are released. Every run yields a :class:`MemoryReport` of the peak of the live set, of the values held at the peak and,
+optionally, of the memory allocated by every op, as traced by :mod:`tracemalloc`:
+
+    >>> monitor = MemoryMonitor(trace_allocations=True)
+    >>> res = pg.evaluate([output], args={input: input_value}, memory=monitor)
+    >>> print(monitor.reports[-1])
+    evaluate: peak of 1.2 GB at step 17
+    ...
+"""
+import sys
+import threading
+import tracemalloc
+
+import attr
+
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from paragraph.types import Variable
+from paragraph.timeline import Instrumented
+
+
+def size_of(value: Any) -> Optional[int]:
+    """Estimate the size of a value in bytes.
+
+    The size of a value supporting the buffer protocol (bytes, NumPy arrays,...) is that of its buffer, and the shallow size of the value otherwise. The
+    sizes of the results of multi-output ops are summed up, and the size of a future is that of its result, or None if not available yet.
+    """
+    if isinstance(value, Future):
+        return size_of(value.result()) if value.done() and value.exception() is None else None
+    if isinstance(value, tuple):
+        return sum(size_of(item) or 0 for item in value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return memoryview(value).nbytes
+    except TypeError:
+        return sys.getsizeof(value)
+
+
+def _parts(value: Any) -> List[Tuple[int, int]]:
+    """Return the identities and sizes of the objects making up a value, the results of multi-output ops being accounted for individually."""
+    if isinstance(value, tuple):
+        return [part for item in value for part in _parts(item)]
+    return [(id(value), size_of(value) or 0)]
+
+
+def _format_size(size: float) -> str:
+    for unit in ["B", "kB", "MB", "GB"]:
+        if size < 1000.:
+            break
+        size /= 1000.
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+
+
+@attr.s(frozen=True)
+class MemoryReport:
+    """The memory accounting of a run.
+
+    Attributes:
+        name: The session function run, e.g. ``"evaluate"``.
+        peak_bytes: The maximum estimated size of the values held at once.
+        peak_step: The index in `live_bytes` of the peak.
+        held_at_peak: The variables held at the peak, along with the estimated sizes of their values, largest first. Objects held by several variables are
+          listed under each, but accounted for once in `peak_bytes`.
+        live_bytes: The estimated size of the values held after each step, starting with the arguments.
+        allocations: The memory allocated by the executions of each op, net of the memory freed meanwhile, largest first. Empty unless allocations are
+          traced.
+    """
+    name = attr.ib(type=str)
+    peak_bytes = attr.ib(type=int)
+    peak_step = attr.ib(type=int)
+    held_at_peak = attr.ib(type=List[Tuple[Variable, int]])
+    live_bytes = attr.ib(type=List[int])
+    allocations = attr.ib(type=List[Tuple[str, int]])
+
+    def __str__(self):
+        lines = [f"{self.name}: peak of {_format_size(self.peak_bytes)} at step {self.peak_step}"]
+        lines += [f"  held {_format_size(size)}: {var!r}" for var, size in self.held_at_peak[:10]]
+        lines += [f"  allocated {_format_size(size)}: {name}" for name, size in self.allocations[:10]]
+        return "\n".join(lines)
+
+
+@attr.s
+class MemoryLedger:
+    """The memory accounting of a single run, kept by the session engine.
+
+    The session engine reports every value it stores and releases, and closes a step after every value stored. Objects held by several variables, e.g. the
+    results of a multi-output op and its outputs, are accounted for once.
+
+    Attributes:
+        monitor: The monitor the report of the run is handed to upon closing.
+        name: The session function run.
+    """
+    monitor = attr.ib(type="MemoryMonitor")
+    name = attr.ib(type=str)
+    _held = attr.ib(type=Dict[Variable, Tuple[List[Tuple[int, int]], int]], factory=dict, init=False)
+    _pending = attr.ib(type=Dict[Variable, Future], factory=dict, init=False)
+    _refs = attr.ib(type=Counter, factory=Counter, init=False)
+    _live = attr.ib(type=int, default=0, init=False)
+    _released = attr.ib(type=List[Tuple[Variable, int, int, int]], factory=list, init=False)
+    _live_bytes = attr.ib(type=List[int], factory=list, init=False)
+    _peak_step = attr.ib(type=Optional[int], default=None, init=False)
+    _allocations = attr.ib(type=Counter, factory=Counter, init=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+
+    def hold(self, var: Variable, value: Any):
+        """Account for the value of a variable stored, from the current step on, or from the step following its completion if a future."""
+        self.drop(var)
+        if isinstance(value, Future):
+            if not value.done():
+                self._pending[var] = value
+                return
+            value = value.result() if value.exception() is None else ()
+
+        parts = _parts(value)
+        for ident, size in parts:
+            self._refs[ident] += 1
+            if self._refs[ident] == 1:
+                self._live += size
+        self._held[var] = parts, len(self._live_bytes)
+
+    def drop(self, var: Variable):
+        """Account for the release of the value of a variable, from the current step on."""
+        if self._pending.pop(var, None) is not None or var not in self._held:
+            return
+
+        parts, first_step = self._held.pop(var)
+        for ident, size in parts:
+            self._refs[ident] -= 1
+            if self._refs[ident] == 0:
+                del self._refs[ident]
+                self._live -= size
+        self._released.append((var, sum(size for _, size in parts), first_step, len(self._live_bytes)))
+
+    def step(self):
+        """Close the current step, accounting for the futures completed meanwhile."""
+        for var in [var for var, future in self._pending.items() if future.done()]:
+            self.hold(var, self._pending.pop(var))
+
+        if self._peak_step is None or self._live > self._live_bytes[self._peak_step]:
+            self._peak_step = len(self._live_bytes)
+        self._live_bytes.append(self._live)
+
+    def held_at(self, step: int) -> List[Tuple[Variable, int]]:
+        """Return the variables held at a step, along with the estimated sizes of their values, largest first."""
+        held = [(var, sum(size for _, size in parts), first_step, len(self._live_bytes)) for var, (parts, first_step) in self._held.items()]
+        return sorted(((var, size) for var, size, first_step, last_step in self._released + held if first_step <= step < last_step),
+                      key=lambda item: -item[1])
+
+    def track(self, run: Callable, var: Variable) -> Callable:
+        """Return a callable executing `run` for the variable `var`, accounting for the memory it allocates if allocations are traced."""
+        return _Tracked(run, self, var) if self.monitor.trace_allocations else run
+
+    def allocated(self, var: Variable, size: int):
+        """Account for the memory allocated by an execution of the op of `var`."""
+        with self._lock:
+            self._allocations[repr(var.op)] += size
+
+    def close(self):
+        """Hand the report of the run over to the monitor."""
+        peak_step = self._peak_step or 0
+        with self._lock:
+            allocations = self._allocations.most_common()
+        self.monitor.add(MemoryReport(name=self.name, peak_bytes=self._live_bytes[peak_step] if self._live_bytes else 0, peak_step=peak_step,
+                                      held_at_peak=self.held_at(peak_step), live_bytes=self._live_bytes, allocations=allocations))
+
+
+@attr.s
+class MemoryMonitor:
+    """Account for the memory held and allocated by evaluations, and keep a report of every run.
+
+    Sizes are estimated by :func:`size_of`, and the values of futures are accounted for from the first step following their completion. Values held by
+    the evaluations of the bodies of map ops are not accounted for.
+
+    Allocations are traced by :mod:`tracemalloc` while runs are in progress, at a significant cost in speed and memory. As tracemalloc accounts for all
+    threads at once, allocations are attributed exactly to ops executed sequentially only: with an executor, the memory allocated by ops executing
+    concurrently is attributed to one another. Ops executed in other processes are not traced.
+
+    Attributes:
+        trace_allocations: Whether to trace the memory allocated by every op. Defaults to False.
+        max_reports: The maximum number of reports kept, older reports being dropped first. Defaults to 100.
+        reports: The reports of the runs completed, whether successfully or not, the latest last.
+    """
+    trace_allocations = attr.ib(type=bool, default=False)
+    max_reports = attr.ib(type=int, default=100)
+    reports = attr.ib(type=Deque[MemoryReport], init=False)
+    _num_running = attr.ib(type=int, default=0, init=False, repr=False)
+    _started_tracing = attr.ib(type=bool, default=False, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+
+    @reports.default
+    def _init_reports(self):
+        return deque(maxlen=self.max_reports)
+
+    def start(self, name: str) -> MemoryLedger:
+        """Start accounting for a run of the session function `name`, tracing allocations if requested."""
+        with self._lock:
+            self._num_running += 1
+            if self.trace_allocations and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        return MemoryLedger(self, name)
+
+    def add(self, report: MemoryReport):
+        """Keep the report of a run completed, and stop tracing allocations once all runs are completed."""
+        with self._lock:
+            self.reports.append(report)
+            self._num_running -= 1
+            if self._num_running == 0 and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+
+@attr.s(frozen=True, repr=False)
+class _Tracked(Instrumented):
+    """Execute an op, awaiting future arguments first, and account for the memory allocated by the execution."""
+    ledger = attr.ib(type=MemoryLedger)
+    var = attr.ib(type=Variable)
+
+    def execute(self, pos_args: List[Any], kw_args: Dict[str, Any]) -> Any:
+        start = tracemalloc.get_traced_memory()[0]
+        try:
+            return self.run(*pos_args, **kw_args)
+        finally:
+            self.ledger.allocated(self.var, tracemalloc.get_traced_memory()[0] - start)
@@ -0,0 +1,160 @@
+"""
+Rematerialization
+*****************
+
+*Trading compute for memory by evaluating values twice.*
+
+The session engines retain every value until its last usage. A large value used both early and late in the evaluation thus stays in memory all along, even
+if it is cheap to compute. The function :func:`plan_rematerialization` selects such values, which the engine then releases after their early usages and
+evaluates again just before their late usages, provided this lowers the peak memory within a compute budget:
+
+    >>> plan = plan_rematerialization([output], sizes=lambda var: sizes.get(var.op, 0), costs=lambda var: costs.get(var.op, 1.), budget=10.)
+    >>> plan.memory_saved, plan.compute_added
+    (2048.0, 1.0)
+    >>> res = pg.evaluate([output], args={input: input_value}, rematerialization=plan)
+
+Plans are computed for the sequential order of evaluation, and remain valid, if not optimal, with an executor.
+"""
+import math
+
+import attr
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from paragraph import control, session
+from paragraph.types import ControlOp, Output, Variable
+
+
+def _unit(var: Variable) -> float:
+    return 0. if var.isinput() or isinstance(var.op, Output) else 1.
+
+
+@attr.s(frozen=True)
+class RematerializationPlan:
+    """The values to evaluate twice during an evaluation.
+
+    Attributes:
+        early_uses: Maps each variable to evaluate twice onto the number of its usages served by its first evaluation.
+        peak_memory: The estimated peak memory of the evaluation, in the units of the size hints.
+        planned_peak_memory: The estimated peak memory of the evaluation with rematerialization.
+        memory_saved: The difference between both estimates above.
+        compute_added: The cumulated cost of the ops evaluated twice, in the units of the cost hints.
+    """
+    early_uses = attr.ib(type=Dict[Variable, int])
+    peak_memory = attr.ib(type=float)
+    planned_peak_memory = attr.ib(type=float)
+    compute_added = attr.ib(type=float)
+
+    @property
+    def memory_saved(self) -> float:
+        return self.peak_memory - self.planned_peak_memory
+
+
+@attr.s
+class _Timeline:
+    """The live ranges of the values of a sequential evaluation, in steps of the forward traversal."""
+    steps = attr.ib(type=Dict[Variable, int])
+    uses = attr.ib(type=Dict[Variable, List[int]])
+    output = attr.ib(type=set)
+    sizes = attr.ib(type=Callable[[Variable], float])
+
+    def ranges(self, splits: Dict[Variable, int]) -> Dict[Variable, List[Tuple[int, int]]]:
+        """Return the live ranges of all values, given the number of early usages of the variables evaluated twice."""
+        end = len(self.steps)
+        last = {var: end if var in self.output else max(self.uses[var], default=self.steps[var]) for var in self.steps}
+        # Input values are held from the start of the evaluation
+        ranges = {var: [(0 if var.isinput() else self.steps[var], last[var])] for var in self.steps}
+
+        for var, num_early in splits.items():
+            uses = self.uses[var]
+            ranges[var] = [(self.steps[var], uses[num_early - 1]), (uses[num_early], last[var])]
+            # The dependencies are retained until evaluated again
+            for dep in var.dependencies.values():
+                start, stop = ranges[dep][-1]
+                ranges[dep][-1] = (start, max(stop, uses[num_early]))
+
+        return ranges
+
+    def peak(self, splits: Dict[Variable, int]) -> Tuple[float, int]:
+        """Return the peak memory, and the step at which it is reached."""
+        deltas = [0.] * (len(self.steps) + 2)
+        for var, ranges in self.ranges(splits).items():
+            for start, stop in ranges:
+                deltas[start] += self.sizes(var)
+                deltas[stop + 1] -= self.sizes(var)
+
+        peak, peak_step, memory = -math.inf, 0, 0.
+        for step, delta in enumerate(deltas[:-1]):
+            memory += delta
+            if memory > peak:
+                peak, peak_step = memory, step
+        return peak, peak_step
+
+
+def _rematerializable(var: Variable, output: set) -> bool:
+    return not var.isinput() and var not in output and not isinstance(var.op, (ControlOp, control.Map))
+
+
+def plan_rematerialization(output: Iterable[Variable], sizes: Optional[Callable[[Variable], float]] = None,
+                           costs: Optional[Callable[[Variable], float]] = None, budget: float = math.inf) -> RematerializationPlan:
+    """Select values to evaluate twice, in order to lower the peak memory of an evaluation within a compute budget.
+
+    The selection is greedy: as long as the budget allows, the value retained at the peak for a late usage only, whose evaluation anew lowers the peak the
+    most per unit of cost, is selected. The dependencies of a value selected are retained until its second evaluation, which the estimates account for.
+
+    Output variables, control ops and map ops are never evaluated twice.
+
+    Arguments:
+        output: The variables to evaluate.
+        sizes: Returns the size of the value of a variable, e.g. in bytes. Defaults to 1 for every variable.
+        costs: Returns the cost of evaluating a variable, e.g. recorded durations of its op. Defaults to 1 for dependent variables and 0 for inputs and outputs
+          of multi-output ops.
+        budget: The maximum cumulated cost of the ops evaluated twice. Defaults to no limit.
+
+    Returns:
+        The plan, to be passed to :func:`paragraph.session.evaluate`.
+    """
+    output = list(output)
+    sizes, costs = sizes or (lambda var: 1.), costs or _unit
+    order = list(session.traverse_fw(output))
+    uses = defaultdict(list)
+    for step, var in enumerate(order):
+        for dep in var.dependencies.values():
+            uses[dep].append(step)
+
+    timeline = _Timeline(steps={var: step for step, var in enumerate(order)}, uses=uses, output=set(output), sizes=sizes)
+    splits = {}
+    initial_peak = peak = timeline.peak(splits)
+    compute_added = 0.
+
+    while True:
+        candidates = [var for var in order if var not in splits and _rematerializable(var, timeline.output) and compute_added + costs(var) <= budget]
+        best = _best_candidate(timeline, splits, peak, candidates, costs)
+        if best is None:
+            break
+        splits[best[0]] = best[1]
+        compute_added += costs(best[0])
+        peak = timeline.peak(splits)
+
+    return RematerializationPlan(early_uses=splits, peak_memory=initial_peak[0], planned_peak_memory=peak[0], compute_added=compute_added)
+
+
+def _best_candidate(timeline: _Timeline, splits: Dict[Variable, int], peak: Tuple[float, int], candidates: List[Variable],
+                    costs: Callable[[Variable], float]) -> Optional[Tuple[Variable, int]]:
+    """Return the candidate lowering the peak the most per unit of cost, along with its number of early usages, or None if no candidate lowers the peak."""
+    best, best_score = None, 0.
+    peak_memory, peak_step = peak
+
+    for var in candidates:
+        # Usages served by the first evaluation are those before the peak, the value must not be used at the peak itself
+        uses = timeline.uses[var]
+        num_early = sum(1 for step in uses if step < peak_step)
+        if not 0 < num_early < len(uses) or uses[num_early] == peak_step:
+            continue
+
+        score = (peak_memory - timeline.peak({**splits, var: num_early})[0]) / max(costs(var), 1e-12)
+        if score > best_score:
+            best, best_score = (var, num_early), score
+
+    return best
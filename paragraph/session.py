@@ -4,15 +4,25 @@ Session
 
 *Algorithms for traversing, solving and evaluating computation graphs*
 """
+import queue
+import threading
 import warnings
 
-from concurrent.futures import Executor, Future
-from itertools import filterfalse
-from typing import Dict, Any, List, Generator, Iterable, Optional, Tuple
+import attr
+
+from concurrent.futures import Executor, Future, as_completed
+from itertools import chain, filterfalse
+from typing import Dict, Any, List, Generator, Iterable, Optional, Tuple, Set, Union, Callable
 from collections import defaultdict, deque
 from contextlib import contextmanager
 
-from paragraph.types import Variable, Requirement, Op
+from paragraph.types import Variable, Requirement, Op, ControlOp, Output, _op_handler
+from paragraph import control, remat
+from paragraph.dedup import SingleFlight, fingerprint
+from paragraph.checkpoint import Checkpoint
+from paragraph.guard import GuardedOp, MODES as GUARD_MODES
+from paragraph.timeline import Tracer
+from paragraph.memory import MemoryLedger, MemoryMonitor
 
 
 @contextmanager
@@ -21,14 +31,17 @@ def eager_mode():
 
     In eager mode, the method ``Op.op`` is replaced with the direct invocation of the underlying method ``Op._run``. In this mode, no variable is emitted,
     allowing to test a computation graph without ever calling ``session.evaluate``.
+
+    The mode is local to the current context, i.e. it does not affect other threads or asynchronous tasks.
     """
-    op = Op.op
-    Op.op = lambda self, *a, **k: self._run(*a, **k)
-    yield
-    Op.op = op
+    token = _op_handler.set(lambda operation, *args, **kwargs: operation._run(*args, **kwargs))
+    try:
+        yield
+    finally:
+        _op_handler.reset(token)
 
 
-def traverse_fw(output: Iterable[Variable]) -> Generator[Variable, None, None]:  # noqa: C901
+def traverse_fw(output: Iterable[Variable], branches: bool = True) -> Generator[Variable, None, None]:  # noqa: C901
     """Returns a generator implementing a :term:`forward traversal` of the computation subgraph leading to `var`.
 
     The generator returned guarantees that every dependent variable occurs after all its dependencies upon iterating, whence the name `forward traversal`. When
@@ -37,6 +50,9 @@ def traverse_fw(output: Iterable[Variable]) -> Generator[Variable, None, None]:
 
     Arguments:
         output: The variables whose dependencies should be traversed.
+        branches: If False, the branch dependencies of control ops are not traversed, only their selector. Defaults to True.
+
+    The traversal runs in time linear in the number of variables and dependencies.
 
     Yields:
         All dependencies of the output variables, each variable yielded occurring before the variables depending thereupon.
@@ -44,24 +60,36 @@ def traverse_fw(output: Iterable[Variable]) -> Generator[Variable, None, None]:
     Raises:
         ValueError: If a cyclic dependency is detected in the graph.
     """
-    visited = []
+    visited = set()
 
     for var in output:
         if var in visited:
             continue
 
-        path = [var]
+        # Each variable on the path is stored along with the iterator over its dependencies left to explore
+        path = [(var, iter(_dependencies(var, branches).values()))]
+        on_path = {var}
 
         while len(path) > 0:
-            for dep in path[-1].dependencies.values():
-                if dep in path:
+            for dep in path[-1][1]:
+                if dep in on_path:
                     raise ValueError("Cyclic dependency detected for {}, cannot proceed with iteration.".format(dep))
                 if dep not in visited:
-                    path.append(dep)
+                    path.append((dep, iter(_dependencies(dep, branches).values())))
+                    on_path.add(dep)
                     break
             else:
-                yield path[-1]
-                visited.append(path.pop())
+                cur, _ = path.pop()
+                on_path.remove(cur)
+                visited.add(cur)
+                yield cur
+
+
+def _dependencies(var: Variable, branches: bool = True) -> Dict[Union[int, str], Variable]:
+    """Return the dependencies of `var`, excluding the branches of a control op unless `branches` is True."""
+    if branches or not isinstance(var.op, ControlOp):
+        return var.dependencies
+    return {arg: dep for arg, dep in var.dependencies.items() if arg == 0}
 
 
 def _count_usages(output: Iterable[Variable]) -> Dict[Variable, int]:
@@ -82,21 +110,598 @@ def _count_usages(output: Iterable[Variable]) -> Dict[Variable, int]:
     return usage_counts
 
 
-def _get_arguments(var: Variable, cache: Dict[Variable, Any], usage_counts: Dict[Variable, int], output) -> Tuple[List, Dict]:
-    arguments = {}
-    for arg, dep in var.dependencies.items():
-        usage_counts[dep] -= 1
-        if usage_counts[dep] == 0 and dep not in output:
-            value = cache.pop(dep)
+def _rebuild(var: Variable, pos_args: List, kw_args: Dict) -> Variable:
+    """Return a variable applying the op of `var` to its arguments partially resolved, the values resolved becoming static arguments.
+
+    Unlike :meth:`paragraph.types.Op.op`, the variable is returned as is for a multi-output op, standing for the tuple of its results.
+    """
+    pos_args, kw_args = Op.resolve_args(pos_args, kw_args)
+    arguments = dict(chain(enumerate(pos_args), kw_args.items()))
+    return Variable(op=var.op, args={arg: value for arg, value in arguments.items() if not isinstance(value, Variable)},
+                    dependencies={arg: value for arg, value in arguments.items() if isinstance(value, Variable)})
+
+
+def _gather(values: List[Any], transform: Callable[[List], Any] = list) -> Any:
+    """Return `transform` applied to the list of `values`, or a future resolving to it once all futures in `values` are resolved."""
+    futures = [value for value in values if isinstance(value, Future)]
+    if len(futures) == 0:
+        return transform(values)
+
+    gathered = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] > 0:
+                return
+        try:
+            gathered.set_result(transform([value.result() if isinstance(value, Future) else value for value in values]))
+        except Exception as err:  # pylint: disable=W0703
+            gathered.set_exception(err)
+
+    for future in futures:
+        future.add_done_callback(on_done)
+
+    return gathered
+
+
+def _chain(value: Any, future: Future):
+    """Resolve `future` to `value`, or to the outcome of `value` once completed if a future."""
+    if not isinstance(value, Future):
+        future.set_result(value)
+        return
+
+    def on_done(_):
+        if value.exception() is not None:
+            future.set_exception(value.exception())
+        else:
+            future.set_result(value.result())
+
+    value.add_done_callback(on_done)
+
+
+@attr.s
+class _Deferred:
+    """The work deferred by an evaluation until futures complete, run in turn by the thread evaluating the graph.
+
+    Callbacks only enqueue the work ready, so that the state of the evaluation is only ever updated by the evaluating thread.
+    """
+    _ready = attr.ib(factory=queue.SimpleQueue, init=False)
+    _pending = attr.ib(type=int, default=0, init=False)
+
+    def __len__(self):
+        return self._pending
+
+    def defer(self, future: Future, work: Callable[[], None]):
+        """Run `work` once `future` completes."""
+        self._pending += 1
+        future.add_done_callback(lambda _: self._ready.put(work))
+
+    def run_next(self):
+        """Wait for the next work ready, and run it."""
+        work = self._ready.get()
+        self._pending -= 1
+        work()
+
+
+@attr.s
+class _Evaluation:
+    """The state of a single evaluation or resolution of a computation graph.
+
+    Attributes:
+        cache: Maps variables onto their values, futures or resolved variables.
+        usage_counts: The number of usages left to consume for each variable, see :func:`_count_usages`.
+        output: The variables whose values are retained in the cache irrespective of their usages.
+        executor: The executor to which op evaluations are submitted, if any. Executors with a true attribute `remote`, such as
+          :class:`paragraph.transport.SharedMemoryExecutor`, run ops in other processes and manage the lifetime of the values they return: the values
+          released from the cache are handed back through their method `release`.
+        single_flight: The registry through which op executions are shared with concurrent evaluations, if any.
+        checkpoint: The checkpoint persisting the progress of the evaluation, if any.
+        early_uses: Maps each variable to evaluate twice onto the number of its usages left to serve before releasing its value, see
+          :mod:`paragraph.remat`.
+        guard: The mode protecting argument values against mutation by ops, if any, see :mod:`paragraph.guard`.
+        tracer: The tracer recording spans of the op executions, if the evaluation is sampled, see :mod:`paragraph.timeline`.
+        requirements: The requirements resolved on the variables, handed to the ops declaring a requirement argument, see :meth:`require`.
+        memory: The ledger accounting for the memory held and allocated by the evaluation, if any, see :mod:`paragraph.memory`.
+        released: The values released from the cache since the last call to :meth:`flush`.
+        deferred: The evaluations awaiting a future before they can proceed, shared with the evaluations of the bodies of map ops, see :meth:`defer`.
+    """
+    cache = attr.ib(type=Dict[Variable, Any])
+    usage_counts = attr.ib(type=Dict[Variable, int])
+    output = attr.ib(type=Set[Variable])
+    executor = attr.ib(type=Optional[Executor], default=None)
+    single_flight = attr.ib(type=Optional[SingleFlight], default=None)
+    checkpoint = attr.ib(type=Optional[Checkpoint], default=None)
+    early_uses = attr.ib(type=Dict[Variable, int], factory=dict)
+    guard = attr.ib(type=Optional[str], default=None)
+    tracer = attr.ib(type=Optional[Tracer], default=None)
+    requirements = attr.ib(type=Dict[Variable, Requirement], factory=dict)
+    memory = attr.ib(type=Optional[MemoryLedger], default=None)
+    released = attr.ib(type=List, factory=list)
+    deferred = attr.ib(type=_Deferred, factory=_Deferred)
+
+    @guard.validator
+    def _check_guard(self, _, value):
+        if value is not None and value not in GUARD_MODES:
+            raise ValueError(f"Unknown guard mode {value}, expected one of {', '.join(GUARD_MODES)}.")
+
+    def rematerialize(self, early_uses: Dict[Variable, int]):
+        """Schedule variables for evaluation twice, reserving a usage of their dependencies for their second evaluation."""
+        for var, num_early in early_uses.items():
+            if self.usage_counts[var] > num_early and var not in self.output:
+                self.early_uses[var] = num_early
+                for dep in var.dependencies.values():
+                    self.usage_counts[dep] += 1
+
+    def consume(self, dep: Variable) -> Any:
+        """Return the cached value of `dep` for one of its usages, releasing the reference once all usages are consumed.
+
+        A variable to evaluate twice is released once its early usages are consumed, and evaluated again upon its next usage.
+        """
+        if dep not in self.cache:
+            # Only the values released by the evaluation of `dep` may be flushed, those released before await the submission of the op consuming them
+            released, self.released = self.released, []
+            self.store(dep, self.evaluate_op(dep))
+            self.released = released
+
+        self.usage_counts[dep] -= 1
+        if self.usage_counts[dep] == 0 and dep not in self.output:
+            value = self.release(dep)
+            if self.early_uses.pop(dep, None) is not None:
+                # Never to be evaluated again, the usages reserved on the dependencies are released
+                for sub_dep in dep.dependencies.values():
+                    self.discard(sub_dep)
+            return value
+
+        value = self.cache[dep]
+        if dep in self.early_uses:
+            self.early_uses[dep] -= 1
+            if self.early_uses[dep] == 0:
+                del self.early_uses[dep]
+                self.release(dep)
+        return value
+
+    def discard(self, var: Variable):
+        """Discard a usage of `var` that will never be consumed, e.g. by a control op branch not selected.
+
+        Variables left without usage are released from the cache if already evaluated, otherwise their own dependencies are discarded in turn, as they will
+        never be evaluated.
+        """
+        stack = [var]
+
+        while len(stack) > 0:
+            cur = stack.pop()
+            self.usage_counts[cur] -= 1
+            if self.usage_counts[cur] > 0 or cur in self.output:
+                continue
+            if cur in self.cache:
+                self.release(cur)
+                if self.early_uses.pop(cur, None) is not None:
+                    stack.extend(cur.dependencies.values())
+            else:
+                self.early_uses.pop(cur, None)
+                stack.extend(cur.dependencies.values())
+
+    def release(self, var: Variable) -> Any:
+        """Remove the value of `var` from the cache, to be handed over to the executor upon the next flush, and return it."""
+        value = self.cache.pop(var)
+        self.released.append(value)
+        if self.memory is not None:
+            self.memory.drop(var)
+        return value
+
+    @property
+    def remote(self) -> bool:
+        """Whether the executor runs ops in other processes."""
+        return getattr(self.executor, "remote", False)
+
+    def flush(self):
+        """Hand the values released from the cache over to the executor, if the latter manages the lifetime of the values it returns.
+
+        This method must be called once the ops consuming the values released have been submitted.
+        """
+        if self.remote:
+            for value in self.released:
+                self.executor.release(value)
+        self.released.clear()
+
+    def store(self, var: Variable, value: Any):
+        """Store the value of a variable just evaluated in the cache, and release the values consumed."""
+        self.cache[var] = value
+        if self.checkpoint is not None:
+            self.checkpoint.track(var, value)
+        self.flush()
+        if self.memory is not None:
+            self.memory.hold(var, value)
+            self.memory.step()
+
+    def restore(self):
+        """Resume from the checkpoint, if any: restored values are stored in the cache, and the dependencies they make superfluous are discarded."""
+        if self.checkpoint is None:
+            return
+
+        restored = self.checkpoint.load(list(traverse_fw(self.output)), self.cache, self.output, self.is_pending)
+        self.cache.update(restored)
+        for var, value in restored.items():
+            if self.memory is not None:
+                self.memory.hold(var, value)
+            for dep in var.dependencies.values():
+                self.discard(dep)
+        self.flush()
+
+    def require(self, output_requirements: Dict[Variable, Requirement]):
+        """Resolve the requirements on all variables from those on the output, and prune the ops left with nothing to provide.
+
+        Ops declaring a requirement argument (see :attr:`paragraph.types.Op.requirement_arg`) whose resolved requirement is empty are not executed: their
+        value is None, and the dependencies they make superfluous are discarded.
+        """
+        missing = [var for var in self.output if var not in output_requirements]
+        if missing:
+            raise ValueError(f"No requirement provided on output variables {missing}.")
+
+        self.requirements = solve_requirements(output_requirements)
+        pruned = [var for var, req in self.requirements.items()
+                  if not var.isinput() and var.op.requirement_arg is not None and req.isempty() and var not in self.cache]
+        self.cache.update(dict.fromkeys(pruned))
+        for var in pruned:
+            for dep in var.dependencies.values():
+                self.discard(dep)
+        self.flush()
+
+    @contextmanager
+    def checkpointing(self):
+        """Resume from the checkpoint, if any, within a context manager persisting the frontier upon error, and clearing the checkpoint upon success."""
+        self.restore()
+        try:
+            yield
+        except BaseException:
+            if self.checkpoint is not None:
+                self.checkpoint.save()
+            raise
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+
+    @contextmanager
+    def tracing(self, name: str):
+        """Record a span of the body of the context manager, if the evaluation is traced."""
+        if self.tracer is None:
+            yield
+            return
+        with self.tracer.span(name):
+            yield
+
+    @contextmanager
+    def accounting(self, monitor: Optional[MemoryMonitor], name: str):
+        """Account for the memory held from the arguments on, if a monitor is given, and hand the report of the run over to the monitor upon exit."""
+        if monitor is None:
+            yield
+            return
+        self.memory = monitor.start(name)
+        for var, value in self.cache.items():
+            self.memory.hold(var, value)
+        self.memory.step()
+        try:
+            yield
+        finally:
+            self.memory.close()
+
+    def is_pending(self, var: Variable) -> bool:
+        """Whether `var` still awaits evaluation, i.e. it is neither resolved nor released by a discarded branch."""
+        return var not in self.cache and (self.usage_counts[var] > 0 or var in self.output)
+
+    def get_arguments(self, var: Variable) -> Tuple[List, Dict]:
+        arguments = {arg: self.consume(dep) for arg, dep in var.dependencies.items()}
+        arguments.update(var.args)
+        if var in self.requirements and var.op.requirement_arg is not None:
+            arguments[var.op.requirement_arg] = self.requirements[var]
+        return Op.split_args(arguments)
+
+    def get_selector(self, var: Variable) -> Any:
+        """Await and return the value of the selector of a control op, without consuming it."""
+        value = self.cache[var.dependencies[0]] if 0 in var.dependencies else var.args[0]
+        return value.result() if isinstance(value, Future) else value
+
+    def select_branch(self, var: Variable, selector: Any) -> Union[int, str]:
+        """Return the key of the argument selected by a control op, consuming its selector and discarding all other branches.
+
+        Raises:
+          ValueError: If the selector selects no argument of the control op.
+        """
+        key = var.op.select(selector)
+        if key != 0 and key not in var.dependencies and key not in var.args:
+            raise ValueError(f"The selector {selector!r} of {var} selects no branch.")
+
+        for arg, dep in var.dependencies.items():
+            if arg == 0:
+                self.consume(dep)
+            elif arg != key:
+                self.discard(dep)
+
+        return key
+
+    def evaluate(self, targets: Iterable[Variable]):
+        """Evaluate the variables in `targets`, storing their values (or futures) in the cache, then run the evaluations deferred until all are resolved."""
+        self.visit(targets)
+        while len(self.deferred) > 0:
+            self.deferred.run_next()
+
+    def visit(self, targets: Iterable[Variable]):
+        """Evaluate the variables in `targets`, storing their values (or futures) in the cache, without awaiting the evaluations deferred."""
+        for var in traverse_fw(targets, branches=False):
+            if not self.is_pending(var):
+                continue
+
+            if var.isinput():
+                warnings.warn(f"Variable {var} is uninitialized, some output variables will not be evaluated."
+                              f"This functionality will be dropped in version 2.0, use ``session.solve`` instead.",
+                              DeprecationWarning)
+                self.cache[var] = var
+                continue
+
+            if isinstance(var.op, ControlOp):
+                self.store(var, self.evaluate_control(var))
+            else:
+                self.store(var, self.evaluate_op(var))
+
+    def evaluate_op(self, var: Variable) -> Any:
+        """Evaluate a regular op, submitting it to the executor if any and thread-safe."""
+        pos_args, kw_args = self.get_arguments(var)
+
+        if isinstance(var.op, control.Map):
+            return self.evaluate_map(var.op, pos_args[0], pos_args[1:])
+
+        if isinstance(var.op, Output):
+            # The output of a multi-output op is selected inline, once the results of the op are resolved
+            results, index = pos_args
+            return _gather([results], transform=lambda values: values[0][index])
+
+        try:
+            return self.execute(var, pos_args, kw_args)
+        except Exception as err:
+            raise RuntimeError(f"Evaluating the variable {var} failed.") from err
+
+    def execute(self, var: Variable, pos_args: List, kw_args: Dict) -> Any:
+        """Execute the op of a variable, submitting it to the executor if any and thread-safe, through the single-flight registry if any."""
+        operation = var.op
+        remote = self.remote and operation.thread_safe
+        run = self.instrument(var, remote)
+
+        if self.executor is not None and operation.thread_safe:
+            def execute():
+                future = self.executor.submit(run, *pos_args, **kw_args)
+                if self.tracer is not None and remote:
+                    self.tracer.watch(future, var)
+                return future
         else:
-            value = cache[dep]
-        arguments[arg] = value
+            def execute():
+                self.settle(chain(pos_args, kw_args.values()))
+                return run(*pos_args, **kw_args)
+
+        if self.single_flight is None:
+            return execute()
+        return self.single_flight.run(operation, pos_args, kw_args, execute, wait=self.executor is None or not operation.thread_safe)
+
+    def instrument(self, var: Variable, remote: bool) -> Callable:
+        """Return the callable executing the op of a variable, guarded, accounted for and traced as requested, in the current process unless `remote`."""
+        run = var.op if self.guard is None else GuardedOp(var.op, self.guard)
+        if self.memory is not None and not remote:
+            run = self.memory.track(run, var)
+        if self.tracer is not None and not remote:
+            run = self.tracer.trace(run, var)
+        return run
+
+    def defer(self, future: Future, evaluate: Callable[[], Any]) -> Future:
+        """Return a future resolving to the value returned by `evaluate`, called by the evaluating thread once `future` completes.
+
+        Deferring the evaluations awaiting a future, e.g. that of the branch of a control op awaiting its selector, lets the evaluating thread submit all
+        other ops meanwhile.
+        """
+        placeholder = Future()
+
+        def work():
+            try:
+                value = evaluate()
+            except Exception as err:  # pylint: disable=W0703
+                placeholder.set_exception(err)
+            else:
+                _chain(value, placeholder)
+            self.flush()
+
+        self.deferred.defer(future, work)
+        return placeholder
+
+    def defers(self, value: Any) -> bool:
+        """Whether an evaluation awaiting `value` is to be deferred, i.e. `value` is a future pending and ops are submitted to an executor."""
+        return self.executor is not None and isinstance(value, Future) and not value.done()
+
+    def settle(self, values: Iterable[Any]):
+        """Run the evaluations deferred while a value is a future pending, before an op awaiting them executes in the evaluating thread."""
+        while len(self.deferred) > 0 and any(isinstance(value, Future) and not value.done() for value in values):
+            self.deferred.run_next()
+
+    def evaluate_control(self, var: Variable) -> Any:
+        """Evaluate a control op: await its selector, then evaluate the branch selected only.
+
+        With an executor, the evaluation of a control op whose selector is pending is deferred, see :meth:`defer`.
+        """
+        selector = self.cache[var.dependencies[0]] if 0 in var.dependencies else var.args[0]
+        if self.defers(selector):
+            return self.defer(selector, lambda: self.evaluate_control(var))
+
+        selector = self.get_selector(var)
+
+        if isinstance(selector, Variable):
+            # Uninitialized selector (deprecated): no branch can be selected, all are evaluated
+            self.evaluate(_branches(var))
+            pos_args, kw_args = self.get_arguments(var)
+            return var.op(*pos_args, **kw_args)
+
+        key = self.select_branch(var, selector)
+        if key == 0:
+            return selector
+        if key not in var.dependencies:
+            return var.args[key]
+
+        branch = var.dependencies[key]
+        self.visit([branch])
+        return self.consume(branch)
+
+    def evaluate_element(self, operation: control.Map, item: Any, invariant_values: Iterable[Any], usage_counts: Dict[Variable, int]) -> Any:
+        """Evaluate the body of a map op for the element `item`, submitting its ops to the executor."""
+        evaluation = _Evaluation(cache=operation.element_args(item, invariant_values), usage_counts=usage_counts.copy(), output={operation.body},
+                                 executor=self.executor, single_flight=self.single_flight, guard=self.guard, tracer=self.tracer, deferred=self.deferred)
+        evaluation.visit([operation.body])
+        value = evaluation.cache[operation.body]
+        # The value is retained by the list gathered only
+        self.released.append(value)
+        return value
+
+    def evaluate_map(self, operation: control.Map, collection: Any, invariant_values: List[Any]) -> Any:
+        """Expand a map op over the elements of the collection, once the latter is resolved.
+
+        With an executor, the expansion of a map op whose collection is pending is deferred, see :meth:`defer`.
+        """
+        if self.defers(collection):
+            return self.defer(collection, lambda: self.evaluate_map(operation, collection, invariant_values))
+
+        if isinstance(collection, Future):
+            self.settle([collection])
+            collection = collection.result()
+
+        if self.executor is None or isinstance(collection, Variable):
+            try:
+                return operation(collection, *invariant_values)
+            except Exception as err:
+                raise RuntimeError(f"Evaluating the map {operation} failed.") from err
+
+        if operation.chunk_size is None:
+            usage_counts = _count_usages([operation.body])
+            return _gather([self.evaluate_element(operation, item, invariant_values, usage_counts) for item in collection])
+
+        items = list(collection)
+        chunks = [items[start:start + operation.chunk_size] for start in range(0, len(items), operation.chunk_size)]
+        parts = [self.executor.submit(operation, chunk, *invariant_values) for chunk in chunks]
+        return _gather(parts, transform=lambda values: list(chain.from_iterable(values)))
+
+    def solve(self, targets: Iterable[Variable], defer: bool = False):
+        """Resolve the variables in `targets`, storing their values, futures or resolved variables in the cache.
 
-    arguments.update(var.args)
-    return Op.split_args(arguments)
+        If `defer` is True, no op is executed and variables are rebuilt only.
+        """
+        for var in traverse_fw(targets, branches=False):
+            if not self.is_pending(var):
+                continue
+
+            if var.isinput():
+                self.cache[var] = var
+                continue
+
+            if isinstance(var.op, ControlOp):
+                self.store(var, self.solve_control(var, defer))
+            else:
+                self.store(var, self.solve_op(var, defer))
 
+    def solve_op(self, var: Variable, defer: bool) -> Any:
+        """Resolve a regular op, executing it only if all its arguments are invariable, and selecting the outputs of multi-output ops resolved."""
+        pos_args, kw_args = self.get_arguments(var)
 
-def evaluate(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optional[Executor] = None) -> List:  # noqa: C901
+        if isinstance(var.op, Output) and not (defer or var in self.output or isinstance(pos_args[0], Variable)):
+            # The output of a multi-output op is selected inline, once the results of the op are resolved
+            results, index = pos_args
+            return _gather([results], transform=lambda values: values[0][index])
+
+        if defer or var.isdependent() or var in self.output:
+            return _rebuild(var, pos_args, kw_args)
+
+        # From this point on, the variable is to be evaluated
+        return self.execute(var, pos_args, kw_args)
+
+    def solve_control(self, var: Variable, defer: bool) -> Any:
+        """Resolve a control op: select a branch if the selector resolves to a value, otherwise rebuild the op with all branches deferred."""
+        selector = self.get_selector(var)
+
+        if isinstance(selector, Variable):
+            # The branch selected is unknown yet, branches are rebuilt but none of their ops is executed
+            self.solve(_branches(var), defer=True)
+            pos_args, kw_args = self.get_arguments(var)
+            return _rebuild(var, pos_args, kw_args)
+
+        key = self.select_branch(var, selector)
+        if key == 0:
+            return selector
+        if key not in var.dependencies:
+            return var.args[key]
+
+        branch = var.dependencies[key]
+        if var in self.output:
+            # The branch stands for the output variable, it is rebuilt rather than executed
+            self.output.add(branch)
+        self.solve([branch], defer)
+        return self.consume(branch)
+
+    def handover(self, var: Variable) -> Any:
+        """Await and return the value of an output variable, handing it over to the caller.
+
+        The value is no longer retained as output: it is released from the cache at once, or upon its last usage if other variables depend on it.
+        """
+        self.output.discard(var)
+        value = self.cache[var]
+        if isinstance(value, Future):
+            value = value.result()
+        if self.usage_counts[var] == 0:
+            self.release(var)
+            self.flush()
+        return value
+
+    def result(self, output: Iterable[Variable]) -> List:
+        """Await and return the values of the output variables, handing them over to the caller."""
+        values = [self.cache[var].result() if isinstance(self.cache[var], Future) else self.cache[var] for var in output]
+        self.released.extend(values)
+        self.flush()
+        return values
+
+
+def _check_args(args: Dict[Variable, Any]):
+    """Raise a ValueError if a variable initialized in `args` is not an input variable."""
+    for var in args:
+        if not var.isinput():
+            raise ValueError("An initialization value is provided for variable {}, but it has dependencies."
+                             "Proceeding further could result in an inconsistent evaluation.".format(var))
+
+
+def _sampled(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """Return the tracer if the evaluation is to be traced, None otherwise."""
+    return tracer if tracer is not None and tracer.sample() else None
+
+
+def _branches(var: Variable) -> List[Variable]:
+    return [dep for arg, dep in var.dependencies.items() if arg != 0]
+
+
+def _start(output: List[Variable], args: Dict[Variable, Any], executor: Optional[Executor], single_flight: Optional[SingleFlight],
+           checkpoint: Optional[Checkpoint], rematerialization: Optional["remat.RematerializationPlan"], guard: Optional[str], tracer: Optional[Tracer],
+           requirements: Optional[Dict[Variable, Requirement]]) -> _Evaluation:
+    """Return the state of an evaluation of the output variables, see :func:`evaluate` for the arguments."""
+    _check_args(args)
+    cache = args.copy()
+
+    # Discover usages so cached references can be released at earliest opportunity
+    usage_counts = _count_usages(output=output)
+
+    evaluation = _Evaluation(cache=cache, usage_counts=usage_counts, output=set(output), executor=executor, single_flight=single_flight,
+                             checkpoint=checkpoint, guard=guard, tracer=_sampled(tracer))
+    if rematerialization is not None:
+        evaluation.rematerialize(rematerialization.early_uses)
+    if requirements is not None:
+        evaluation.require(requirements)
+    return evaluation
+
+
+def evaluate(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optional[Executor] = None, single_flight: Optional[SingleFlight] = None,
+             checkpoint: Optional[Checkpoint] = None, rematerialization: Optional["remat.RematerializationPlan"] = None, guard: Optional[str] = None,
+             tracer: Optional[Tracer] = None, requirements: Optional[Dict[Variable, Requirement]] = None, memory: Optional[MemoryMonitor] = None) -> List:
     """Evaluate the specified output variable.
 
     The argument values provided through `args` should be:
@@ -106,51 +711,185 @@ def evaluate(output: Iterable[Variable], args: Dict[Variable, Any], executor: Op
     Support of arguments values of type Variable will be dropped in version 2.0 and a DeprecationWarning will be issued. The same applies if any input
     variable required to evaluate the output is left uninitialized.
 
+    Control ops (see :class:`paragraph.types.ControlOp`) are evaluated lazily: their selector is awaited first, then the branch selected only is evaluated.
+    With an executor, a control op whose selector is pending does not block the traversal: other ops are submitted meanwhile.
+    Likewise, map ops (see :class:`paragraph.control.Map`) await their collection, then submit the evaluation of their body for every element, without
+    blocking the traversal either.
+
     Arguments:
       output: The variables to evaluate.
       args: Initialization of the input variables, none of which should have dependencies.
       executor: An instance of concurrent.futures.Executor, to which op evaluations are submitted. If None, the default, evaluation proceeds sequentially.
+      single_flight: A registry shared with concurrent evaluations, see :class:`paragraph.dedup.SingleFlight`. Ops are executed once only for all the
+        evaluations requesting the same execution at the same time. If None (the default), every evaluation executes its own ops.
+      checkpoint: Persists the progress of the evaluation periodically, see :class:`paragraph.checkpoint.Checkpoint`. An evaluation interrupted resumes
+        from the last checkpoint when evaluated again with the same checkpoint directory. If None (the default), no checkpoint is taken.
+      rematerialization: The values to release after their early usages and evaluate again before their late usages, as planned by
+        :func:`paragraph.remat.plan_rematerialization`. If None (the default), every value is evaluated once.
+      guard: ``"read_only"`` to hand buffer values to ops as read-only views, ``"checksum"`` to check in addition that ops do not mutate other values, see
+        :mod:`paragraph.guard`. If None (the default), values are handed to ops as they are.
+      tracer: Records a span of every op executed, see :class:`paragraph.timeline.Tracer`, provided the evaluation is sampled. If None (the default),
+        nothing is recorded.
+      requirements: The requirements on every output variable. If not None, requirements are resolved on all variables (see :func:`solve_requirements`),
+        and handed to the ops declaring a requirement argument (see :attr:`paragraph.types.Op.requirement_arg`), e.g. to read only the slices of data
+        required. Such ops whose resolved requirement is empty are pruned, their value being None. If None (the default), no requirement is handed to ops.
+      memory: Accounts for the memory held and allocated by the evaluation, and keeps a report of its peak, see :class:`paragraph.memory.MemoryMonitor`.
+        If None (the default), memory is not accounted for.
 
     Returns:
       A list of values of the same size as `output`. The entry at index `i` is the computed value of `output[i]`.
 
     Raises:
-      ValueError: If a variable in `args` is not an input variable. In this case, the consistency of the results cannot be guaranteed.
+      ValueError: If a variable in `args` is not an input variable. In this case, the consistency of the results cannot be guaranteed. Also if
+        `requirements` is not None and misses an output variable.
     """
-    for var in args:
-        if not var.isinput():
-            raise ValueError("An initialization value is provided for variable {}, but it has dependencies."
-                             "Proceeding further could result in an inconsistent evaluation.".format(var))
-    cache = args.copy()
+    evaluation = _start(output, args, executor, single_flight, checkpoint, rematerialization, guard, tracer, requirements)
+    with evaluation.checkpointing(), evaluation.tracing("evaluate"), evaluation.accounting(memory, "evaluate"):
+        evaluation.evaluate(output)
+        return evaluation.result(output)
 
-    # Discover usages so cached references can be released at earliest opportunity
-    usage_counts = _count_usages(output=output)
 
-    for var in traverse_fw(output):
-        if var in cache:
-            continue
+def evaluate_as_completed(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optional[Executor] = None,
+                          single_flight: Optional[SingleFlight] = None, checkpoint: Optional[Checkpoint] = None,
+                          rematerialization: Optional["remat.RematerializationPlan"] = None, guard: Optional[str] = None, tracer: Optional[Tracer] = None,
+                          requirements: Optional[Dict[Variable, Requirement]] = None, memory: Optional[MemoryMonitor] = None) \
+        -> Generator[Tuple[Variable, Any], None, None]:
+    """Evaluate the specified output variables, yielding each value as soon as it is available.
 
-        if var.isinput():
-            warnings.warn(f"Variable {var} is uninitialized, some output variables will not be evaluated."
-                          f"This functionality will be dropped in version 2.0, use ``session.solve`` instead.",
-                          DeprecationWarning)
-            cache[var] = var
-            continue
+    Without executor, the output variables are evaluated in turn, each being yielded once evaluated. With an executor, all ops are submitted first, then the
+    output variables are yielded in the order of completion of their futures. Each distinct output variable is yielded once, and its value is released by the
+    generator upon yielding, unless other variables still depend on it.
+
+    Arguments:
+      output: The variables to evaluate.
+      args: Initialization of the input variables, none of which should have dependencies.
+      executor: See :func:`evaluate`.
+      single_flight: See :func:`evaluate`.
+      checkpoint: See :func:`evaluate`. The checkpoint is cleared once all output variables are yielded.
+      rematerialization: See :func:`evaluate`.
+      guard: See :func:`evaluate`.
+      tracer: See :func:`evaluate`.
+      requirements: See :func:`evaluate`.
+      memory: See :func:`evaluate`. The report covers the evaluation until all output variables are yielded.
+
+    Yields:
+      Pairs of an output variable and its value.
+
+    Raises:
+      ValueError: If a variable in `args` is not an input variable. In this case, the consistency of the results cannot be guaranteed. Also if
+        `requirements` is not None and misses an output variable.
+    """
+    output = list(dict.fromkeys(output))
+    evaluation = _start(output, args, executor, single_flight, checkpoint, rematerialization, guard, tracer, requirements)
+    with evaluation.checkpointing(), evaluation.tracing("evaluate_as_completed"), evaluation.accounting(memory, "evaluate_as_completed"):
+        yield from _completed(evaluation, output)
 
-        pos_args, kw_args = _get_arguments(var, cache, usage_counts, output)
 
-        if executor is not None and var.op.thread_safe:
-            cache[var] = executor.submit(var.op, *pos_args, **kw_args)
+def _completed(evaluation: _Evaluation, output: List[Variable]) -> Generator[Tuple[Variable, Any], None, None]:
+    """Evaluate the output variables, yielding each along with its value as soon as the latter is available, see :func:`evaluate_as_completed`."""
+    if evaluation.executor is None:
+        for var in output:
+            evaluation.evaluate([var])
+            yield var, evaluation.handover(var)
+        return
+
+    evaluation.evaluate(output)
+
+    pending = defaultdict(list)
+    for var in output:
+        if isinstance(evaluation.cache[var], Future):
+            pending[evaluation.cache[var]].append(var)
         else:
-            try:
-                cache[var] = var.op(*pos_args, **kw_args)
-            except Exception as err:
-                raise RuntimeError(f"Evaluating the variable {var} failed.") from err
+            yield var, evaluation.handover(var)
+
+    for future in as_completed(list(pending)):
+        for var in pending.pop(future):
+            yield var, evaluation.handover(var)
+
+
+@attr.s
+class _Merge:
+    """Merge the graphs of several queries into one, sharing the variables which evaluate to the same value in all queries.
+
+    Input variables are shared by the queries initializing them with equal values (see :func:`paragraph.dedup.fingerprint`, values without fingerprint being
+    compared by identity), and dependent variables by the queries sharing all their dependencies. Variables are rebuilt only where they cannot be shared.
+
+    Attributes:
+        args: The initialization of the input variables of the merged graph.
+    """
+    args = attr.ib(type=Dict[Variable, Any], factory=dict, init=False)
+    _merged = attr.ib(type=Dict[Tuple, Variable], factory=dict, init=False)
+    _inputs = attr.ib(type=Set[Variable], factory=set, init=False)
+
+    def add(self, output: Iterable[Variable], args: Dict[Variable, Any]) -> List[Variable]:
+        """Merge a query into the graph, and return its output variables in the merged graph."""
+        _check_args(args)
+        output = list(output)
+        rebuilt = {}
+        for var in traverse_fw(output):
+            rebuilt[var] = self._add_input(var, args) if var.isinput() else self._add_dependent(var, rebuilt)
+        return [rebuilt[var] for var in output]
+
+    def _add_input(self, var: Variable, args: Dict[Variable, Any]) -> Variable:
+        value_key = None
+        if var in args:
+            value_key = fingerprint(args[var]) or (id, id(args[var]))
+        key = var, value_key
+        if key not in self._merged:
+            merged = self._merged[key] = var if var not in self._inputs else Variable(name=var.name)
+            self._inputs.add(merged)
+            if var in args:
+                self.args[merged] = args[var]
+        return self._merged[key]
+
+    def _add_dependent(self, var: Variable, rebuilt: Dict[Variable, Variable]) -> Variable:
+        key = var, tuple(rebuilt[dep] for dep in var.dependencies.values())
+        if key not in self._merged:
+            dependencies = {arg: rebuilt[dep] for arg, dep in var.dependencies.items()}
+            unchanged = all(dependencies[arg] is dep for arg, dep in var.dependencies.items())
+            self._merged[key] = var if unchanged else Variable(op=var.op, args=var.args, dependencies=dependencies)
+        return self._merged[key]
+
 
-    return [cache[var].result() if isinstance(cache[var], Future) else cache[var] for var in output]
+def evaluate_many(queries: Iterable[Tuple[Iterable[Variable], Dict[Variable, Any]]], executor: Optional[Executor] = None,
+                  single_flight: Optional[SingleFlight] = None, checkpoint: Optional[Checkpoint] = None, guard: Optional[str] = None,
+                  tracer: Optional[Tracer] = None, memory: Optional[MemoryMonitor] = None) -> List[List]:
+    """Evaluate several queries at once, each made of output variables and the initialization of their input variables.
 
+    The graphs of all queries are merged into one, evaluated in a single pass: the ops of all queries are submitted together to the executor, and every
+    subgraph shared by several queries is evaluated once for all queries initializing its input variables with equal values. Input values are compared
+    by value where possible, see :func:`paragraph.dedup.fingerprint`, and by identity otherwise.
 
-def solve(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optional[Executor] = None) -> List:  # noqa: C901
+    Rematerialization plans and requirements bear on the variables of a single graph, and are not accepted: the variables of the merged graph differ.
+
+    Arguments:
+      queries: Pairs of output variables and initialization of input variables, as passed to :func:`evaluate`.
+      executor: See :func:`evaluate`.
+      single_flight: See :func:`evaluate`.
+      checkpoint: See :func:`evaluate`. The merged graph is checkpointed, and resumed by an evaluation of the same queries.
+      guard: See :func:`evaluate`.
+      tracer: See :func:`evaluate`. The merged graph is traced as a single evaluation.
+      memory: See :func:`evaluate`. The merged graph is reported as a single evaluation.
+
+    Returns:
+      A list of the same size as `queries`, the entry at index `i` being the list of the values of the output variables of `queries[i]`.
+
+    Raises:
+      ValueError: If a variable initialized in a query is not an input variable. In this case, the consistency of the results cannot be guaranteed.
+      RuntimeError: If an op fails, in which case no query returns.
+    """
+    merge = _Merge()
+    outputs = [merge.add(output, args) for output, args in queries]
+    merged_output = list(dict.fromkeys(var for output in outputs for var in output))
+
+    values = dict(zip(merged_output, evaluate(merged_output, merge.args, executor=executor, single_flight=single_flight, checkpoint=checkpoint, guard=guard,
+                                              tracer=tracer, memory=memory)))
+    return [[values[var] for var in output] for output in outputs]
+
+
+def solve(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optional[Executor] = None, single_flight: Optional[SingleFlight] = None,
+          checkpoint: Optional[Checkpoint] = None, guard: Optional[str] = None, tracer: Optional[Tracer] = None, memory: Optional[MemoryMonitor] = None) \
+        -> List:
     """Resolve the specified output variables.
 
     The argument values provided through `args` should be:
@@ -158,10 +897,22 @@ def solve(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optio
       - of type Variable, in which case it should evaluate to the above type,
       - of type :class:`concurrent.futures.Future`, in which case the result will be awaited by consuming ops. The result should be of either above types.
 
+    The branch of a control op is selected whenever its selector resolves to a value, other branches being discarded. Otherwise, the control op is rebuilt
+    and none of the ops in its branches is executed.
+
     Arguments:
       output: The variables to evaluate.
       args: Initialization of the input variables, none of which should have dependencies.
       executor: An instance of concurrent.futures.Executor, to which op evaluations are submitted. If None, the default, evaluation proceeds sequentially.
+      single_flight: A registry shared with concurrent evaluations, see :class:`paragraph.dedup.SingleFlight`. Ops are executed once only for all the
+        evaluations requesting the same execution at the same time. If None (the default), every evaluation executes its own ops.
+      checkpoint: Persists the progress of the evaluation periodically, see :class:`paragraph.checkpoint.Checkpoint`. An evaluation interrupted resumes
+        from the last checkpoint when evaluated again with the same checkpoint directory. With a checkpoint, values computed by the executor are
+        awaited before returning. If None (the default), no checkpoint is taken.
+      guard: ``"read_only"`` to hand buffer values to ops as read-only views, ``"checksum"`` to check in addition that ops do not mutate other values, see
+        :mod:`paragraph.guard`. If None (the default), values are handed to ops as they are.
+      tracer: See :func:`evaluate`.
+      memory: See :func:`evaluate`.
 
     Returns:
       A list of variables of the same size as `output`. The entry at index `i` is the resolved variable for `output[i]`.
@@ -169,40 +920,21 @@ def solve(output: Iterable[Variable], args: Dict[Variable, Any], executor: Optio
     Raises:
       ValueError: If a variable in `args` is not an input variable. In this case, the consistency of the results cannot be guaranteed.
     """
-    for var in args:
-        if not var.isinput():
-            raise ValueError("An initialization value is provided for variable {}, but it has dependencies."
-                             "Proceeding further could result in an inconsistent evaluation.".format(var))
+    _check_args(args)
     cache = args.copy()
 
     # Discover usages so cached references can be released at earliest opportunity
     usage_counts = _count_usages(output=output)
 
-    for var in traverse_fw(output):
-
-        if var in cache:
-            continue
-
-        if var.isinput():
-            cache[var] = var
-            continue
-
-        pos_args, kw_args = _get_arguments(var, cache, usage_counts, output)
-
-        if var.isdependent() or var in output:
-            cache[var] = var.op.op(*pos_args, **kw_args)
-            continue
-
-        # From this point on, the variable is to be evaluated
-        if executor is not None and var.op.thread_safe:
-            cache[var] = executor.submit(var.op, *pos_args, **kw_args)
-        else:
-            cache[var] = var.op(*pos_args, **kw_args)
-
-    return [cache[var] for var in output]
+    evaluation = _Evaluation(cache=cache, usage_counts=usage_counts, output=set(output), executor=executor, single_flight=single_flight,
+                             checkpoint=checkpoint, guard=guard, tracer=_sampled(tracer))
+    with evaluation.checkpointing(), evaluation.tracing("solve"), evaluation.accounting(memory, "solve"):
+        evaluation.solve(output)
+        return [cache[var].result() if checkpoint is not None and isinstance(cache[var], Future) else cache[var] for var in output]
 
 
-def apply(output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable[Dict[Variable, Any]], executor: Optional[Executor] = None)\
+def apply(output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable[Dict[Variable, Any]], executor: Optional[Executor] = None,
+          single_flight: Optional[SingleFlight] = None, tracer: Optional[Tracer] = None, memory: Optional[MemoryMonitor] = None, hook: Any = None) \
         -> Generator[List[Any], None, None]:
     """Iterate the evaluation of a set of output variables over input arguments.
 
@@ -216,6 +948,11 @@ def apply(output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable
       args: A dictionary mapping input variables onto input values.
       iter_args: An iterable over dictionaries mapping input variables onto input values.
       executor: An instance of concurrent.futures.Executor to which op evaluations are submitted. If None (the default), evaluation proceeds sequentially.
+      single_flight: A registry shared with concurrent evaluations, see :func:`evaluate`.
+      tracer: See :func:`evaluate`. The first evaluation and every iteration are sampled separately.
+      memory: See :func:`evaluate`. The first evaluation and every iteration are reported separately.
+      hook: An object whose methods ``solve`` and ``evaluate``, of the same signatures as the functions of this module, are called instead of the latter,
+        e.g. a :class:`paragraph.workload.Recorder`. If None (the default), the functions of this module are called.
 
     Yields:
       A list of values of the same size as `output`. The entry at index `i` is the computed value of `output[i]`.
@@ -223,7 +960,8 @@ def apply(output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable
     Raises:
       ValueError: If a dynamic argument assigns a value to a variable appearing in static arguments, as proceeding would produce inconsistent results.
     """
-    partial_values = dict(zip(output, solve(output, args=args, executor=executor)))
+    solve_fn, evaluate_fn = (solve, evaluate) if hook is None else (hook.solve, hook.evaluate)
+    partial_values = dict(zip(output, solve_fn(output, args=args, executor=executor, single_flight=single_flight, tracer=tracer, memory=memory)))
     unresolved_output_vars = [partial_values[var] for var in output if isinstance(partial_values[var], Variable)]
 
     for arg_dict in iter_args:
@@ -231,7 +969,9 @@ def apply(output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable
             if var in args:
                 raise ValueError(f"An initialization value for variable {var} is provided in `iter_args` and in `args`."
                                  f"Proceeding further could result in an inconsistent evaluation.")
-        iter_values = dict(zip(unresolved_output_vars, evaluate(unresolved_output_vars, args=arg_dict, executor=executor)))
+        iter_values = evaluate_fn(unresolved_output_vars, args=arg_dict, executor=executor, single_flight=single_flight, tracer=tracer,
+                                  memory=memory)
+        iter_values = dict(zip(unresolved_output_vars, iter_values))
         yield [partial_values[var] if not isinstance(partial_values[var], Variable) else iter_values[partial_values[var]] for var in output]
 
 
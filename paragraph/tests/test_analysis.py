@@ -0,0 +1,79 @@
+import pytest
+
+from paragraph.types import Variable
+from paragraph.analysis import analyze
+from paragraph.tests.test_types import mock_op
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.x = Variable("x")
+    graph.y = Variable("y")
+    graph.op_a = mock_op("a")
+    graph.op_b = mock_op("b")
+    graph.a1 = graph.op_a.op(graph.x)
+    graph.a2 = graph.op_a.op(graph.y)
+    graph.a3 = graph.op_a.op(graph.x, graph.y)
+    graph.b1 = graph.op_b.op(graph.a1, graph.a2)
+    graph.b2 = graph.op_b.op(graph.b1, graph.a3)
+    graph.output = [graph.b2]
+
+    return graph
+
+
+class TestAnalyze:
+    @staticmethod
+    def test_counts(graph):
+        stats = analyze(graph.output)
+
+        assert stats.num_inputs == 2
+        assert stats.num_nodes == 5
+        assert stats.num_edges == 8
+        assert stats.op_counts == {"a": 3, "b": 2}
+        assert stats.edge_counts == {"a": 4, "b": 4}
+
+    @staticmethod
+    def test_levels(graph):
+        stats = analyze(graph.output)
+
+        assert stats.depth == 4
+        assert stats.level_widths == [2, 3, 1, 1]
+        assert stats.max_parallelism == 3
+
+    @staticmethod
+    def test_unit_critical_path(graph):
+        stats = analyze(graph.output)
+
+        assert stats.work == 5.
+        assert stats.critical_path_length == 3.
+        assert stats.critical_path[-2:] == [graph.b1, graph.b2]
+        assert stats.critical_path[0].isinput()
+        assert stats.average_parallelism == pytest.approx(5 / 3)
+
+    @staticmethod
+    def test_weighted_critical_path(graph):
+        costs = {graph.a3: 10.}
+        stats = analyze(graph.output, costs=lambda var: costs.get(var, 0. if var.isinput() else 1.))
+
+        assert stats.critical_path_length == 11.
+        assert stats.critical_path[1:] == [graph.a3, graph.b2]
+
+    @staticmethod
+    def test_peak_live_values(graph):
+        stats = analyze(graph.output)
+
+        # After a1 and a2: x, y, a1, a2 are live; then b1 releases a1, a2; a3 releases x, y
+        assert stats.peak_live_values == 4
+
+    @staticmethod
+    def test_large_chain_runs_quickly():
+        var = Variable("x")
+        operation = mock_op("op")
+        for _ in range(20000):
+            var = operation.op(var)
+
+        stats = analyze([var])
+
+        assert stats.depth == 20001
+        assert stats.peak_live_values == 1
@@ -0,0 +1,94 @@
+import pytest
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable
+from paragraph.session import evaluate
+from paragraph.batching import BatchOp, batch_op
+
+
+@pytest.fixture
+def batched():
+    batched = lambda: None  # noqa: E731
+    batched.sizes = []
+
+    @batch_op(max_batch_size=4, max_delay=1.)
+    def add(values, offset):
+        batched.sizes.append(len(values))
+        return [value + off for value, off in zip(values, offset)]
+
+    batched.op = add
+    return batched
+
+
+class TestBatchOp:
+    @staticmethod
+    def test_repr_is_function_name(batched):
+        assert repr(batched.op) == "add"
+
+    @staticmethod
+    def test_concurrent_executions_are_batched(batched):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(batched.op, value, offset=10) for value in range(4)]
+            results = [future.result() for future in futures]
+
+        assert results == [10, 11, 12, 13]
+        assert batched.sizes == [4]
+
+    @staticmethod
+    def test_concurrent_evaluations_are_batched(batched):
+        x = Variable("x")
+        output = batched.op.op(x, offset=1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(evaluate, [output], {x: value}) for value in range(4)]
+            results = [future.result() for future in futures]
+
+        assert results == [[1], [2], [3], [4]]
+        assert batched.sizes == [4]
+
+    @staticmethod
+    def test_lone_execution_runs_after_delay():
+        operation = batch_op(max_delay=.01)(lambda values: values)
+
+        assert operation(1) == 1
+
+    @staticmethod
+    def test_different_signatures_are_not_batched(batched):
+        batched.op.max_delay = .05
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(batched.op, 1, offset=1)
+            second = executor.submit(batched.op, 1, 2)
+
+            assert (first.result(), second.result()) == (2, 3)
+        assert batched.sizes == [1, 1]
+
+    @staticmethod
+    def test_errors_are_raised_by_all_executions():
+        barrier = threading.Barrier(2)
+
+        @batch_op(max_batch_size=2, max_delay=1.)
+        def fail(values):
+            raise RuntimeError("failed")
+
+        def run(value):
+            barrier.wait()
+            return fail(value)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(run, value) for value in range(2)]
+            for future in futures:
+                with pytest.raises(RuntimeError):
+                    future.result()
+
+    @staticmethod
+    def test_wrong_number_of_results_raises():
+        operation = batch_op(max_delay=0.)(lambda values: [])
+
+        with pytest.raises(ValueError):
+            operation(1)
+
+    @staticmethod
+    def test_invalid_batch_size_raises():
+        with pytest.raises(ValueError):
+            BatchOp(max_batch_size=0)
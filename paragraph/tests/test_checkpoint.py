@@ -0,0 +1,149 @@
+import os
+import threading
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate, solve, traverse_fw
+from paragraph.control import map_
+from paragraph.checkpoint import Checkpoint
+
+CALLS = []
+
+
+@op
+def double(value):
+    CALLS.append(("double", value))
+    return 2 * value
+
+
+@op
+def fail_once(value, marker):
+    CALLS.append(("fail_once", value))
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        raise ValueError("Preempted")
+    return value + 1
+
+
+@pytest.fixture
+def graph(tmp_path):
+    CALLS.clear()
+    graph = lambda: None  # noqa: E731
+    graph.input = Variable("input")
+    graph.output = fail_once.op(double.op(graph.input), marker=str(tmp_path / "marker"))
+    graph.checkpoint = Checkpoint(str(tmp_path / "checkpoint"), interval=0.)
+
+    return graph
+
+
+class TestCheckpoint:
+    @staticmethod
+    def test_evaluation_resumes_from_frontier(graph):
+        with pytest.raises(RuntimeError):
+            evaluate([graph.output], {graph.input: 3}, checkpoint=graph.checkpoint)
+
+        assert evaluate([graph.output], {graph.input: 3}, checkpoint=graph.checkpoint) == [7]
+        assert CALLS == [("double", 3), ("fail_once", 6), ("fail_once", 6)]
+
+    @staticmethod
+    def test_parallel_evaluation_resumes_from_frontier(graph):
+        with ThreadPoolExecutor() as executor:
+            with pytest.raises(ValueError):
+                evaluate([graph.output], {graph.input: 3}, executor=executor, checkpoint=graph.checkpoint)
+            res = evaluate([graph.output], {graph.input: 3}, executor=executor, checkpoint=graph.checkpoint)
+
+        assert res == [7]
+        assert CALLS.count(("double", 3)) == 1
+
+    @staticmethod
+    def test_different_inputs_do_not_resume(graph):
+        with pytest.raises(RuntimeError):
+            evaluate([graph.output], {graph.input: 3}, checkpoint=graph.checkpoint)
+
+        assert evaluate([graph.output], {graph.input: 4}, checkpoint=graph.checkpoint) == [9]
+        assert CALLS.count(("double", 4)) == 1
+
+    @staticmethod
+    def test_checkpoint_is_cleared_upon_success(graph):
+        with pytest.raises(RuntimeError):
+            evaluate([graph.output], {graph.input: 3}, checkpoint=graph.checkpoint)
+        assert any(name.endswith(".pkl") for name in os.listdir(graph.checkpoint.directory))
+
+        evaluate([graph.output], {graph.input: 3}, checkpoint=graph.checkpoint)
+        assert os.listdir(graph.checkpoint.directory) == []
+
+    @staticmethod
+    def test_consumed_values_leave_frontier(tmp_path):
+        x = Variable("x")
+        first = double.op(x)
+        second = double.op(first)
+        output = double.op(second)
+        checkpoint = Checkpoint(str(tmp_path), interval=0.)
+        checkpoint.load([x, first, second, output], {x: 1}, {output}, lambda var: False)
+        checkpoint.track(first, 2)
+        checkpoint.track(second, 4)
+
+        assert checkpoint._tracked == {second: 4}
+
+    @staticmethod
+    def test_solve_resumes_from_frontier(graph, tmp_path):
+        # Solve executes the ops with invariable arguments only
+        output = [double.op(double.op(3)), double.op(fail_once.op(6, marker=str(tmp_path / "marker")))]
+        with pytest.raises(ValueError):
+            solve(output, {}, checkpoint=graph.checkpoint)
+        res = solve(output, {}, checkpoint=graph.checkpoint)
+
+        assert [var.args for var in res] == [{0: 6}, {0: 7}]
+        assert CALLS.count(("double", 3)) == 1
+
+    @staticmethod
+    def test_unpicklable_input_raises(graph):
+        with pytest.raises(ValueError):
+            evaluate([graph.output], {graph.input: lambda: None}, checkpoint=graph.checkpoint)
+
+    @staticmethod
+    def test_lambdas_are_told_apart(tmp_path):
+        x = Variable("x")
+        output = [op(lambda value: value + 1).op(x), op(lambda value: value * 2).op(x)]
+        checkpoint = Checkpoint(str(tmp_path), interval=0.)
+        checkpoint.load(traverse_fw(output), {x: 10}, set(output), lambda var: True)
+        checkpoint.track(output[0], 11)
+        checkpoint.save()
+
+        assert evaluate(output, {x: 10}, checkpoint=checkpoint) == [11, 20]
+
+    @staticmethod
+    def test_maps_are_told_apart(tmp_path):
+        x = Variable("x")
+        output = [map_(op(lambda value: value + 1).op(x), x, [1, 2]), map_(op(lambda value: value * 2).op(x), x, [1, 2])]
+        checkpoint = Checkpoint(str(tmp_path), interval=0.)
+        checkpoint.load(traverse_fw(output), {}, set(output), lambda var: True)
+        checkpoint.track(output[0], [2, 3])
+        checkpoint.save()
+
+        assert evaluate(output, {}, checkpoint=checkpoint) == [[2, 3], [2, 4]]
+
+    @staticmethod
+    def test_closures_are_told_apart(tmp_path):
+        def add(term):
+            return op(lambda value: value + term)
+
+        x = Variable("x")
+        output = [add(1).op(x), add(2).op(x)]
+        checkpoint = Checkpoint(str(tmp_path), interval=0.)
+        checkpoint.load(traverse_fw(output), {x: 10}, set(output), lambda var: True)
+        checkpoint.track(output[0], 11)
+        checkpoint.save()
+
+        assert evaluate(output, {x: 10}, checkpoint=checkpoint) == [11, 12]
+
+    @staticmethod
+    def test_unidentifiable_op_raises(tmp_path):
+        lock = threading.Lock()
+        output = op(lambda value: lock and value).op(Variable("x"))
+
+        with pytest.raises(ValueError):
+            evaluate([output], {output.dependencies[0]: 1}, checkpoint=Checkpoint(str(tmp_path)))
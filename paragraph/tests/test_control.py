@@ -0,0 +1,207 @@
+import time
+
+import pytest
+
+from unittest.mock import MagicMock
+
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.control import cond, switch, and_, or_, map_
+from paragraph.session import evaluate, solve, traverse_fw
+from paragraph.tests.test_types import mock_op
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.predicate = Variable("predicate")
+    graph.input = Variable("input")
+    graph.shared = mock_op("shared").op(graph.input)
+    graph.op_true = mock_op("op_true")
+    graph.op_false = mock_op("op_false")
+    graph.output = cond.op(graph.predicate, graph.op_true.op(graph.shared), graph.op_false.op(graph.shared))
+
+    return graph
+
+
+@pytest.fixture
+def thread_pool_executor():
+    with ThreadPoolExecutor() as executor:
+        yield executor
+
+
+class TestControlOps:
+    @staticmethod
+    @pytest.mark.parametrize("operation, args, expected",
+                             [pytest.param(cond, (True, "a", "b"), "a", id="cond true"),
+                              pytest.param(cond, (0, "a", "b"), "b", id="cond false"),
+                              pytest.param(switch, (1, "a", "b", "c"), "b", id="switch positional"),
+                              pytest.param(and_, (0, "b"), 0, id="and short-circuits"),
+                              pytest.param(and_, (1, "b"), "b", id="and"),
+                              pytest.param(or_, ("a", "b"), "a", id="or short-circuits"),
+                              pytest.param(or_, ("", "b"), "b", id="or")])
+    def test_invariable_invocation_returns_selected_argument(operation, args, expected):
+        assert operation(*args) == expected
+
+    @staticmethod
+    def test_switch_selects_keyword_branch():
+        assert switch("b", a=1, b=2) == 2
+
+    @staticmethod
+    def test_branches_are_not_traversed_on_request(graph):
+        assert list(traverse_fw([graph.output], branches=False)) == [graph.predicate, graph.output]
+
+
+class TestEvaluate:
+    @staticmethod
+    @pytest.mark.parametrize("predicate, expected", [(True, "op_true_return_value"), (False, "op_false_return_value")])
+    def test_sequential_evaluation_runs_selected_branch_only(graph, predicate, expected):
+        res = evaluate([graph.output], args={graph.predicate: predicate, graph.input: "input_value"})
+
+        assert res == [expected]
+        assert graph.op_true._run.called == predicate
+        assert graph.op_false._run.called != predicate
+        graph.shared.op._run.assert_called_once_with("input_value")
+
+    @staticmethod
+    def test_parallel_evaluation_runs_selected_branch_only(graph, thread_pool_executor):
+        predicate = thread_pool_executor.submit(lambda: True)
+        res = evaluate([graph.output], args={graph.predicate: predicate, graph.input: "input_value"}, executor=thread_pool_executor)
+
+        assert res == ["op_true_return_value"]
+        assert not graph.op_false._run.called
+
+    @staticmethod
+    def test_discarded_branch_releases_shared_values(graph):
+        # The shared variable is also an output, the other one is only used by the branch discarded
+        unused = mock_op("unused")
+        output = cond.op(graph.predicate, graph.shared, unused.op(graph.input))
+        res = evaluate([output, graph.shared], args={graph.predicate: True, graph.input: "input_value"})
+
+        assert res == ["shared_return_value"] * 2
+        graph.shared.op._run.assert_called_once_with("input_value")
+        assert not unused._run.called
+
+    @staticmethod
+    def test_nested_short_circuit():
+        never = op(MagicMock(__name__="never"))
+        x = Variable("x")
+        output = or_.op(and_.op(x, never.op(x)), "default")
+
+        assert evaluate([output], args={x: 0}) == ["default"]
+        assert not never._run.called
+
+    @staticmethod
+    def test_independent_control_ops_do_not_wait_for_each_other(thread_pool_executor):
+        @op
+        def slow_predicate(value):
+            time.sleep(0.2)
+            return value
+
+        outputs = [cond.op(slow_predicate.op(i % 2), "a", "b") for i in range(4)]
+        start = time.perf_counter()
+        res = evaluate(outputs, args={}, executor=thread_pool_executor)
+
+        assert res == ["b", "a", "b", "a"]
+        assert time.perf_counter() - start < 0.6
+
+    @staticmethod
+    def test_unknown_switch_key_raises(graph):
+        output = switch.op(graph.predicate, "a", graph.op_true.op(graph.shared))
+
+        with pytest.raises(ValueError, match=r"selector 5 of"):
+            evaluate([output], args={graph.predicate: 5, graph.input: "input_value"})
+        assert not graph.op_true._run.called
+
+
+class TestSolve:
+    @staticmethod
+    def test_solve_selects_branch_if_selector_resolved(graph):
+        res = solve([graph.output], args={graph.predicate: False})
+
+        assert isinstance(res[0], Variable)
+        assert res[0].op is graph.op_false
+        assert not graph.op_true._run.called
+
+    @staticmethod
+    def test_solve_rebuilds_control_op_if_selector_unresolved(graph):
+        res = solve([graph.output], args={graph.input: "input_value"})
+
+        assert res[0].op is cond
+        assert res[0].dependencies[0] is graph.predicate
+        graph.shared.op._run.assert_not_called()
+        assert evaluate(res, args={graph.predicate: True}) == ["op_true_return_value"]
+
+    @staticmethod
+    def test_solve_unknown_switch_key_raises(graph):
+        output = switch.op(graph.predicate, a="a", b=graph.op_true.op(graph.shared))
+
+        with pytest.raises(ValueError, match=r"selector 'c' of"):
+            solve([output], args={graph.predicate: "c"})
+
+
+@pytest.fixture
+def map_graph():
+    graph = lambda: None  # noqa: E731
+    graph.collection = Variable("collection")
+    graph.offset = Variable("offset")
+    graph.element = Variable("element")
+    graph.scale = op(MagicMock(__name__="scale", side_effect=lambda x: 10 * x))
+    graph.add = op(MagicMock(__name__="add", side_effect=lambda x, y: x + y))
+    template = graph.add.op(graph.element, graph.scale.op(graph.offset))
+
+    graph.output = lambda chunk_size=None: map_(template, graph.element, graph.collection, chunk_size=chunk_size)
+
+    return graph
+
+
+class TestMap:
+    @staticmethod
+    def test_invariant_dependencies_are_factored_out(map_graph):
+        output = map_graph.output()
+
+        assert len(output.op.invariants) == 1
+        assert output.op.invariants[0].dependencies == {0: map_graph.offset}
+        assert set(output.op.body.dependencies.values()) == {map_graph.element, output.op.placeholders[0]}
+
+    @staticmethod
+    def test_sequential_evaluation(map_graph):
+        res = evaluate([map_graph.output()], args={map_graph.collection: [1, 2, 3], map_graph.offset: 1})
+
+        assert res == [[11, 12, 13]]
+        map_graph.scale._run.assert_called_once_with(1)
+
+    @staticmethod
+    @pytest.mark.parametrize("chunk_size", [None, 1, 2, 5])
+    def test_parallel_evaluation(map_graph, thread_pool_executor, chunk_size):
+        collection = thread_pool_executor.submit(lambda: list(range(7)))
+        res = evaluate([map_graph.output(chunk_size)], args={map_graph.collection: collection, map_graph.offset: 1}, executor=thread_pool_executor)
+
+        assert res == [[10 + i for i in range(7)]]
+        map_graph.scale._run.assert_called_once_with(1)
+
+    @staticmethod
+    def test_independent_maps_do_not_wait_for_each_other(map_graph, thread_pool_executor):
+        @op
+        def slow_range(stop):
+            time.sleep(0.2)
+            return list(range(stop))
+
+        outputs = [map_(map_graph.scale.op(map_graph.element), map_graph.element, slow_range.op(stop)) for stop in range(4)]
+        start = time.perf_counter()
+        res = evaluate(outputs, args={}, executor=thread_pool_executor)
+
+        assert res == [[10 * i for i in range(stop)] for stop in range(4)]
+        assert time.perf_counter() - start < 0.6
+
+    @staticmethod
+    def test_empty_collection(map_graph, thread_pool_executor):
+        res = evaluate([map_graph.output()], args={map_graph.collection: [], map_graph.offset: 1}, executor=thread_pool_executor)
+
+        assert res == [[]]
+
+    @staticmethod
+    def test_invalid_chunk_size_raises(map_graph):
+        with pytest.raises(ValueError):
+            map_graph.output(chunk_size=0)
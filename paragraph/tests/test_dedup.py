@@ -0,0 +1,113 @@
+import pytest
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate
+from paragraph.dedup import SingleFlight
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.calls = []
+    graph.started = threading.Event()
+    graph.proceed = threading.Event()
+
+    @op
+    def slow(value):
+        graph.calls.append(value)
+        graph.started.set()
+        graph.proceed.wait(timeout=5)
+        return value * 2
+
+    @op
+    def inc(value):
+        return value + 1
+
+    graph.input = Variable("input")
+    graph.output = inc.op(slow.op(graph.input))
+    return graph
+
+
+def run_concurrently(graph, executor=None):
+    registry = SingleFlight()
+
+    def evaluate_second():
+        graph.started.wait(timeout=5)
+        return evaluate([graph.output], {graph.input: 3}, executor=executor, single_flight=registry)
+
+    def release_first():
+        # The execution in flight completes only once the second evaluation has attached to it
+        while registry.hits == 0:
+            time.sleep(.001)
+        graph.proceed.set()
+
+    with ThreadPoolExecutor(max_workers=3) as threads:
+        first = threads.submit(evaluate, [graph.output], {graph.input: 3}, executor=executor, single_flight=registry)
+        second = threads.submit(evaluate_second)
+        threads.submit(release_first)
+        results = [first.result(timeout=5), second.result(timeout=5)]
+
+    return registry, results
+
+
+class TestSingleFlight:
+    @staticmethod
+    def test_sequential_evaluations_share_executions(graph):
+        registry, results = run_concurrently(graph)
+
+        assert results == [[7], [7]]
+        assert graph.calls == [3]
+        # The second evaluation may attach to the execution of the op consuming the shared value as well
+        assert registry.hits >= 1
+        assert len(registry) == 0
+
+    @staticmethod
+    def test_executor_evaluations_share_executions(graph):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            registry, results = run_concurrently(graph, executor)
+
+        assert results == [[7], [7]]
+        assert graph.calls == [3]
+        assert registry.hits >= 1
+        assert len(registry) == 0
+
+    @staticmethod
+    def test_completed_executions_run_again(graph):
+        graph.proceed.set()
+        registry = SingleFlight()
+        for _ in range(2):
+            assert evaluate([graph.output], {graph.input: 3}, single_flight=registry) == [7]
+
+        assert graph.calls == [3, 3]
+        assert registry.hits == 0
+
+    @staticmethod
+    def test_different_arguments_are_not_shared():
+        registry = SingleFlight()
+        slow = op(lambda value: value)
+
+        assert registry.key(slow, [1], {}) != registry.key(slow, [1.5], {})
+        assert registry.key(slow, [[1, 2]], {"a": bytearray(b"x")}) == registry.key(slow, [[1, 2]], {"a": bytearray(b"x")})
+        assert registry.key(slow, [bytearray(b"x")], {}) != registry.key(slow, [bytearray(b"y")], {})
+
+    @staticmethod
+    def test_unfingerprintable_arguments_are_not_shared():
+        registry = SingleFlight()
+
+        assert registry.key(op(lambda value: value), [Future()], {}) is None
+        assert registry.run(op(lambda value: value), [object], {}, lambda: 1) == 1
+
+    @staticmethod
+    def test_errors_are_shared_and_entries_removed():
+        registry = SingleFlight()
+
+        def fail():
+            raise ValueError("failed")
+
+        with pytest.raises(ValueError):
+            registry.run(op(lambda: None), [], {}, fail)
+        assert len(registry) == 0
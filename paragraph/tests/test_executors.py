@@ -0,0 +1,249 @@
+import gc
+import os
+import pytest
+import threading
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate
+from paragraph.executors import AdaptiveExecutor, FairScheduler, OpStatistics, _measure
+from paragraph.tests.test_types import mock_op
+
+requires_measurements = pytest.mark.skipif(_measure() is None, reason="The times of a thread cannot be measured on this platform")
+
+
+def slow(duration):
+    time.sleep(duration)
+    return duration
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.input = Variable("input")
+    op0, op1 = mock_op("op0"), mock_op("op1")
+    output0 = op0.op(arg=graph.input)
+    graph.output = [output0, op1.op(graph.input, arg1=output0)]
+
+    return graph
+
+
+class TestOpStatistics:
+    @staticmethod
+    def test_gil_fraction():
+        stats = OpStatistics()
+        stats.update(wall_time=2., cpu_time=1., smoothing=.1)
+
+        assert stats.count == 1
+        assert stats.gil_fraction == .5
+
+    @staticmethod
+    def test_time_waiting_for_a_cpu_is_excluded():
+        stats = OpStatistics()
+        stats.update(wall_time=2., cpu_time=1., smoothing=.1, wait_time=1.)
+
+        assert stats.gil_fraction == 1.
+
+
+class TestAdaptiveExecutor:
+    @staticmethod
+    def test_evaluation_is_correct(graph):
+        with AdaptiveExecutor() as executor:
+            res = evaluate(graph.output, args={graph.input: "input_value"}, executor=executor)
+
+        assert res == ["op0_return_value", "op1_return_value"]
+
+    @staticmethod
+    def test_tasks_are_queued_once_arguments_resolved():
+        with AdaptiveExecutor(max_workers=1) as executor:
+            first = executor.submit(slow, .05)
+            second = executor.submit(lambda value: value + 1, first)
+
+            assert second.result(timeout=1) == 1.05
+
+    @staticmethod
+    def test_pool_grows_up_to_target_for_queued_tasks():
+        gate = threading.Event()
+        with AdaptiveExecutor(max_workers=8, interval=60.) as executor:
+            futures = [executor.submit(gate.wait, 5.) for _ in range(10)]
+            num_workers = executor.num_workers
+            gate.set()
+            for future in futures:
+                future.result()
+
+        assert num_workers == 8
+
+    @staticmethod
+    def test_target_is_large_for_waiting_ops():
+        executor = AdaptiveExecutor(max_workers=8)
+        window = OpStatistics(count=40, wall_time=.05, cpu_time=.0001)
+
+        assert executor.target_size(window, elapsed=.25) == 8
+
+    @staticmethod
+    def test_target_is_small_for_gil_bound_ops():
+        executor = AdaptiveExecutor(max_workers=8)
+        # Two tasks running at once, each holding the GIL half of the time
+        window = OpStatistics(count=40, wall_time=.01, cpu_time=.005)
+
+        assert executor.target_size(window, elapsed=.2) <= 2
+
+    @staticmethod
+    def test_target_is_small_for_gil_bound_ops_on_a_loaded_host():
+        executor = AdaptiveExecutor(max_workers=8)
+        # A single task running at once, descheduled by the OS 90% of the time
+        window = OpStatistics(count=20, wall_time=.01, cpu_time=.001, wait_time=.009)
+
+        assert executor.target_size(window, elapsed=.2) <= 2
+
+    @staticmethod
+    def test_gil_bound_ops_are_offloaded():
+        with ProcessPoolExecutor(max_workers=1) as processes, AdaptiveExecutor(process_executor=processes, min_samples=2) as executor:
+            measured, unmeasured = op(os.getpid), op(lambda: os.getpid())
+            executor.stats[id(measured)] = OpStatistics(count=2, wall_time=1., cpu_time=1.)
+            executor.stats[id(unmeasured)] = OpStatistics(count=1, wall_time=1., cpu_time=1.)
+
+            assert executor.submit(measured).result() != os.getpid()
+            assert executor.submit(unmeasured).result() == os.getpid()
+
+    @staticmethod
+    @requires_measurements
+    def test_ops_of_the_same_name_are_measured_apart():
+        first, second = op(lambda: 1), op(lambda: 2)
+        with AdaptiveExecutor() as executor:
+            for operation in (first, first, second):
+                executor.submit(operation).result()
+
+        assert repr(first) == repr(second)
+        assert executor.statistics(first).count == 2
+        assert executor.statistics(second).count == 1
+
+    @staticmethod
+    @requires_measurements
+    def test_statistics_are_discarded_with_the_op():
+        transient = op(lambda: 1)
+        with AdaptiveExecutor() as executor:
+            executor.submit(transient).result()
+        assert len(executor.stats) == 1
+
+        del transient
+        gc.collect()
+        assert executor.stats == {}
+
+    @staticmethod
+    def test_invalid_bounds_raise():
+        with pytest.raises(ValueError):
+            AdaptiveExecutor(min_workers=4, max_workers=2)
+
+
+@pytest.fixture
+def thread_pool():
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        yield executor
+
+
+class Concurrency:
+    """Track the maximum number of calls running concurrently."""
+    def __init__(self):
+        self.running, self.max_running = 0, 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(.01)
+        with self.lock:
+            self.running -= 1
+        return value
+
+
+def blocked_scheduler(thread_pool):
+    """Return a scheduler with a single worker, kept busy until the event returned is set."""
+    scheduler = FairScheduler(thread_pool, max_workers=1)
+    gate = threading.Event()
+    scheduler.executor().submit(gate.wait, 5.)
+    return scheduler, gate
+
+
+class TestFairScheduler:
+    @staticmethod
+    def test_max_workers_is_required(thread_pool):
+        with pytest.raises(TypeError):
+            FairScheduler(thread_pool)
+        with pytest.raises(ValueError):
+            FairScheduler(thread_pool, max_workers=0)
+
+    @staticmethod
+    def test_evaluation_is_correct(graph, thread_pool):
+        scheduler = FairScheduler(thread_pool, max_workers=8)
+        res = evaluate(graph.output, args={graph.input: "input_value"}, executor=scheduler.executor())
+
+        assert res == ["op0_return_value", "op1_return_value"]
+        assert scheduler.in_flight == 0
+
+    @staticmethod
+    @pytest.mark.parametrize("max_workers, max_in_flight", [(2, None), (8, 3)])
+    def test_ops_in_flight_are_limited(thread_pool, max_workers, max_in_flight):
+        scheduler = FairScheduler(thread_pool, max_workers=max_workers)
+        concurrency = Concurrency()
+        executor = scheduler.executor(max_in_flight=max_in_flight)
+
+        futures = [executor.submit(concurrency, value) for value in range(12)]
+
+        assert [future.result() for future in futures] == list(range(12))
+        assert concurrency.max_running <= min(max_workers, max_in_flight or max_workers)
+
+    @staticmethod
+    def test_higher_priority_is_served_first(thread_pool):
+        scheduler, gate = blocked_scheduler(thread_pool)
+        order = []
+        low, high = scheduler.executor(priority=0), scheduler.executor(priority=1)
+
+        futures = [low.submit(order.append, "low") for _ in range(3)] + [high.submit(order.append, "high") for _ in range(3)]
+        gate.set()
+        for future in futures:
+            future.result()
+
+        assert order == ["high"] * 3 + ["low"] * 3
+
+    @staticmethod
+    def test_workers_are_shared_by_weight(thread_pool):
+        scheduler, gate = blocked_scheduler(thread_pool)
+        order = []
+
+        def run(name):
+            time.sleep(.005)
+            order.append(name)
+
+        light, heavy = scheduler.executor(weight=1.), scheduler.executor(weight=3.)
+        futures = [light.submit(run, "light") for _ in range(20)] + [heavy.submit(run, "heavy") for _ in range(20)]
+        gate.set()
+        for future in futures:
+            future.result()
+
+        # Three heavy ops for every light one, give or take the jitter of the durations
+        assert 9 <= order[:16].count("heavy") <= 14
+
+    @staticmethod
+    def test_future_arguments_are_awaited(thread_pool):
+        scheduler = FairScheduler(thread_pool, max_workers=8)
+        executor = scheduler.executor()
+        argument = Future()
+
+        future = executor.submit(lambda value: 2 * value, argument)
+        assert not future.done()
+        argument.set_result(2)
+
+        assert future.result(timeout=5.) == 4
+
+    @staticmethod
+    def test_failed_argument_fails_the_op(thread_pool):
+        scheduler = FairScheduler(thread_pool, max_workers=8)
+        argument = Future()
+        argument.set_exception(ValueError("failed"))
+
+        with pytest.raises(ValueError):
+            scheduler.executor().submit(lambda value: value, argument).result(timeout=5.)
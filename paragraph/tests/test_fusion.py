@@ -0,0 +1,156 @@
+import operator
+
+import pytest
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate
+from paragraph.fusion import FusedOp, fuse
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+requires_numpy = pytest.mark.skipif(numpy is None, reason="NumPy is not installed")
+
+
+@op
+def total(value):
+    return sum(value)
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.x = Variable("x")
+    graph.y = Variable("y")
+    return graph
+
+
+@pytest.fixture
+def numpy_graph(graph):
+    graph.scaled = op(numpy.multiply).op(graph.x, 2.)
+    graph.root = op(numpy.sqrt).op(graph.x)
+    graph.sum = op(operator.add).op(graph.scaled, graph.root)
+    graph.clipped = op(numpy.where).op(op(numpy.greater).op(graph.x, 10.), 10., graph.sum)
+    return graph
+
+
+class TestFuse:
+    @staticmethod
+    def test_non_elementwise_graph_is_left_untouched(graph):
+        output = [total.op(graph.x)]
+
+        assert fuse(output) == output
+        assert fuse(output)[0] is output[0]
+
+    @staticmethod
+    @requires_numpy
+    def test_chain_is_fused_into_a_single_op(numpy_graph):
+        fused, = fuse([numpy_graph.clipped])
+
+        assert isinstance(fused.op, FusedOp)
+        assert repr(fused.op) == "fused(greater, multiply, sqrt, add, where)"
+        assert fused.dependencies == {0: numpy_graph.x}
+
+    @staticmethod
+    @requires_numpy
+    def test_value_used_twice_is_not_absorbed(numpy_graph):
+        output = [numpy_graph.sum, numpy_graph.clipped]
+        fused_sum, fused_clipped = fuse(output)
+
+        assert repr(fused_sum.op) == "fused(multiply, sqrt, add)"
+        assert repr(fused_clipped.op) == "fused(greater, where)"
+        assert set(fused_clipped.dependencies.values()) == {numpy_graph.x, fused_sum}
+
+    @staticmethod
+    @requires_numpy
+    def test_non_elementwise_op_bounds_fusion(numpy_graph):
+        output = total.op(numpy_graph.clipped)
+        fused, = fuse([output])
+
+        assert fused.op is total
+        assert isinstance(fused.dependencies[0].op, FusedOp)
+
+    @staticmethod
+    @requires_numpy
+    def test_keyword_arguments_prevent_fusion(graph):
+        output = op(numpy.add).op(op(numpy.negative).op(graph.x), 1., dtype="float32")
+
+        assert fuse([output]) == [output]
+
+
+@requires_numpy
+class TestFusedOp:
+    @staticmethod
+    @pytest.mark.parametrize("shape", [(1000,), (300, 7), (3, 50000)])
+    def test_fused_value_matches_unfused_value(numpy_graph, shape):
+        value = numpy.random.default_rng(0).uniform(0., 40., size=shape)
+        expected = evaluate([numpy_graph.clipped], args={numpy_graph.x: value})[0]
+        fused, = fuse([numpy_graph.clipped], block_size=256)
+
+        result = evaluate([fused], args={numpy_graph.x: value})[0]
+
+        assert result.dtype == expected.dtype
+        numpy.testing.assert_allclose(result, expected)
+
+    @staticmethod
+    def test_arguments_are_broadcast(graph):
+        output = op(numpy.multiply).op(op(numpy.add).op(graph.x, graph.y), 2)
+        fused, = fuse([output])
+
+        result = evaluate([fused], args={graph.x: numpy.arange(3), graph.y: numpy.arange(4).reshape(4, 1)})[0]
+
+        numpy.testing.assert_array_equal(result, (numpy.arange(3) + numpy.arange(4).reshape(4, 1)) * 2)
+
+    @staticmethod
+    def test_intermediate_types_are_resolved(graph):
+        output = op(numpy.add).op(op(numpy.true_divide).op(graph.x, 2), 1)
+        fused, = fuse([output])
+
+        result = evaluate([fused], args={graph.x: numpy.arange(5)})[0]
+
+        numpy.testing.assert_array_equal(result, numpy.arange(5) / 2 + 1)
+
+    @staticmethod
+    def test_scalar_arguments_are_evaluated_unfused(numpy_graph):
+        fused, = fuse([numpy_graph.clipped])
+
+        assert evaluate([fused], args={numpy_graph.x: 16.})[0] == 10.
+        assert evaluate([fused], args={numpy_graph.x: 9.})[0] == 21.
+        assert evaluate([fused], args={numpy_graph.x: 1.})[0] == 3.
+
+    @staticmethod
+    def test_lists_are_concatenated(graph):
+        output = op(operator.add).op(op(operator.add).op(graph.x, graph.y), [3])
+        fused, = fuse([output])
+
+        assert isinstance(fused.op, FusedOp)
+        assert evaluate([fused], args={graph.x: [1], graph.y: [2]}) == [[1, 2, 3]]
+
+    @staticmethod
+    def test_python_numbers_keep_their_type(graph):
+        output = op(operator.mul).op(op(operator.add).op(graph.x, graph.y), 2)
+        fused, = fuse([output])
+
+        result, = evaluate([fused], args={graph.x: 1, graph.y: 2})
+
+        assert result == 6 and type(result) is int
+
+    @staticmethod
+    def test_strings_are_concatenated(graph):
+        output = op(operator.mul).op(op(operator.add).op(graph.x, graph.y), 2)
+        fused, = fuse([output])
+
+        assert evaluate([fused], args={graph.x: "a", graph.y: "b"}) == ["abab"]
+
+    @staticmethod
+    def test_masked_arrays_keep_their_mask(numpy_graph):
+        value = numpy.ma.masked_array([1., 4., 9.], mask=[0, 1, 0])
+        fused, = fuse([numpy_graph.sum])
+
+        result = evaluate([fused], args={numpy_graph.x: value})[0]
+
+        assert isinstance(result, numpy.ma.MaskedArray)
+        assert result.mask.tolist() == [False, True, False]
+        assert result.compressed().tolist() == [3., 21.]
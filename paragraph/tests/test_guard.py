@@ -0,0 +1,112 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate, evaluate_as_completed, evaluate_many
+from paragraph.guard import GuardedOp, read_only, checksum
+
+
+@op
+def append_inplace(value):
+    value.append(1)
+    return len(value)
+
+
+@op
+def fill_inplace(value):
+    value[0] = 0
+    return value
+
+
+@op
+def first(value):
+    return value[0]
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.input = Variable("input")
+    return graph
+
+
+class TestReadOnly:
+    @staticmethod
+    def test_writable_buffer_is_viewed_read_only():
+        value = bytearray(b"abc")
+        view = read_only(value)
+
+        assert view.readonly
+        assert view.obj is value
+
+    @staticmethod
+    def test_other_values_are_unchanged():
+        value = [1, 2]
+
+        assert read_only(value) is value
+        assert read_only(b"abc") == b"abc"
+
+    @staticmethod
+    def test_checksum_changes_upon_mutation():
+        value = [1, 2]
+        digest = checksum(value)
+        value.append(3)
+
+        assert checksum(value) != digest
+        assert checksum(lambda: None) is None
+
+
+class TestGuardedOp:
+    @staticmethod
+    def test_invalid_mode_raises():
+        with pytest.raises(ValueError):
+            GuardedOp(first, "unknown")
+
+    @staticmethod
+    def test_evaluation_with_invalid_mode_raises(graph):
+        with pytest.raises(ValueError):
+            evaluate([first.op(graph.input)], {graph.input: b"a"}, guard="unknown")
+
+
+class TestGuardedEvaluation:
+    @staticmethod
+    def test_buffer_mutation_fails(graph):
+        with pytest.raises(RuntimeError) as err:
+            evaluate([fill_inplace.op(graph.input)], {graph.input: bytearray(b"abc")}, guard="read_only")
+
+        assert isinstance(err.value.__cause__, TypeError)
+
+    @staticmethod
+    def test_buffer_is_not_copied(graph):
+        value = bytearray(b"abc")
+        res = evaluate([op(lambda view: view.obj).op(graph.input)], {graph.input: value}, guard="read_only")
+
+        assert res[0] is value
+
+    @staticmethod
+    def test_mutation_is_detected_by_checksum(graph):
+        with ThreadPoolExecutor() as executor:
+            with pytest.raises(RuntimeError, match="mutated its argument 0"):
+                evaluate([append_inplace.op(graph.input)], {graph.input: [1, 2]}, executor=executor, guard="checksum")
+
+    @staticmethod
+    def test_mutation_is_detected_when_evaluating_as_completed(graph):
+        with pytest.raises(RuntimeError) as err:
+            list(evaluate_as_completed([append_inplace.op(graph.input)], {graph.input: [1, 2]}, guard="checksum"))
+
+        assert "mutated its argument 0" in str(err.value.__cause__)
+
+    @staticmethod
+    def test_mutation_is_detected_when_evaluating_many_queries(graph):
+        with pytest.raises(RuntimeError) as err:
+            evaluate_many([([append_inplace.op(graph.input)], {graph.input: [1, 2]})], guard="checksum")
+
+        assert "mutated its argument 0" in str(err.value.__cause__)
+
+    @staticmethod
+    def test_evaluation_without_mutation_is_correct(graph):
+        with ThreadPoolExecutor() as executor:
+            res = evaluate([first.op(graph.input)], {graph.input: [1, 2]}, executor=executor, guard="checksum")
+
+        assert res == [1]
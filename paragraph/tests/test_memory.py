@@ -0,0 +1,121 @@
+import tracemalloc
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate, solve, apply
+from paragraph.memory import MemoryMonitor, size_of
+
+
+@op
+def allocate(size):
+    return bytearray(size)
+
+
+@op
+def concat(value, other):
+    return value + other
+
+
+@op(num_outputs=2)
+def halve(value):
+    return value[:len(value) // 2], value[len(value) // 2:]
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.size = Variable("size")
+    graph.small = allocate.op(100)
+    graph.large = allocate.op(graph.size)
+    graph.output = op(len).op(concat.op(graph.large, graph.small))
+    return graph
+
+
+class TestSizeOf:
+    @staticmethod
+    def test_buffer_size_is_returned():
+        assert size_of(bytearray(1000)) == 1000
+        assert size_of(memoryview(bytes(1000))[:10]) == 10
+
+    @staticmethod
+    def test_multiple_results_are_summed_up():
+        assert size_of((bytes(10), bytes(20))) == 30
+
+
+class TestMemoryMonitor:
+    @staticmethod
+    def test_peak_and_values_held_are_reported(graph):
+        monitor = MemoryMonitor()
+        assert evaluate([graph.output], args={graph.size: 10000}, memory=monitor) == [10100]
+
+        report, = monitor.reports
+        assert report.name == "evaluate"
+        assert report.peak_bytes == report.live_bytes[report.peak_step] == 10100
+        assert report.held_at_peak == [(graph.large, 10000), (graph.small, 100)]
+        assert len(report.live_bytes) == 5
+        assert report.live_bytes[-1] < 100
+        assert report.allocations == []
+
+    @staticmethod
+    def test_results_of_multi_output_ops_are_accounted_for_once(graph):
+        head, tail = halve.op(graph.large)
+        monitor = MemoryMonitor()
+        evaluate([concat.op(head, tail)], args={graph.size: 10000}, memory=monitor)
+
+        report = monitor.reports[-1]
+        assert report.peak_bytes == 10000
+        assert max(size for _, size in report.held_at_peak) == 10000
+
+    @staticmethod
+    def test_values_are_accounted_for_upon_storage_and_release(graph):
+        ledger = MemoryMonitor().start("evaluate")
+        value = bytes(100)
+        ledger.hold(graph.small, value)
+        ledger.hold(graph.large, (value, bytes(10)))
+        ledger.step()
+        ledger.drop(graph.small)
+        ledger.step()
+        ledger.drop(graph.large)
+        ledger.step()
+
+        assert ledger.held_at(0) == [(graph.large, 110), (graph.small, 100)]
+        ledger.close()
+        assert ledger.monitor.reports[-1].live_bytes == [110, 110, 0]
+
+    @staticmethod
+    def test_allocations_are_traced(graph):
+        monitor = MemoryMonitor(trace_allocations=True)
+        evaluate([graph.output], args={graph.size: 100000}, memory=monitor)
+
+        allocations = dict(monitor.reports[-1].allocations)
+        assert monitor.reports[-1].allocations[0][0] in ("allocate", "concat")
+        assert allocations["allocate"] >= 100100
+        assert "allocate" in str(monitor.reports[-1])
+        assert not tracemalloc.is_tracing()
+
+    @staticmethod
+    def test_futures_are_accounted_for_once_completed(graph):
+        monitor = MemoryMonitor()
+        with ThreadPoolExecutor() as executor:
+            evaluate([graph.output], args={graph.size: 10000}, executor=executor, memory=monitor)
+
+        assert monitor.reports[-1].peak_bytes >= 10000
+
+    @staticmethod
+    def test_every_run_is_reported(graph):
+        monitor = MemoryMonitor(max_reports=2)
+        solve([graph.output], args={}, memory=monitor)
+        list(apply([graph.output], args={}, iter_args=[{graph.size: 1}, {graph.size: 2}], memory=monitor))
+
+        assert [report.name for report in monitor.reports] == ["evaluate", "evaluate"]
+
+    @staticmethod
+    def test_failed_run_is_reported(graph):
+        monitor = MemoryMonitor(trace_allocations=True)
+        with pytest.raises(RuntimeError):
+            evaluate([graph.output], args={graph.size: -1}, memory=monitor)
+
+        assert len(monitor.reports) == 1
@@ -0,0 +1,88 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate
+from paragraph.remat import plan_rematerialization
+from paragraph.memory import MemoryMonitor
+
+SIZES = {"load": 100., "early": 1., "expand": 80., "summarize": 1., "combine": 1.}
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.calls = []
+
+    def record(name, func):
+        def run(*args):
+            graph.calls.append(name)
+            return func(*args)
+        run.__name__ = name
+        return op(run)
+
+    graph.input = Variable("input")
+    loaded = record("load", lambda value: [value] * 3).op(graph.input)
+    expanded = record("expand", lambda value: value * 10).op(record("early", len).op(loaded))
+    graph.output = record("combine", lambda value, other: value + sum(other)).op(record("summarize", lambda value: value + 1).op(expanded), loaded)
+    graph.loaded = loaded
+
+    return graph
+
+
+def size(var):
+    return 0. if var.isinput() else SIZES[repr(var.op)]
+
+
+class TestPlanRematerialization:
+    @staticmethod
+    def test_value_pinned_at_peak_is_rematerialized(graph):
+        plan = plan_rematerialization([graph.output], sizes=size)
+
+        assert plan.early_uses == {graph.loaded: 1}
+        assert plan.peak_memory == 181.
+        assert plan.planned_peak_memory == 102.
+        assert plan.memory_saved == 79.
+        assert plan.compute_added == 1.
+
+    @staticmethod
+    def test_budget_is_respected(graph):
+        plan = plan_rematerialization([graph.output], sizes=size, costs=lambda var: 2., budget=1.)
+
+        assert plan.early_uses == {}
+        assert plan.memory_saved == 0.
+
+    @staticmethod
+    def test_output_is_never_rematerialized(graph):
+        plan = plan_rematerialization([graph.output, graph.loaded], sizes=size)
+
+        assert graph.loaded not in plan.early_uses
+
+
+class TestEvaluateWithRematerialization:
+    @staticmethod
+    def test_sequential_evaluation_recomputes(graph):
+        plan = plan_rematerialization([graph.output], sizes=size)
+        res = evaluate([graph.output], {graph.input: 2}, rematerialization=plan)
+
+        assert res == [37]
+        assert graph.calls == ["load", "early", "expand", "summarize", "load", "combine"]
+
+    @staticmethod
+    def test_parallel_evaluation_recomputes(graph):
+        plan = plan_rematerialization([graph.output], sizes=size)
+        with ThreadPoolExecutor() as executor:
+            res = evaluate([graph.output], {graph.input: 2}, executor=executor, rematerialization=plan)
+
+        assert res == [37]
+        assert graph.calls.count("load") == 2
+
+    @staticmethod
+    def test_recomputed_value_is_stored(graph):
+        plan = plan_rematerialization([graph.output], sizes=size)
+        monitor = MemoryMonitor()
+        evaluate([graph.output], {graph.input: 2}, rematerialization=plan, memory=monitor)
+
+        # One step for the arguments, then one per execution
+        assert len(monitor.reports[-1].live_bytes) == 1 + len(graph.calls)
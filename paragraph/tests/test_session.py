@@ -1,9 +1,13 @@
 import pytest
+import threading
 
+from concurrent.futures import Future
 from concurrent.futures.thread import ThreadPoolExecutor
 
-from paragraph.types import Variable
-from paragraph.session import eager_mode, traverse_fw, traverse_bw, evaluate, solve_requirements, apply, solve
+from paragraph.types import Variable, op
+from paragraph.session import eager_mode, traverse_fw, traverse_bw, evaluate, evaluate_as_completed, evaluate_many, solve_requirements, apply, solve
+from paragraph.session import _Evaluation, _count_usages
+from paragraph.control import cond, map_
 from paragraph.tests.test_types import MockReq, mock_op
 
 
@@ -35,6 +39,40 @@ def graph_raising():
     return graph
 
 
+@pytest.fixture
+def counted():
+    calls = []
+
+    @op
+    def upper(value):
+        calls.append(value)
+        return value.upper()
+
+    @op
+    def concat(value, suffix):
+        return value + suffix
+
+    counted = lambda: None  # noqa: E731
+    counted.calls = calls
+    counted.input = Variable("input")
+    counted.upper = upper.op(counted.input)
+    counted.concat = concat.op(counted.upper, "!")
+    return counted
+
+
+@pytest.fixture
+def split():
+    calls = []
+
+    @op(num_outputs=2)
+    def split(value):
+        calls.append(value)
+        return value[:1], value[1:]
+
+    split.calls = calls
+    return split
+
+
 @pytest.fixture
 def thread_pool_executor():
     with ThreadPoolExecutor() as executor:
@@ -120,6 +158,159 @@ class TestEvaluate:
 
             assert hasattr(err, "__cause__")
 
+    @staticmethod
+    def test_values_are_released_to_remote_executor():
+        class RemoteExecutor(ThreadPoolExecutor):
+            remote = True
+            released = []
+
+            def release(self, value):
+                self.released.append(value.result() if isinstance(value, Future) else value)
+
+        input_var = Variable("input")
+        output = op(str.upper).op(op(str.strip).op(input_var))
+        with RemoteExecutor() as executor:
+            res = evaluate([output], args={input_var: " a "}, executor=executor)
+
+        assert res == ["A"]
+        assert executor.released == [" a ", "a", "A"]
+
+
+class TestEvaluateAsCompleted:
+    @staticmethod
+    def test_sequential_evaluation_yields_in_turn(graph):
+        res = evaluate_as_completed(graph.output, args={graph.input: "input_value"})
+
+        assert next(res) == (graph.output[0], "op0_return_value")
+        assert not graph.output[1].op._run.called
+        assert list(res) == [(graph.output[1], "op1_return_value")]
+
+    @staticmethod
+    def test_parallel_evaluation_yields_fast_output_first(thread_pool_executor):
+        release = threading.Event()
+        slow = op(lambda value: value if release.wait(timeout=5) else None)
+        fast = op(lambda value: -value)
+        x = Variable("x")
+        output = [slow.op(x), fast.op(x)]
+
+        res = evaluate_as_completed(output, args={x: 1}, executor=thread_pool_executor)
+        first = next(res)
+        release.set()
+
+        assert first == (output[1], -1)
+        assert list(res) == [(output[0], 1)]
+
+    @staticmethod
+    def test_duplicate_output_is_yielded_once(graph, thread_pool_executor):
+        res = list(evaluate_as_completed(graph.output + graph.output[:1], args={graph.input: "input_value"}, executor=thread_pool_executor))
+
+        assert sorted(res, key=lambda item: repr(item[0])) == [(graph.output[0], "op0_return_value"), (graph.output[1], "op1_return_value")]
+
+    @staticmethod
+    def test_exception_is_reraised(graph_raising):
+        with pytest.raises(RuntimeError):
+            _ = list(evaluate_as_completed(graph_raising.output, args={graph_raising.input: 0}))
+
+
+class TestMultiOutputOps:
+    @staticmethod
+    @pytest.mark.parametrize("with_executor", [False, True])
+    def test_op_is_executed_once_for_all_outputs(split, with_executor, thread_pool_executor):
+        input_var = Variable("input")
+        head, tail = split.op(input_var)
+        upper = op(str.upper).op(tail)
+
+        res = evaluate([head, upper], args={input_var: "abc"}, executor=thread_pool_executor if with_executor else None)
+
+        assert res == ["a", "BC"]
+        assert split.calls == ["abc"]
+
+    @staticmethod
+    def test_outputs_are_released_individually(split):
+        input_var = Variable("input")
+        head, tail = split.op(input_var)
+        upper = op(str.upper).op(head)
+
+        evaluation = _Evaluation(cache={input_var: "abc"}, usage_counts=_count_usages([upper, tail]), output={upper, tail})
+        evaluation.evaluate([upper, tail])
+
+        # The results and the output consumed are released, the output requested is retained
+        assert set(evaluation.cache) == {upper, tail}
+        assert evaluation.cache[tail] == "bc"
+
+    @staticmethod
+    def test_solve_defers_multi_output_ops(split):
+        input_var = Variable("input")
+        head, tail = split.op(input_var)
+
+        res = solve([op(str.upper).op(head), tail], args={})
+
+        assert [repr(var) for var in res] == ["upper(split(input)[0])", "split(input)[1]"]
+        assert evaluate(res, args={input_var: "abc"}) == ["A", "bc"]
+
+    @staticmethod
+    def test_solve_selects_resolved_outputs_inline(split):
+        head, tail = split.op("abc")
+        upper = op(str.upper).op(tail)
+
+        res = solve([upper, head], args={})
+
+        assert [var.args for var in res] == [{0: "bc"}, {0: ("a", "bc"), 1: 0}]
+        assert repr(res[1]) == "('a', 'bc')[0]"
+        assert split.calls == ["abc"]
+
+    @staticmethod
+    @pytest.mark.parametrize("with_executor", [False, True])
+    def test_apply_iterates_multi_output_ops(split, with_executor, thread_pool_executor):
+        input_var = Variable("input")
+        head, _ = split.op(input_var)
+        double = op(lambda value: value * 2).op(head)
+
+        res = list(apply([double], args={}, iter_args=[{input_var: "abc"}, {input_var: "xyz"}], executor=thread_pool_executor if with_executor else None))
+
+        assert res == [["aa"], ["xx"]]
+
+
+class TestEvaluateMany:
+    @staticmethod
+    def test_results_are_returned_per_query(counted):
+        res = evaluate_many([([counted.upper], {counted.input: "a"}), ([counted.concat, counted.upper], {counted.input: "b"})])
+
+        assert res == [["A"], ["B!", "B"]]
+
+    @staticmethod
+    def test_shared_subgraph_is_evaluated_once_for_equal_inputs(counted):
+        res = evaluate_many([([counted.upper], {counted.input: "".join("ab")}), ([counted.concat], {counted.input: "ab"})])
+
+        assert res == [["AB"], ["AB!"]]
+        assert counted.calls == ["ab"]
+
+    @staticmethod
+    def test_shared_subgraph_is_evaluated_per_distinct_input(counted):
+        res = evaluate_many([([counted.concat], {counted.input: "a"}), ([counted.concat], {counted.input: "b"}), ([counted.concat], {counted.input: "a"})])
+
+        assert res == [["A!"], ["B!"], ["A!"]]
+        assert sorted(counted.calls) == ["a", "b"]
+
+    @staticmethod
+    def test_queries_are_evaluated_concurrently(counted, thread_pool_executor):
+        barrier = threading.Barrier(2, timeout=5.)
+
+        @op
+        def wait(value):
+            barrier.wait()
+            return value
+
+        output = wait.op(counted.input)
+        res = evaluate_many([([output], {counted.input: "a"}), ([output], {counted.input: "b"})], executor=thread_pool_executor)
+
+        assert res == [["a"], ["b"]]
+
+    @staticmethod
+    def test_raises_if_dependent_variable_is_initialized(counted):
+        with pytest.raises(ValueError):
+            evaluate_many([([counted.concat], {counted.upper: "A"})])
+
 
 class TestSolve:
     @staticmethod
@@ -192,3 +383,89 @@ class TestRequirementSolving:
 
         assert reqs == expected
         res.op.arg_requirements.assert_called_once_with(output_req, "b")
+
+
+@pytest.fixture
+def loading():
+    loading = lambda: None  # noqa: E731
+    loading.calls = []
+
+    @op(requirement_arg="req")
+    def load(source, req):
+        loading.calls.append((source, req))
+        return f"{source}[{req._string}]"
+
+    @op
+    def first(value, other):
+        return value
+
+    first.arg_requirements = lambda req, arg=None: req if arg == 0 else MockReq()
+    loading.load = load
+    loading.first = first
+    return loading
+
+
+class TestEvaluateWithRequirements:
+    @staticmethod
+    def test_ops_receive_their_merged_requirement(loading):
+        source = Variable("source")
+        data = loading.load.op(source)
+        output = [op(str.upper).op(data), op(str.lower).op(data)]
+        output[0].op.arg_requirements = lambda req, arg=None: req
+
+        res = evaluate(output, args={source: "a"}, requirements={output[0]: MockReq("x"), output[1]: MockReq("y")})
+
+        assert res == ["A[X]", "a[x]"]
+        assert loading.calls == [("a", MockReq("x"))]
+
+    @staticmethod
+    def test_ops_with_empty_requirement_are_pruned(loading):
+        source = Variable("source")
+        output = loading.first.op(loading.load.op(source), loading.load.op(op(str.upper).op(source)))
+
+        res = evaluate([output], args={source: "a"}, requirements={output: MockReq("x")})
+
+        assert res == ["a[x]"]
+        assert loading.calls == [("a", MockReq("x"))]
+
+    @staticmethod
+    def test_requirements_are_passed_through_outputs(loading):
+        source = Variable("source")
+        base = op(lambda value, req: (value + req._string, value), num_outputs=2, requirement_arg="req")
+        head, tail = base.op(source)
+
+        assert evaluate([head, tail], args={source: "a"}, requirements={head: MockReq("x"), tail: MockReq("y")}) == ["axy", "a"]
+
+    @staticmethod
+    def test_requirements_are_passed_through_control_ops(loading):
+        predicate, source = Variable("predicate"), Variable("source")
+        output = cond.op(predicate, loading.load.op(source), "fallback")
+
+        assert evaluate([output], args={predicate: True, source: "a"}, requirements={output: MockReq("x")}) == ["a[x]"]
+        assert evaluate([output], args={predicate: False, source: "a"}, requirements={output: MockReq("x")}) == ["fallback"]
+        assert loading.calls == [("a", MockReq("x"))]
+
+    @staticmethod
+    def test_requirements_are_passed_through_map_templates(loading):
+        item, source = Variable("item"), Variable("source")
+        template = op(lambda value, suffix: value + suffix).op(loading.load.op(source), item)
+        template.op.arg_requirements = lambda req, arg=None: req
+        output = map_(template, item, ["1", "2"])
+
+        assert evaluate([output], args={source: "a"}, requirements={output: MockReq("x")}) == [["a[x]1", "a[x]2"]]
+        assert loading.calls == [("a", MockReq("x"))]
+
+    @staticmethod
+    def test_missing_output_requirement_raises(loading):
+        source = Variable("source")
+        data = loading.load.op(source)
+
+        with pytest.raises(ValueError):
+            evaluate([data, op(str.upper).op(data)], args={source: "a"}, requirements={data: MockReq("x")})
+
+    @staticmethod
+    def test_ops_ignore_requirements_unless_declaring_an_argument(loading):
+        source = Variable("source")
+        output = op(str.upper).op(source)
+
+        assert evaluate([output], args={source: "a"}, requirements={output: MockReq()}) == ["A"]
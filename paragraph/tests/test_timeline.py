@@ -0,0 +1,129 @@
+import json
+import pickle
+import threading
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate, evaluate_as_completed, evaluate_many, solve, apply
+from paragraph.timeline import Tracer
+
+
+@op
+def double(value):
+    return 2 * value
+
+
+@op
+def add(value, other):
+    return value + other
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.input = Variable("input")
+    graph.other = Variable("other")
+    graph.doubled = double.op(graph.input)
+    graph.output = add.op(graph.doubled, graph.other)
+    return graph
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    return Tracer(str(tmp_path / "trace.json"))
+
+
+def op_spans(path):
+    with open(path) as file:
+        events = json.load(file)["traceEvents"]
+    return [event for event in events if event.get("cat") == "op"]
+
+
+class TestTracer:
+    @staticmethod
+    def test_sample_rate_is_validated(tmp_path):
+        with pytest.raises(ValueError):
+            Tracer(str(tmp_path / "trace.json"), sample_rate=2.)
+
+    @staticmethod
+    def test_spans_are_written_in_chrome_trace_format(graph, tracer):
+        with tracer:
+            assert evaluate([graph.output], args={graph.input: 1, graph.other: 2}, tracer=tracer) == [4]
+
+        spans = op_spans(tracer.path)
+        assert [span["name"] for span in spans] == ["double", "add"]
+        assert spans[1]["args"]["variable"] == "add(double(...), other)"
+        assert all(span["ph"] == "X" and span["dur"] >= 0. and span["args"]["queue_wait_ms"] >= 0. for span in spans)
+        assert spans[0]["ts"] + spans[0]["dur"] <= spans[1]["ts"]
+
+    @staticmethod
+    def test_evaluation_is_recorded_as_a_session_span(graph, tracer):
+        with tracer:
+            evaluate([graph.output], args={graph.input: 1, graph.other: 2}, tracer=tracer)
+
+        with open(tracer.path) as file:
+            events = json.load(file)["traceEvents"]
+        assert [event["name"] for event in events if event.get("cat") == "session"] == ["evaluate"]
+
+    @staticmethod
+    def test_spans_are_recorded_on_worker_threads(graph, tracer):
+        with tracer, ThreadPoolExecutor(thread_name_prefix="worker") as executor:
+            evaluate([graph.output], args={graph.input: 1, graph.other: 2}, executor=executor, tracer=tracer)
+
+        with open(tracer.path) as file:
+            events = json.load(file)["traceEvents"]
+        thread_names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+        assert all(thread_names[span["tid"]].startswith("worker") for span in op_spans(tracer.path))
+        assert threading.get_ident() not in {span["tid"] for span in op_spans(tracer.path)}
+
+    @staticmethod
+    def test_solve_and_apply_are_traced(graph, tracer):
+        with tracer:
+            solve([add.op(double.op(1), graph.other)], args={}, tracer=tracer)
+            list(apply([graph.output], args={graph.input: 1}, iter_args=[{graph.other: 2}, {graph.other: 3}], tracer=tracer))
+
+        assert [span["name"] for span in op_spans(tracer.path)] == ["double", "double", "add", "double", "add"]
+
+    @staticmethod
+    def test_evaluation_as_completed_is_traced(graph, tracer):
+        with tracer:
+            res = list(evaluate_as_completed([graph.output], args={graph.input: 1, graph.other: 2}, tracer=tracer))
+
+        assert res == [(graph.output, 4)]
+        assert [span["name"] for span in op_spans(tracer.path)] == ["double", "add"]
+        with open(tracer.path) as file:
+            events = json.load(file)["traceEvents"]
+        assert [event["name"] for event in events if event.get("cat") == "session"] == ["evaluate_as_completed"]
+
+    @staticmethod
+    def test_evaluation_of_many_queries_is_traced_once(graph, tracer):
+        with tracer:
+            res = evaluate_many([([graph.output], {graph.input: 1, graph.other: 2}), ([graph.output], {graph.input: 1, graph.other: 3})], tracer=tracer)
+
+        assert res == [[4], [5]]
+        assert [span["name"] for span in op_spans(tracer.path)] == ["double", "add", "add"]
+
+    @staticmethod
+    def test_evaluations_not_sampled_are_not_traced(graph, tmp_path):
+        tracer = Tracer(str(tmp_path / "trace.json"), sample_rate=0.)
+        evaluate([graph.output], args={graph.input: 1, graph.other: 2}, tracer=tracer)
+
+        assert len(tracer) == 0
+
+    @staticmethod
+    def test_oldest_spans_are_dropped(graph, tmp_path):
+        tracer = Tracer(str(tmp_path / "trace.json"), max_events=2)
+        for value in range(3):
+            evaluate([graph.output], args={graph.input: value, graph.other: 2}, tracer=tracer)
+
+        assert len(tracer) == 2
+
+    @staticmethod
+    def test_traced_op_is_pickled_untraced(graph, tracer):
+        traced = tracer.trace(op(abs), graph.doubled)
+
+        assert pickle.loads(pickle.dumps(traced))(-2) == 2
+        assert len(tracer) == 0
@@ -0,0 +1,100 @@
+import pytest
+import threading
+
+from concurrent.futures.thread import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from paragraph.types import Variable, op
+from paragraph.control import cond
+from paragraph.tracing import tracing
+
+
+@pytest.fixture
+def ops():
+    ops = lambda: None  # noqa: E731
+    ops.add = op(MagicMock(__name__="add", side_effect=lambda x, y: [x[0] + y]))
+    ops.mul = op(MagicMock(__name__="mul", side_effect=lambda x, y: [x[0] * y[0]]))
+    return ops
+
+
+@pytest.fixture(params=[None, ThreadPoolExecutor], ids=["sequential", "threads"])
+def executor(request):
+    if request.param is None:
+        yield None
+        return
+    with request.param() as executor:
+        yield executor
+
+
+class TestTracing:
+    @staticmethod
+    def test_ops_are_executed_eagerly(ops):
+        with tracing() as trace:
+            x = trace.input("x", [3])
+            y = ops.add.op(ops.mul.op(x, x), 1)
+
+        assert y == [10]
+        assert ops.add._run.call_count == 1
+
+    @staticmethod
+    def test_recorded_graph(ops):
+        with tracing() as trace:
+            x = trace.input("x", [3])
+            y = ops.add.op(ops.mul.op(x, x), 1)
+
+        var = trace.variable(y)
+        assert isinstance(var, Variable)
+        assert str(var) == "add(mul(x, x), 1)"
+        assert var.args == {1: 1}
+
+    @staticmethod
+    def test_replay(ops, executor):
+        with tracing() as trace:
+            x = trace.input("x", [3])
+            y = ops.add.op(ops.mul.op(x, x), 1)
+
+        assert trace.replay([y], {"x": [5]}, executor=executor) == [[26]]
+
+    @staticmethod
+    def test_outputs_of_multi_output_ops_are_recorded():
+        split = op(lambda value: (value[:1], value[1:]), num_outputs=2)
+        with tracing() as trace:
+            head, tail = split.op(trace.input("x", [1, 2, 3]))
+
+        assert trace.replay([tail, head], {"x": [4, 5]}) == [[5], [4]]
+
+    @staticmethod
+    def test_control_ops_are_replayed_lazily(ops):
+        with tracing() as trace:
+            x = trace.input("x", [3])
+            p = trace.input("p", True)
+            y = cond.op(p, ops.add.op(x, 1), ops.mul.op(x, x))
+
+        ops.mul._run.reset_mock()
+        assert trace.replay([y], {"x": [2], "p": True}) == [[3]]
+        assert not ops.mul._run.called
+
+    @staticmethod
+    def test_unrecorded_value_raises():
+        with tracing() as trace:
+            pass
+
+        with pytest.raises(ValueError):
+            trace.variable([1])
+
+    @staticmethod
+    def test_duplicate_input_raises():
+        with tracing() as trace:
+            trace.input("x", 1)
+            with pytest.raises(ValueError):
+                trace.input("x", 2)
+
+    @staticmethod
+    def test_mode_is_local_to_thread(ops):
+        results = []
+        with tracing():
+            thread = threading.Thread(target=lambda: results.append(ops.add.op([1], 1)))
+            thread.start()
+            thread.join()
+
+        assert isinstance(results[0], Variable)
@@ -0,0 +1,108 @@
+import pytest
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.session import evaluate
+from paragraph.transport import SharedBuffer, SharedMemoryExecutor
+
+
+def reverse(data):
+    return bytes(data)[::-1]
+
+
+def identity(data):
+    return data
+
+
+def size(data):
+    return len(data)
+
+
+@pytest.fixture(params=[ThreadPoolExecutor, ProcessPoolExecutor], ids=["threads", "processes"])
+def executor(request, tmp_path):
+    with SharedMemoryExecutor(request.param(max_workers=2), threshold=16, directory=str(tmp_path)) as executor:
+        yield executor
+
+
+class TestSharedBuffer:
+    @staticmethod
+    def test_small_values_are_not_stored(tmp_path):
+        assert SharedBuffer.store(b"small", str(tmp_path), threshold=16) is None
+        assert SharedBuffer.store("not a buffer" * 10, str(tmp_path), threshold=16) is None
+
+    @staticmethod
+    def test_view_has_same_contents(tmp_path):
+        value = bytearray(range(64))
+        buffer = SharedBuffer.store(value, str(tmp_path), threshold=16)
+
+        assert bytes(buffer.open()) == bytes(value)
+
+    @staticmethod
+    def test_view_is_copy_on_write(tmp_path):
+        buffer = SharedBuffer.store(bytearray(64), str(tmp_path), threshold=16)
+        view = buffer.open()
+        view[0] = 1
+
+        assert buffer.open()[0] == 0
+
+    @staticmethod
+    def test_view_remains_valid_after_unlink(tmp_path):
+        buffer = SharedBuffer.store(bytes(range(64)), str(tmp_path), threshold=16)
+        view = buffer.open()
+        buffer.unlink()
+
+        assert list(tmp_path.iterdir()) == []
+        assert bytes(view) == bytes(range(64))
+
+
+class TestSharedMemoryExecutor:
+    @staticmethod
+    def test_large_values_are_transported(executor, tmp_path):
+        value = bytes(range(64))
+        future = executor.submit(reverse, value)
+
+        assert bytes(future.result()) == value[::-1]
+        executor.release(future.result())
+        assert list(tmp_path.iterdir()) == []
+
+    @staticmethod
+    def test_evaluation_releases_all_buffers(executor, tmp_path):
+        x = Variable("x")
+        reversed_x = op(reverse).op(x)
+        outputs = [op(size).op(reversed_x), op(reverse).op(reversed_x), op(identity).op(reversed_x)]
+
+        res = evaluate(outputs, args={x: bytes(range(64))}, executor=executor)
+
+        assert res[0] == 64
+        assert bytes(res[1]) == bytes(range(64))
+        assert bytes(res[2]) == bytes(range(64))[::-1]
+        assert list(tmp_path.iterdir()) == []
+
+    @staticmethod
+    def test_future_arguments_are_awaited(executor):
+        first = executor.submit(reverse, bytes(range(64)))
+        second = executor.submit(reverse, first)
+
+        assert bytes(second.result()) == bytes(range(64))
+
+    @staticmethod
+    def test_value_acquired_concurrently_is_stored_once(tmp_path, monkeypatch):
+        value = bytes(range(64))
+        store = SharedBuffer.store
+        concurrent = []
+
+        with SharedMemoryExecutor(ThreadPoolExecutor(max_workers=1), threshold=16, directory=str(tmp_path)) as executor:
+            def store_racing(*args):
+                # Another task acquires the value while the first one stores it
+                monkeypatch.setattr(SharedBuffer, "store", store)
+                concurrent.append(executor._acquire(value))
+                return store(*args)
+
+            monkeypatch.setattr(SharedBuffer, "store", store_racing)
+            buffer = executor._acquire(value)
+
+            assert buffer == concurrent[0]
+            assert len(list(tmp_path.iterdir())) == 1
+            executor._release_buffers([buffer, concurrent[0]])
+            assert list(tmp_path.iterdir()) == []
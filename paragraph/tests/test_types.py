@@ -98,6 +98,20 @@ class TestOpDecorator:
 
         assert str(result) == "function(arg=input)"
 
+    @staticmethod
+    def test_multi_output_op_returns_a_variable_per_output():
+        @op(num_outputs=2)
+        def split(value):
+            return value[:1], value[1:]
+
+        variable = Variable(name="input")
+        head, tail = split.op(variable)
+
+        assert split("abc") == ("a", "bc")
+        assert head.dependencies[0] is tail.dependencies[0]
+        assert head.dependencies[0].dependencies == {0: variable}
+        assert (str(head), str(tail)) == ("split(input)[0]", "split(input)[1]")
+
 
 class TestOpClass:
     @staticmethod
@@ -0,0 +1,136 @@
+import os
+import pickle
+import sys
+import time
+
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paragraph.types import Variable, op
+from paragraph.timeline import Tracer
+from paragraph.workload import Recorder, _Profiler, load, replay
+
+
+@op
+def slow(value):
+    time.sleep(.01)
+    return bytes(value)
+
+
+@op
+def concat(value, other):
+    return value + other
+
+
+@op(num_outputs=2)
+def split(value):
+    return value[:1], value[1:]
+
+
+@pytest.fixture
+def graph():
+    graph = lambda: None  # noqa: E731
+    graph.input = Variable("input")
+    graph.other = Variable("other")
+    graph.padded = slow.op(graph.input)
+    graph.output = concat.op(graph.padded, graph.other)
+    return graph
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    return Recorder(str(tmp_path / "workloads.jsonl"))
+
+
+class TestRecorder:
+    @staticmethod
+    def test_sample_rate_is_validated(tmp_path):
+        with pytest.raises(ValueError):
+            Recorder(str(tmp_path / "workloads.jsonl"), sample_rate=-1.)
+
+    @staticmethod
+    def test_graph_inputs_and_timings_are_recorded(graph, recorder):
+        assert recorder.evaluate([graph.output], args={graph.input: 1000, graph.other: b"!"}) == [bytes(1000) + b"!"]
+
+        workload, = load(recorder.path)
+        assert workload.kind == "evaluate"
+        assert [node.get("input", node.get("op")) for node in workload.nodes] == ["input", "slow", "other", "concat"]
+        assert workload.nodes[3]["dependencies"] == [[0, 1], [1, 2]]
+        assert workload.output == [3]
+        assert workload.args == {0: sys.getsizeof(1000), 2: 1}
+        assert workload.nodes[1]["duration"] >= .01 and workload.nodes[1]["size"] == 1000
+        assert workload.wall_time >= workload.nodes[1]["duration"]
+
+    @staticmethod
+    def test_calls_not_sampled_are_not_recorded(graph, tmp_path):
+        recorder = Recorder(str(tmp_path / "workloads.jsonl"), sample_rate=0.)
+
+        assert recorder.evaluate([graph.output], args={graph.input: 1, graph.other: b"!"}) == [b"\x00!"]
+        assert not (tmp_path / "workloads.jsonl").exists()
+
+    @staticmethod
+    def test_apply_records_every_iteration(graph, recorder):
+        res = list(recorder.apply([graph.output], args={graph.input: 2}, iter_args=[{graph.other: b"a"}, {graph.other: b"b"}]))
+
+        assert res == [[b"\x00\x00a"], [b"\x00\x00b"]]
+        assert [workload.kind for workload in load(recorder.path)] == ["solve", "evaluate", "evaluate"]
+
+    @staticmethod
+    def test_tracer_is_rejected(graph, recorder, tmp_path):
+        with pytest.raises(ValueError):
+            recorder.evaluate([graph.output], args={graph.input: 1, graph.other: b"!"}, tracer=Tracer(str(tmp_path / "trace.json")))
+
+    @staticmethod
+    def test_timed_op_is_pickled_untimed(graph):
+        timed = _Profiler(os.devnull).trace(op(len), graph.padded)
+
+        assert pickle.loads(pickle.dumps(timed))._run is len
+        assert repr(timed) == "len"
+
+
+class TestReplay:
+    @staticmethod
+    def test_workload_is_replayed_on_stubs(graph, recorder):
+        recorder.evaluate([graph.output], args={graph.input: 1000, graph.other: b"!"})
+        workload, = load(recorder.path)
+
+        output, args = workload.build(allocate=True)
+
+        assert [repr(var) for var in output] == ["concat(slow(input), other)"]
+        assert sorted(len(value) for value in args.values()) == [1, sys.getsizeof(1000)]
+        assert workload.run(sleep=False) < workload.wall_time
+
+    @staticmethod
+    def test_stubs_sleep_and_allocate_as_recorded(graph, recorder):
+        recorder.evaluate([graph.padded], args={graph.input: 1000})
+        workload, = load(recorder.path)
+
+        output, args = workload.build(allocate=True)
+        start = time.perf_counter()
+        value = output[0].op(*[args[dep] for dep in output[0].dependencies.values()])
+
+        assert time.perf_counter() - start >= .01
+        assert value == bytearray(1000)
+
+    @staticmethod
+    def test_multi_output_ops_are_replayed(recorder):
+        input_var = Variable("input")
+        head, tail = split.op(input_var)
+        recorder.evaluate([head, tail], args={input_var: bytes(6)})
+
+        output, _ = load(recorder.path)[0].build(allocate=True)
+
+        assert [repr(var) for var in output] == ["split(input)[0]", "split(input)[1]"]
+        assert len(replay(recorder.path, allocate=True)) == 1
+
+    @staticmethod
+    def test_replay_with_executor(graph, recorder):
+        for value in range(3):
+            recorder.evaluate([graph.output], args={graph.input: value, graph.other: b"!"})
+
+        with ThreadPoolExecutor() as executor:
+            timings = replay(recorder.path, executor=executor)
+
+        assert len(timings) == 3
+        assert all(replayed >= .01 for _, replayed in timings)
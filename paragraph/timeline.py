@@ -0,0 +1,197 @@
+"""
+Timelines
+*********
+
+*Recording op executions for display in a timeline viewer.*
+
+Passed to :func:`paragraph.session.evaluate`, :func:`paragraph.session.solve` or :func:`paragraph.session.apply`, a :class:`Tracer` records a span for
+every op executed, on the thread executing it, along with the time the op waited in the queue of the executor and for its arguments. Upon exit from the
+context manager, spans are written to a file in the Chrome Trace Event format, which can be opened in ``chrome://tracing`` or https://ui.perfetto.dev to
+see how busy the threads of the executor are:
+
+    >>> with Tracer("/tmp/trace.json", sample_rate=.01) as tracer, ThreadPoolExecutor() as ex:
+    ...     for input_value in input_values:
+    ...         pg.evaluate([output], args={input: input_value}, executor=ex, tracer=tracer)
+
+Evaluations are sampled as a whole, so that evaluations not sampled incur no overhead.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import attr
+
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from paragraph.types import Op, Variable
+
+
+def _label(var: Variable) -> str:
+    """Return a representation of a variable showing its direct dependencies only, that of the whole graph being arbitrarily long."""
+    args = {**var.args, **{arg: dep.name if dep.isinput() else f"{dep.op}(...)" for arg, dep in var.dependencies.items()}}
+    pos_args = [f"{args.pop(pos)}" for pos in sorted(arg for arg in list(args) if isinstance(arg, int))]
+    return "{}({})".format(var.op, ", ".join(pos_args + [f"{arg}={value}" for arg, value in args.items()]))
+
+
+@attr.s
+class Tracer:
+    """Record spans of op executions, and write them to a file in the Chrome Trace Event format.
+
+    Spans are kept in memory until saved, up to `max_events` spans, older spans being dropped first. Each span of an op execution holds the name of the op
+    and, as arguments, the variable evaluated, the time spent in the queue of the executor and the time spent awaiting future arguments, in milliseconds.
+    The latter is also shown as a separate span. Ops executed in other processes, e.g. with a :class:`paragraph.transport.SharedMemoryExecutor`, are
+    recorded from their submission to their completion, on a separate track.
+
+    Attributes:
+        path: The file where spans are written, overwritten upon every save.
+        sample_rate: The fraction of evaluations traced, drawn at random. Defaults to 1, i.e. all evaluations are traced.
+        max_events: The maximum number of spans kept in memory. Defaults to one million.
+    """
+    path = attr.ib(type=str)
+    sample_rate = attr.ib(type=float, default=1.)
+    max_events = attr.ib(type=int, default=10 ** 6)
+    _events = attr.ib(type=Deque[Dict[str, Any]], init=False, repr=False)
+    _threads = attr.ib(type=Dict[int, str], factory=dict, init=False, repr=False)
+    _origin = attr.ib(type=float, factory=time.perf_counter, init=False, repr=False)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+
+    @sample_rate.validator
+    def _check_sample_rate(self, _, value):
+        if not 0. <= value <= 1.:
+            raise ValueError(f"The sample rate must lie between 0 and 1, got {value}.")
+
+    @_events.default
+    def _init_events(self):
+        return deque(maxlen=self.max_events)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+    def __len__(self):
+        """The number of spans recorded."""
+        return len(self._events)
+
+    def sample(self) -> bool:
+        """Draw whether to trace an evaluation."""
+        return self.sample_rate >= 1. or random.random() < self.sample_rate
+
+    def record(self, name: str, start: float, end: float, category: str = "op", tid: Optional[int] = None, **args):
+        """Record a span.
+
+        Arguments:
+            name: The name of the span.
+            start: The start of the span, as returned by ``time.perf_counter``.
+            end: The end of the span, likewise.
+            category: The category of the span.
+            tid: The track of the span, defaults to the current thread.
+            args: Arguments displayed along with the span.
+        """
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6, "pid": os.getpid(),
+                 "tid": thread.ident if tid is None else tid}
+        if len(args) > 0:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+            if tid is None:
+                self._threads.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Record a span for the execution of the body of the context manager, on the current thread."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), category="session", **args)
+
+    def trace(self, run: Callable, var: Variable) -> Callable:
+        """Return a callable executing `run` for the variable `var` in the current process, recording a span of every execution."""
+        return _Span(run, self, var, time.perf_counter())
+
+    def watch(self, future: Future, var: Variable):
+        """Record a span from now to the completion of `future`, the value of `var` computed in another process."""
+        start = time.perf_counter()
+        future.add_done_callback(lambda _: self.record(repr(var.op), start, time.perf_counter(), tid=0, variable=_label(var)))
+
+    def save(self):
+        """Write the spans recorded to the file, atomically."""
+        with self._lock:
+            events = list(self._events)
+            threads = self._threads.copy()
+
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}} for tid, name in threads.items()]
+        metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "processes"}})
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, file)
+        os.replace(path, self.path)
+
+    def clear(self):
+        """Drop all spans recorded."""
+        with self._lock:
+            self._events.clear()
+
+
+def _untraced(run: Callable) -> Callable:
+    return run
+
+
+@attr.s(frozen=True, repr=False)
+class Instrumented:
+    """The base class of the callables instrumenting the executions of an op, e.g. to record their duration.
+
+    Calling an instrumented op awaits its future arguments, then executes the op through :meth:`execute`, which concrete classes redefine. An instrumented
+    op is represented as the op, and pickled as the op alone: ops executed in other processes run uninstrumented.
+
+    Attributes:
+        run: The callable executing the op.
+    """
+    run = attr.ib(type=Callable)
+
+    def __repr__(self):
+        return repr(self.run)
+
+    def __reduce__(self):
+        return _untraced, (self.run,)
+
+    def __call__(self, *args, **kwargs):
+        pos_args, kw_args = Op.resolve_args(args, kwargs)
+        return self.execute(pos_args, kw_args)
+
+    def execute(self, pos_args: List[Any], kw_args: Dict[str, Any]) -> Any:
+        """Execute the op on its arguments resolved."""
+        return self.run(*pos_args, **kw_args)
+
+
+@attr.s(frozen=True, repr=False)
+class _Span(Instrumented):
+    """Execute an op, awaiting future arguments first, and record a span of the execution."""
+    tracer = attr.ib(type=Tracer)
+    var = attr.ib(type=Variable)
+    submitted = attr.ib(type=float)
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        pos_args, kw_args = Op.resolve_args(args, kwargs)
+        resolved = time.perf_counter()
+        if resolved - start > 1e-6:
+            self.tracer.record("await arguments", start, resolved, category="wait")
+
+        try:
+            return self.run(*pos_args, **kw_args)
+        finally:
+            self.tracer.record(repr(self.run), resolved, time.perf_counter(), variable=_label(self.var), queue_wait_ms=(start - self.submitted) * 1e3,
+                               blocked_ms=(resolved - start) * 1e3)
@@ -0,0 +1,114 @@
+"""
+Tracing
+*******
+
+*Recording computation graphs from eager executions.*
+
+Within the context manager :func:`tracing`, ops are executed eagerly as in :func:`paragraph.session.eager_mode`, but every op executed is recorded
+meanwhile. The values returned are then mapped onto variables of a computation graph, which can be evaluated again on different inputs, lazily and
+concurrently:
+
+    >>> with tracing() as trace:
+    ...     x = trace.input("x", 3)
+    ...     y = add.op(mul.op(x, x), 1)
+    >>> y
+    10
+    >>> trace.replay([y], {"x": 5})
+    [26]
+"""
+import attr
+
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+
+from paragraph import session
+from paragraph.types import Op, Variable, _op_handler
+
+
+@attr.s
+class Trace:
+    """The computation graph recorded from an eager execution.
+
+    Values are mapped onto variables by *identity*: an argument passed to an op is recorded as a dependency if it is the very object marked as input or
+    returned by an op recorded earlier, and as a static argument otherwise. Ops returning shared immutable objects (such as ``None``, small integers or
+    interned strings) may thus introduce spurious dependencies, and should be avoided in traced code.
+
+    Attributes:
+        inputs: Maps the names of the inputs marked onto the corresponding input variables.
+    """
+    inputs = attr.ib(type=Dict[str, Variable], factory=dict)
+    _records = attr.ib(type=Dict[int, Tuple[Any, Variable]], factory=dict, repr=False)
+
+    def input(self, name: str, value: Any) -> Any:
+        """Mark `value` as the value of the input variable `name`, and return it unchanged.
+
+        Raises:
+            ValueError: If an input of the same name was marked already.
+        """
+        if name in self.inputs:
+            raise ValueError(f"An input named {name} was marked already.")
+        self.inputs[name] = Variable(name=name)
+        self._records[id(value)] = (value, self.inputs[name])
+        return value
+
+    def variable(self, value: Any) -> Variable:
+        """Return the variable standing for `value` in the graph recorded.
+
+        Raises:
+            ValueError: If `value` was neither marked as input nor returned by an op recorded.
+        """
+        record = self._records.get(id(value))
+        if record is None or record[0] is not value:
+            raise ValueError(f"The value {value!r} was neither marked as input nor returned by an op recorded.")
+        return record[1]
+
+    def record(self, operation: Op, *args, **kwargs) -> Any:
+        """Execute `operation` eagerly and record the variable it defines, return the value computed."""
+        value = operation._run(*args, **kwargs)
+
+        dependencies, static_args = {}, {}
+        for arg, arg_value in chain(enumerate(args), kwargs.items()):
+            record = self._records.get(id(arg_value))
+            if record is not None and record[0] is arg_value:
+                dependencies[arg] = record[1]
+            else:
+                static_args[arg] = arg_value
+
+        var = Variable(op=operation, args=static_args, dependencies=dependencies)
+        self._records[id(value)] = (value, var)
+        if operation.num_outputs is not None:
+            for result, output in zip(value, operation.outputs(var)):
+                self._records[id(result)] = (result, output)
+        return value
+
+    def replay(self, output: Iterable[Any], args: Dict[str, Any], executor: Optional[Executor] = None) -> List:
+        """Evaluate the recorded graph on new input values.
+
+        Arguments:
+            output: Values obtained during the recording, whose new values should be computed.
+            args: Maps the names of the inputs onto their new values.
+            executor: See :func:`paragraph.session.evaluate`.
+
+        Returns:
+            A list of values of the same size as `output`.
+        """
+        return session.evaluate([self.variable(value) for value in output], {self.inputs[name]: value for name, value in args.items()}, executor=executor)
+
+
+@contextmanager
+def tracing() -> Generator[Trace, None, None]:
+    """Execute ops eagerly and record them within a context manager.
+
+    Like :func:`paragraph.session.eager_mode`, the mode is local to the current context, i.e. it does not affect other threads or asynchronous tasks.
+
+    Yields:
+        The :class:`Trace` instance recording the ops executed.
+    """
+    trace = Trace()
+    token = _op_handler.set(trace.record)
+    try:
+        yield trace
+    finally:
+        _op_handler.reset(token)
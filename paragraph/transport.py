@@ -0,0 +1,325 @@
+"""
+Transport
+*********
+
+*Zero-copy transport of large buffer values between processes.*
+
+Submitting an op to a :class:`concurrent.futures.ProcessPoolExecutor` pickles its arguments and its return value, which dominates the cost of the evaluation
+when ops exchange large arrays. The executor defined here places such values in memory-mapped files instead, and passes between processes only handles
+to these files, which are mapped into the address space of the receiving process without any copy.
+
+Example:
+    >>> with SharedMemoryExecutor(ProcessPoolExecutor()) as ex:
+    ...     res = pg.evaluate([output], args={input: large_array}, executor=ex)
+"""
+import mmap
+import os
+import tempfile
+import threading
+
+import attr
+
+from concurrent.futures import Executor, Future
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def _default_directory() -> str:
+    """Return the directory hosting the memory-mapped files, preferably a RAM-backed file system."""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+@attr.s(frozen=True)
+class SharedBuffer:
+    """A picklable handle to a value stored in a memory-mapped file.
+
+    Attributes:
+        path: The path of the file holding the contents of the value.
+        nbytes: The size of the contents in bytes.
+        kind: ``"ndarray"`` for NumPy arrays, ``"buffer"`` for any other object supporting the buffer protocol.
+        format: The dtype of the array or the format of the buffer.
+        shape: The shape of the array or buffer.
+    """
+    path = attr.ib(type=str)
+    nbytes = attr.ib(type=int)
+    kind = attr.ib(type=str)
+    format = attr.ib(type=str)
+    shape = attr.ib(type=Tuple[int, ...])
+
+    @classmethod
+    def store(cls, value: Any, directory: str, threshold: int) -> Optional["SharedBuffer"]:
+        """Copy `value` into a new memory-mapped file and return its handle.
+
+        Returns:
+            The handle to the value, or None if the value is not eligible, that is it does not support the buffer protocol, it is not contiguous or it is
+            smaller than `threshold` bytes.
+        """
+        if numpy is not None and isinstance(value, numpy.ndarray):
+            if value.dtype.hasobject or value.nbytes < max(threshold, 1):
+                return None
+            buffer = cls._create(directory, value.nbytes, "ndarray", value.dtype.str, value.shape)
+            with buffer._map(mmap.ACCESS_WRITE) as contents:
+                numpy.ndarray(value.shape, dtype=value.dtype, buffer=contents)[...] = value
+            return buffer
+
+        try:
+            view = memoryview(value)
+        except TypeError:
+            return None
+        if not view.c_contiguous or view.nbytes < max(threshold, 1):
+            return None
+
+        buffer = cls._create(directory, view.nbytes, "buffer", view.format, view.shape)
+        with buffer._map(mmap.ACCESS_WRITE) as contents:
+            contents[:] = view.cast("B")
+        return buffer
+
+    @classmethod
+    def _create(cls, directory: str, nbytes: int, kind: str, format: str, shape: Tuple[int, ...]) -> "SharedBuffer":  # pylint: disable=W0622
+        fd, path = tempfile.mkstemp(prefix="paragraph-", dir=directory)
+        try:
+            os.ftruncate(fd, nbytes)
+        finally:
+            os.close(fd)
+        return cls(path=path, nbytes=nbytes, kind=kind, format=format, shape=tuple(shape))
+
+    def _map(self, access: int) -> mmap.mmap:
+        with open(self.path, "r+b" if access == mmap.ACCESS_WRITE else "rb") as file:
+            return mmap.mmap(file.fileno(), self.nbytes, access=access)
+
+    def open(self) -> Any:
+        """Map the file and return a view of the value, without copying its contents.
+
+        The file is mapped copy-on-write: changes made to the view remain private to the current process. A NumPy array is returned for arrays, a memoryview
+        of the original format and shape for any other buffer.
+        """
+        contents = self._map(mmap.ACCESS_COPY)
+        if self.kind == "ndarray":
+            return numpy.ndarray(self.shape, dtype=numpy.dtype(self.format), buffer=contents)
+        view = memoryview(contents)
+        try:
+            return view.cast(self.format, self.shape)
+        except (TypeError, ValueError):
+            return view
+
+    def unlink(self):
+        """Remove the file. Views opened beforehand remain valid."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _call(fn, args: Tuple, kwargs: Dict[str, Any], directory: str, threshold: int) -> Any:
+    """Invoke `fn` within a worker process, opening the shared arguments and storing a large return value in a new shared buffer."""
+    opened = {}
+
+    def open_shared(value):
+        if not isinstance(value, SharedBuffer):
+            return value
+        view = value.open()
+        opened[id(view)] = (view, value)
+        return view
+
+    value = fn(*[open_shared(arg) for arg in args], **{key: open_shared(arg) for key, arg in kwargs.items()})
+
+    # Returning an argument unchanged requires no copy
+    if id(value) in opened and opened[id(value)][0] is value:
+        return opened[id(value)][1]
+
+    return SharedBuffer.store(value, directory, threshold) or value
+
+
+@attr.s
+class _Entry:
+    """A shared buffer handed out by the executor.
+
+    Attributes:
+        value: The value stored in the buffer, either an argument submitted or the view of a return value.
+        buffer: The handle to the buffer.
+        count: The number of references to the buffer, held by tasks or futures.
+        handed: The number of references held by futures, which are transferred to the consumers of their results.
+    """
+    value = attr.ib(type=Any)
+    buffer = attr.ib(type=SharedBuffer)
+    count = attr.ib(type=int, default=1)
+    handed = attr.ib(type=int, default=0)
+
+
+@attr.s
+class SharedMemoryExecutor(Executor):
+    """An executor transporting large buffer values through memory-mapped files.
+
+    This executor wraps another executor, typically a :class:`concurrent.futures.ProcessPoolExecutor`. Before a callable is submitted to the latter, its
+    future arguments are awaited, and any argument supporting the buffer protocol (including NumPy arrays) larger than `threshold` is replaced by a
+    :class:`SharedBuffer` handle. Large return values are transported the same way, so that the futures returned resolve to zero-copy views of the values.
+
+    The executor keeps a reference count of the shared buffers it hands out: a buffer is referenced once by every task using it, and once by the future
+    resolving to its view until :meth:`release` is called. The session engines release each value as soon as its last consuming op has been submitted, so
+    that passing a view on to another op does not require any copy. A buffer is deleted once it is no longer referenced, the views already opened remaining
+    valid.
+
+    .. note::
+        The callables submitted, and all arguments not eligible for transport, must be picklable.
+
+    Attributes:
+        executor: The executor to which the callables are submitted.
+        threshold: The minimum size in bytes of the values placed in shared buffers. Defaults to 1 MiB.
+        directory: The directory hosting the memory-mapped files. Defaults to ``/dev/shm`` where available, the temporary directory otherwise.
+    """
+    #: Ops submitted run in other processes, and the session engines hand the values returned back through :meth:`release`.
+    remote = True
+
+    executor = attr.ib(type=Executor)
+    threshold = attr.ib(type=int, default=2 ** 20)
+    directory = attr.ib(type=str, factory=_default_directory)
+    _entries = attr.ib(type=Dict[int, _Entry], factory=dict, init=False)
+    _entries_by_path = attr.ib(type=Dict[str, _Entry], factory=dict, init=False)
+    _lock = attr.ib(factory=threading.RLock, init=False)
+
+    def submit(self, fn, *args, **kwargs) -> Future:  # noqa: C901  # pylint: disable=W0221
+        """Submit `fn` to the underlying executor once all future arguments are resolved, transporting large values through shared buffers."""
+        outer = Future()
+        arguments = dict(chain(enumerate(args), kwargs.items()))
+        encoded = {}
+        remaining = [len(arguments)]
+
+        def on_resolved(arg, value):
+            try:
+                encoded[arg] = self._acquire(value.result() if isinstance(value, Future) else value)
+            except BaseException as err:  # pylint: disable=W0703
+                encoded[arg] = err
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            self._launch(fn, len(args), encoded, outer)
+
+        if len(arguments) == 0:
+            self._launch(fn, 0, encoded, outer)
+
+        # Shared arguments are acquired before this method returns, or by a callback registered now, so that they are never released in between
+        for arg, value in arguments.items():
+            if isinstance(value, Future):
+                value.add_done_callback(lambda future, arg=arg: on_resolved(arg, future))
+            else:
+                on_resolved(arg, value)
+
+        return outer
+
+    def _launch(self, fn, num_pos_args: int, encoded: Dict[Union[int, str], Any], outer: Future):
+        acquired = [value for value in encoded.values() if isinstance(value, SharedBuffer)]
+        errors = [value for value in encoded.values() if isinstance(value, BaseException)]
+        if len(errors) > 0:
+            self._release_buffers(acquired)
+            outer.set_exception(errors[0])
+            return
+
+        pos_args = tuple(encoded.pop(pos) for pos in range(num_pos_args))
+        try:
+            inner = self.executor.submit(_call, fn, pos_args, encoded, self.directory, self.threshold)
+        except BaseException as err:  # pylint: disable=W0703
+            self._release_buffers(acquired)
+            outer.set_exception(err)
+            return
+
+        def on_done(future):
+            try:
+                outer.set_result(self._adopt(future.result()))
+            except BaseException as err:  # pylint: disable=W0703
+                outer.set_exception(err)
+            finally:
+                self._release_buffers(acquired)
+
+        inner.add_done_callback(on_done)
+
+    def _acquire(self, value: Any) -> Any:
+        """Reference the shared buffer of `value` on behalf of a task, storing `value` in a new buffer if eligible.
+
+        The value is stored outside the lock: should another task store it meanwhile, the buffer of the latter is shared and the duplicate unlinked.
+        """
+        with self._lock:
+            entry = self._reference(value)
+        if entry is not None:
+            return entry.buffer
+
+        buffer = SharedBuffer.store(value, self.directory, self.threshold)
+        if buffer is None:
+            return value
+
+        with self._lock:
+            entry = self._reference(value)
+            if entry is None:
+                self._register(_Entry(value=value, buffer=buffer))
+                return buffer
+        buffer.unlink()
+        return entry.buffer
+
+    def _reference(self, value: Any) -> Optional[_Entry]:
+        """Reference the entry of `value` if any and return it. The lock must be held by the caller."""
+        entry = self._entries.get(id(value))
+        if entry is None or entry.value is not value:
+            return None
+        entry.count += 1
+        return entry
+
+    def _adopt(self, value: Any) -> Any:
+        """Open a shared buffer returned by a task, referenced on behalf of the future resolving to its view."""
+        if not isinstance(value, SharedBuffer):
+            return value
+
+        with self._lock:
+            entry = self._entries_by_path.get(value.path)
+            if entry is None:
+                entry = _Entry(value=value.open(), buffer=value, count=0)
+                self._register(entry)
+            entry.count += 1
+            entry.handed += 1
+        return entry.value
+
+    def _register(self, entry: _Entry):
+        self._entries[id(entry.value)] = entry
+        self._entries_by_path[entry.buffer.path] = entry
+
+    def _release_buffers(self, buffers: List[SharedBuffer]):
+        with self._lock:
+            for buffer in buffers:
+                self._decrement(self._entries_by_path.get(buffer.path))
+
+    def _decrement(self, entry: Optional[_Entry]):
+        if entry is None:
+            return
+        entry.count -= 1
+        if entry.count == 0:
+            del self._entries[id(entry.value)]
+            del self._entries_by_path[entry.buffer.path]
+            entry.buffer.unlink()
+
+    def release(self, value: Any):
+        """Release a reference held by a future on the shared buffer of `value`, or of the result of `value` if a future.
+
+        Values that were not returned by a future of this executor are ignored.
+        """
+        if isinstance(value, Future):
+            value.add_done_callback(lambda future: None if future.exception() is not None else self.release(future.result()))
+            return
+
+        with self._lock:
+            entry = self._entries.get(id(value))
+            if entry is not None and entry.value is value and entry.handed > 0:
+                entry.handed -= 1
+                self._decrement(entry)
+
+    def shutdown(self, wait: bool = True, **kwargs):  # pylint: disable=W0221
+        """Shut down the underlying executor, then delete all shared buffers left."""
+        self.executor.shutdown(wait=wait, **kwargs)
+        with self._lock:
+            for entry in self._entries_by_path.values():
+                entry.buffer.unlink()
+            self._entries.clear()
+            self._entries_by_path.clear()
@@ -5,6 +5,7 @@ Classes and decorator
 *Class definitions supporting the computation graphs.*
 """
 import attr
+import contextvars
 import warnings
 
 from concurrent.futures import Future
@@ -13,6 +14,10 @@ from typing import Callable, Dict, Optional, Tuple, List, Any, Iterable, Union
 from abc import ABC, abstractmethod
 
 
+# Context-local handler superseding :meth:`Op.op`, invoked with the op and the arguments of the method. See e.g. :func:`paragraph.session.eager_mode`.
+_op_handler = contextvars.ContextVar("op_handler", default=None)
+
+
 @attr.s(eq=False, repr=False, frozen=True)
 class Variable:
     """A generic :term:`variable`.
@@ -46,6 +51,9 @@ class Variable:
     def __repr__(self):
         if self.name is not None:
             return self.name
+        if isinstance(self.op, Output):
+            results = self.dependencies[0] if 0 in self.dependencies else self.args[0]
+            return f"{results}[{self.args[1]}]"
 
         args = self.args.copy()
         args.update(self.dependencies)
@@ -114,6 +122,13 @@ class Requirement(ABC):
         """Return an empty requirement of the same type as self."""
         return type(self)()
 
+    def isempty(self) -> bool:
+        """Whether nothing is required, i.e. `self` equals an empty requirement of the same type.
+
+        Concrete classes whose attributes do not compare equal when empty should redefine this method.
+        """
+        return self == self.new()
+
 
 @attr.s(repr=False)
 class Op:
@@ -129,8 +144,14 @@ class Op:
 
     Attributes:
         thread_safe: If False, the op is always executed in the main thread. Defaults to True.
+        num_outputs: If not None, the op returns as many results in a tuple, and :meth:`op` returns a tuple of as many variables, see :meth:`outputs`.
+          Defaults to None.
+        requirement_arg: If not None, the keyword argument through which the op receives the requirement resolved on its output, when evaluated with
+          requirements (see :func:`paragraph.session.evaluate`). Defaults to None.
     """
     thread_safe = attr.ib(type=bool, default=True, kw_only=True)
+    num_outputs = attr.ib(type=Optional[int], default=None, kw_only=True)
+    requirement_arg = attr.ib(type=Optional[str], default=None, kw_only=True)
 
     def __repr__(self):
         """Return the operation name
@@ -151,6 +172,11 @@ class Op:
         pos_args = [args.pop(k) for k in sorted(filter(lambda x: isinstance(x, int), args))]
         return pos_args, args
 
+    @staticmethod
+    def resolve_args(args: Iterable[Any], kwargs: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+        """Await all arguments, and return the positional and keyword arguments resolved."""
+        return Op.split_args(Op._collect_args(args, kwargs))
+
     @staticmethod
     def _collect_args(args: Iterable[Any], kwargs: Dict[str, Any]) -> Dict[Union[int, str], Any]:
         """Awaits all arguments and store them in a dictionary, using the index as a key for positional arguments."""
@@ -199,21 +225,82 @@ class Op:
         static_args = {arg: val for arg, val in all_args.items() if not isinstance(val, Variable)}
         return Variable(op=self, args=static_args, dependencies=var_args)
 
-    def op(self, *args, **kwargs) -> Variable:
+    def op(self, *args, **kwargs) -> Union[Variable, Tuple[Variable, ...]]:
         """Define a variable as the result of applying the op to the arguments provided.
 
-        While this method always returns a Variable instance, it accepts:
+        For ops with multiple outputs, the tuple of the variables standing for each result is returned instead, see :meth:`outputs`.
+
+        While this method always returns variables, it accepts:
           - _concrete_ arguments of the type expected by ``_run`` at the same position/for the same keyword,
           - Variable instances that resolve to a value of the expected type.
+
+        Within a context where an op handler is set (e.g. :func:`paragraph.session.eager_mode`), the handler is invoked instead and its return value returned.
         """
+        handler = _op_handler.get()
+        if handler is not None:
+            return handler(self, *args, **kwargs)
+
         all_args = self._collect_args(args, kwargs)
         var_args = {arg: var for arg, var in all_args.items() if isinstance(var, Variable)}
         static_args = {arg: val for arg, val in all_args.items() if not isinstance(val, Variable)}
 
-        return Variable(op=self, args=static_args, dependencies=var_args)
+        var = Variable(op=self, args=static_args, dependencies=var_args)
+        return var if self.num_outputs is None else self.outputs(var)
+
+    def outputs(self, var: Variable) -> Tuple[Variable, ...]:
+        """Return the variables standing for the results of a multi-output op, given the variable standing for the tuple of its results.
+
+        The op is executed once for all its outputs. Each output variable selects a result with an :class:`Output` op, which the session engines resolve
+        inline, without submitting it to the executor. Results are thus released individually: the tuple is released as soon as all output variables
+        used are resolved, and each result upon the last usage of its output variable.
+        """
+        return tuple(Variable(op=_OUTPUT, args={1: index}, dependencies={0: var}) for index in range(self.num_outputs))
+
+
+@attr.s(repr=False)
+class Output(Op):
+    """Select a result of a multi-output op: ``output(results, index)`` returns ``results[index]``, see :meth:`Op.outputs`."""
+    def __repr__(self):
+        return "output"
 
+    def _run(self, results, index):  # pylint: disable=W0221
+        return results[index]
 
-def op(func: Callable) -> Op:
+    def arg_requirements(self, req: Requirement, arg: str = None) -> Requirement:
+        # The requirement on an output bears on the results of the multi-output op
+        return req if arg == 0 else type(req)()
+
+
+_OUTPUT = Output()
+
+
+@attr.s(repr=False)
+class ControlOp(Op):
+    """Base class of all control flow operations.
+
+    The first positional argument of a control op, the *selector*, is evaluated like the argument of any other op. All other arguments are *branches*: the
+    session engines pass the value of the selector to :meth:`select`, which returns the key of the argument whose value the op should return. Only the
+    dependencies of the argument selected are then evaluated, all other branches being discarded without evaluation.
+
+    Invoked with invariable arguments, a control op simply returns the value of the argument selected.
+    """
+    def select(self, selector) -> Union[int, str]:
+        """Return the key of the argument selected by `selector`, must be implemented by all concrete classes.
+
+        The key returned is either 0, designating the selector itself, or the position or the keyword of a branch argument.
+        """
+        raise NotImplementedError
+
+    def _run(self, *args, **kwargs):
+        arguments = dict(chain(enumerate(args), kwargs.items()))
+        return arguments[self.select(args[0])]
+
+    def arg_requirements(self, req: Requirement, arg: str = None) -> Requirement:
+        # The value of the op is that of the branch selected, the selector is only tested
+        return req if arg != 0 else type(req)()
+
+
+def op(func: Optional[Callable] = None, *, num_outputs: Optional[int] = None, requirement_arg: Optional[str] = None) -> Union[Op, Callable[[Callable], Op]]:
     """Wraps a function within an Op object.
 
     The returned function accepts arguments of type Variable everywhere in its signature, in addition to the types accepted by the decorated function. In
@@ -226,11 +313,18 @@ def op(func: Callable) -> Op:
         Operations returned by this decorator are marked thread-safe by default. It is the user's responsibility to set `Op.thread_safe` to `False` where
         appropriate.
 
+    Functions returning several results in a tuple are decorated with ``@op(num_outputs=n)``, so that :meth:`Op.op` returns a tuple of `n` variables.
+
     Arguments:
         func: the function to transform into an Op
+        num_outputs: the number of results returned by the function, if the op is to have multiple outputs
+        requirement_arg: the keyword argument through which the function receives the requirement on its result, see :attr:`Op.requirement_arg`
     """
-    op = Op()
-    op._run = func
-    op.__doc__ = func.__doc__
+    if func is None:
+        return lambda func: op(func, num_outputs=num_outputs, requirement_arg=requirement_arg)
+
+    operation = Op(num_outputs=num_outputs, requirement_arg=requirement_arg)
+    operation._run = func
+    operation.__doc__ = func.__doc__
 
-    return op
+    return operation
@@ -0,0 +1,246 @@
+"""
+Workloads
+*********
+
+*Capturing production workloads, and replaying them offline.*
+
+A :class:`Recorder` stands in for :func:`paragraph.session.evaluate`, :func:`paragraph.session.solve` and :func:`paragraph.session.apply`: every call
+sampled appends to a local file the structure of the graph evaluated, the inputs given along with the size of their values, and the duration and size of
+the result of every op executed:
+
+    >>> recorder = Recorder("/var/tmp/workloads.jsonl", sample_rate=.01)
+    >>> res = recorder.evaluate([output], args={input: input_value}, executor=ex)
+
+The workloads recorded can then be replayed, e.g. to compare changes to the session engines or to the executor on production-shaped traffic. Ops are
+replaced by stubs sleeping for the duration recorded and, optionally, allocating values of the size recorded:
+
+    >>> for workload in load("/var/tmp/workloads.jsonl"):
+    ...     print(workload.wall_time, workload.run(executor=ex, allocate=True))
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import attr
+
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+from paragraph import session
+from paragraph.memory import size_of
+from paragraph.types import Op, Output, Variable
+from paragraph.timeline import Instrumented, Tracer
+
+
+@attr.s
+class _Profiler(Tracer):
+    """A tracer keeping, for every variable evaluated, the durations of its executions and the size of its value."""
+    durations = attr.ib(type=Dict[Variable, List[float]], factory=lambda: defaultdict(list), init=False)
+    sizes = attr.ib(type=Dict[Variable, Optional[int]], factory=dict, init=False)
+
+    def trace(self, run: Callable, var: Variable) -> Callable:
+        return _Timed(run, self, var)
+
+    def watch(self, future: Future, var: Variable):
+        start = time.perf_counter()
+        future.add_done_callback(lambda _: self.time(var, start, future.result() if future.exception() is None else None))
+
+    def time(self, var: Variable, start: float, value: Any):
+        """Record an execution of the op of `var`, started at `start` and returning `value`."""
+        end = time.perf_counter()
+        with self._lock:
+            self.durations[var].append(end - start)
+            self.sizes[var] = size_of(value)
+
+
+@attr.s(frozen=True, repr=False)
+class _Timed(Instrumented):
+    """Execute an op, awaiting future arguments first, and record the duration of the execution and the size of its result."""
+    profiler = attr.ib(type=_Profiler)
+    var = attr.ib(type=Variable)
+
+    def execute(self, pos_args: List[Any], kw_args: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        value = self.run(*pos_args, **kw_args)
+        self.profiler.time(self.var, start, value)
+        return value
+
+
+def _describe(var: Variable, ids: Dict[Variable, int], profiler: _Profiler) -> Dict[str, Any]:
+    """Return the description of a variable recorded in a workload."""
+    if var.isinput():
+        return {"input": var.name}
+
+    node = {"op": repr(var.op), "dependencies": [[arg, ids[dep]] for arg, dep in var.dependencies.items()], "args": list(var.args)}
+    if isinstance(var.op, Output):
+        node["index"] = var.args[1]
+    if var.op.num_outputs is not None:
+        node["num_outputs"] = var.op.num_outputs
+    if var in profiler.durations:
+        node["duration"] = sum(profiler.durations[var]) / len(profiler.durations[var])
+        node["size"] = profiler.sizes[var]
+    return node
+
+
+@attr.s
+class Recorder:
+    """Record workloads, i.e. evaluations and resolutions of computation graphs, to a file.
+
+    Every workload recorded is appended to the file as a line of JSON, holding the variables of the graph in the order of a forward traversal, along with
+    the inputs given and the size of their values, and the mean duration of the executions of every op and the size of its result. Ops are identified by
+    their representation only, and neither the values of inputs nor those of static arguments are recorded. Sizes are those of the buffers of values
+    supporting the buffer protocol, and shallow sizes otherwise. Only calls completing successfully are recorded.
+
+    Attributes:
+        path: The file to which workloads are appended.
+        sample_rate: The fraction of calls recorded, drawn at random. Defaults to 1, i.e. all calls are recorded.
+    """
+    path = attr.ib(type=str)
+    sample_rate = attr.ib(type=float, default=1.)
+    _lock = attr.ib(factory=threading.Lock, init=False, repr=False)
+
+    @sample_rate.validator
+    def _check_sample_rate(self, _, value):
+        if not 0. <= value <= 1.:
+            raise ValueError(f"The sample rate must lie between 0 and 1, got {value}.")
+
+    def evaluate(self, output: Iterable[Variable], args: Dict[Variable, Any], **kwargs) -> List:
+        """Evaluate the output variables as :func:`paragraph.session.evaluate`, to which keyword arguments are passed, but for `tracer`."""
+        return self._record("evaluate", list(output), args, kwargs)
+
+    def solve(self, output: Iterable[Variable], args: Dict[Variable, Any], **kwargs) -> List:
+        """Resolve the output variables as :func:`paragraph.session.solve`, to which keyword arguments are passed, but for `tracer`."""
+        return self._record("solve", list(output), args, kwargs)
+
+    def apply(self, output: List[Variable], args: Dict[Variable, Any], iter_args: Iterable[Dict[Variable, Any]], **kwargs) \
+            -> Generator[List[Any], None, None]:
+        """Iterate the evaluation of the output variables as :func:`paragraph.session.apply`, to which keyword arguments are passed, but for `tracer`.
+
+        The first resolution and every iteration are recorded as separate workloads, and sampled separately.
+
+        Raises:
+            ValueError: If a dynamic argument assigns a value to a variable appearing in static arguments.
+        """
+        return session.apply(output, args, iter_args, hook=self, **kwargs)
+
+    def _record(self, kind: str, output: List[Variable], args: Dict[Variable, Any], kwargs: Dict[str, Any]) -> List:
+        if kwargs.pop("tracer", None) is not None:
+            raise ValueError("Recording a workload requires the argument `tracer` to be left unset.")
+        function = getattr(session, kind)
+        if self.sample_rate < 1. and random.random() >= self.sample_rate:
+            return function(output, args, **kwargs)
+
+        profiler = _Profiler(os.devnull)
+        start = time.perf_counter()
+        res = function(output, args, tracer=profiler, **kwargs)
+        wall_time = time.perf_counter() - start
+
+        variables = list(session.traverse_fw(output))
+        ids = {var: index for index, var in enumerate(variables)}
+        workload = {"kind": kind, "nodes": [_describe(var, ids, profiler) for var in variables], "output": [ids[var] for var in output],
+                    "args": [[ids[var], size_of(value)] for var, value in args.items() if var in ids], "wall_time": wall_time}
+        line = json.dumps(workload)
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+        return res
+
+
+@attr.s(repr=False)
+class _Stub(Op):
+    """An op standing in for a recorded op, sleeping for its duration and allocating a value of the size of its result."""
+    name = attr.ib(type=str)
+    duration = attr.ib(type=float, default=0.)
+    size = attr.ib(type=Optional[int], default=None)
+    sleep = attr.ib(type=bool, default=True)
+    allocate = attr.ib(type=bool, default=False)
+
+    def __repr__(self):
+        return self.name
+
+    def _run(self, *args, **kwargs):
+        if self.sleep and self.duration > 0.:
+            time.sleep(self.duration)
+        if self.num_outputs is None:
+            return _allocate(self.size, self.allocate)
+        return tuple(_allocate(None if self.size is None else self.size // self.num_outputs, self.allocate) for _ in range(self.num_outputs))
+
+
+def _allocate(size: Optional[int], allocate: bool) -> Optional[bytearray]:
+    return bytearray(size) if allocate and size is not None else None
+
+
+@attr.s(frozen=True)
+class Workload:
+    """A workload recorded by a :class:`Recorder`.
+
+    Attributes:
+        kind: The session function called, either ``"evaluate"`` or ``"solve"``.
+        nodes: The descriptions of the variables of the graph, in the order of a forward traversal.
+        output: The indices in `nodes` of the output variables.
+        args: Maps the indices in `nodes` of the inputs given onto the sizes of their values, None if unknown.
+        wall_time: The duration of the call recorded, in seconds.
+    """
+    kind = attr.ib(type=str)
+    nodes = attr.ib(type=List[Dict[str, Any]])
+    output = attr.ib(type=List[int])
+    args = attr.ib(type=Dict[int, Optional[int]])
+    wall_time = attr.ib(type=float)
+
+    def build(self, sleep: bool = True, allocate: bool = False) -> Tuple[List[Variable], Dict[Variable, Any]]:
+        """Rebuild the graph of the workload, ops being replaced by stubs.
+
+        Control ops are replaced by plain stubs depending on all their branches, so that all branches are evaluated, and map ops by stubs standing for the
+        whole map. Stubs are passed None for all static arguments.
+
+        Arguments:
+            sleep: Whether stubs sleep for the mean duration recorded for their op. Ops not executed when recording do not sleep.
+            allocate: Whether stubs return a bytearray of the size recorded for the result of their op, and inputs are given a bytearray of the size
+              recorded for their value. Otherwise, all values are None.
+
+        Returns:
+            The output variables and the values of the inputs given.
+        """
+        variables = []
+        for node in self.nodes:
+            if "input" in node:
+                variables.append(Variable(node["input"]))
+                continue
+            dependencies = {arg: variables[index] for arg, index in node["dependencies"]}
+            if "index" in node:
+                variables.append(dependencies[0].op.outputs(dependencies[0])[node["index"]])
+                continue
+            stub = _Stub(node["op"], node.get("duration", 0.), node.get("size"), sleep, allocate, num_outputs=node.get("num_outputs"))
+            variables.append(Variable(op=stub, args=dict.fromkeys(node["args"]), dependencies=dependencies))
+
+        args = {variables[index]: _allocate(size, allocate) for index, size in self.args.items()}
+        return [variables[index] for index in self.output], args
+
+    def run(self, sleep: bool = True, allocate: bool = False, **kwargs) -> float:
+        """Replay the workload on stubs, see :meth:`build`, and return its wall time in seconds.
+
+        Keyword arguments, e.g. `executor`, are passed to the session function recorded.
+        """
+        output, args = self.build(sleep=sleep, allocate=allocate)
+        start = time.perf_counter()
+        getattr(session, self.kind)(output, args, **kwargs)
+        return time.perf_counter() - start
+
+
+def load(path: str) -> List[Workload]:
+    """Load the workloads recorded in a file, in the order of recording."""
+    with open(path) as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return [Workload(kind=record["kind"], nodes=record["nodes"], output=record["output"], args={index: size for index, size in record["args"]},
+                     wall_time=record["wall_time"]) for record in records]
+
+
+def replay(path: str, sleep: bool = True, allocate: bool = False, **kwargs) -> List[Tuple[float, float]]:
+    """Replay all workloads recorded in a file in turn, see :meth:`Workload.run`.
+
+    Returns:
+        For every workload, the wall time recorded and that of the replay, in seconds.
+    """
+    return [(workload.wall_time, workload.run(sleep=sleep, allocate=allocate, **kwargs)) for workload in load(path)]
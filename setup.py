@@ -27,6 +27,7 @@ if __name__ == "__main__":
         setup_requires=['setuptools_scm'],
         install_requires=[
             "attrs>=18.1.0",
+            "contextvars;python_version<'3.7'",
         ],
         classifiers=[
             "Development Status :: 4 - Beta",